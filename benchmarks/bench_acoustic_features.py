@@ -0,0 +1,76 @@
+"""
+Acoustic feature extraction cost per second of audio
+Run from the project root: python -m benchmarks.bench_acoustic_features
+
+Times extract_features on synthetic voiced clips one at a time and as
+batches, and reports milliseconds of CPU per second of audio alongside
+classifier scoring and the ASR-free end-to-end path.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.harness import add_output_argument, latency_stats, time_calls, write_results
+from emotion.acoustic_emotion import AcousticEmotionClassifier, extract_features
+
+
+def make_clips(count, seconds, sample_rate):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    clips = []
+    for _ in range(count):
+        f0 = rng.uniform(90, 260) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(2, 6) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)  # syllable-rate loudness changes
+        signal = envelope * (np.sin(phase) + 0.5 * np.sin(2 * phase)) * 8000
+        clips.append((signal + rng.standard_normal(len(t)) * 100).astype(np.int16))
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sample-rate', type=int, default=48000)
+    parser.add_argument('--seconds', type=float, nargs='+', default=[2.0, 6.0, 10.0])
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--runs', type=int, default=10)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    # The first call pays for librosa's imports and JIT compilation
+    extract_features(make_clips(1, 1.0, args.sample_rate), args.sample_rate)
+
+    results = {'sample_rate': args.sample_rate, 'batch_size': args.batch_size, 'clips': {}}
+    for seconds in args.seconds:
+        clips = make_clips(args.batch_size, seconds, args.sample_rate)
+        single = time_calls(lambda clip: extract_features([clip], args.sample_rate), clips[:args.runs], warmup=1)
+
+        batch_latencies = []
+        for _ in range(max(1, args.runs // 2)):
+            start = time.perf_counter()
+            features = extract_features(clips, args.sample_rate)
+            batch_latencies.append((time.perf_counter() - start) * 1000)
+        batched = latency_stats(batch_latencies)
+
+        classifier = AcousticEmotionClassifier(['happy', 'sad', 'angry', 'calm'])
+        scoring = time_calls(lambda row: classifier.predict(row[None, :]), list(features), warmup=1)
+
+        audio_seconds = seconds * len(clips)
+        results['clips'][f'{seconds:g}s'] = {
+            'single': single,
+            'batched': batched,
+            'classifier': scoring,
+            'single_ms_per_audio_second': round(single['p50_ms'] / seconds, 3),
+            'batched_ms_per_audio_second': round(batched['p50_ms'] / audio_seconds, 3),
+        }
+        print(f"{seconds:>5g}s clips  single {single['p50_ms']:>7.2f}ms "
+              f"({single['p50_ms'] / seconds:.2f} ms/s)  "
+              f"batch of {len(clips)} {batched['p50_ms']:>7.2f}ms "
+              f"({batched['p50_ms'] / audio_seconds:.2f} ms/s)  "
+              f"classifier {scoring['p50_ms'] * 1000:.1f}us")
+    write_results('acoustic_features', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Per-frame cost of WebRTC audio capture: deque of arrays vs ring buffer
+Run from the project root: python -m benchmarks.bench_audio_capture
+
+Replays MAX_AUDIO_DURATION seconds of 20 ms mono s16 frames through the
+previous capture path (to_ndarray + deque append + concatenate at stop) and
+through WebRTCAudioRecorder's ring buffer.
+"""
+
+import argparse
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import av
+import numpy as np
+
+from benchmarks.harness import add_output_argument, latency_stats, write_results
+from config import Config
+
+
+def make_frames(seconds, sample_rate, frame_ms=20):
+    rng = np.random.default_rng(0)
+    frame_samples = sample_rate * frame_ms // 1000
+    frames = []
+    for _ in range(int(seconds * 1000 / frame_ms)):
+        samples = rng.integers(-3000, 3000, (1, frame_samples), dtype=np.int16)
+        frame = av.AudioFrame.from_ndarray(samples, format='s16', layout='mono')
+        frame.sample_rate = sample_rate
+        frames.append(frame)
+    return frames
+
+
+class DequeCapture:
+    """The capture path WebRTCAudioRecorder used before the ring buffer"""
+    
+    def __init__(self):
+        self.audio_frames = deque(maxlen=1000)
+        self.lock = threading.Lock()
+    
+    def audio_frame_callback(self, frame):
+        with self.lock:
+            self.audio_frames.append(frame.to_ndarray())
+        return frame
+    
+    def finish(self):
+        return np.concatenate(list(self.audio_frames), axis=0)
+
+
+class RingCapture:
+    def __init__(self, sample_rate):
+        from utils.audio_recorder_compat import WebRTCAudioRecorder
+        
+        self.recorder = WebRTCAudioRecorder(streaming=False, sample_rate=sample_rate)
+        self.recorder.start_recording()
+    
+    def audio_frame_callback(self, frame):
+        return self.recorder.audio_frame_callback(frame)
+    
+    def finish(self):
+        return self.recorder.audio_buffer.view()
+
+
+def measure(make_capture, frames):
+    """Per-frame callback latency, stop cost and traced allocation peak"""
+    capture = make_capture()
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        capture.audio_frame_callback(frame)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    start = time.perf_counter()
+    audio = capture.finish()
+    finish_ms = (time.perf_counter() - start) * 1000
+    
+    # Allocation is traced in a separate pass; tracemalloc slows every call
+    capture = make_capture()
+    tracemalloc.start()
+    for frame in frames:
+        capture.audio_frame_callback(frame)
+    capture.finish()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    stats = {key.replace('_ms', '_us'): value for key, value in latency_stats(latencies).items()}
+    stats.update(finish_ms=round(finish_ms, 3), samples=int(np.size(audio)), traced_peak_kb=round(peak / 1024, 1))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sample-rate', type=int, default=48000)
+    parser.add_argument('--seconds', type=float, default=Config.MAX_AUDIO_DURATION)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    frames = make_frames(args.seconds, args.sample_rate)
+    results = {'frames': len(frames), 'seconds': args.seconds}
+    captures = [('deque', DequeCapture), ('ring_buffer', lambda: RingCapture(args.sample_rate))]
+    for name, make_capture in captures:
+        stats = measure(make_capture, frames)
+        results[name] = stats
+        print(f"{name:<12} per frame p50 {stats['p50_us']:>6.2f}us  p99 {stats['p99_us']:>6.2f}us  "
+              f"stop {stats['finish_ms']:>6.3f}ms  traced peak {stats['traced_peak_kb']}KB")
+    write_results('audio_capture', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+AudioEmotionDetector._numpy_to_wav on typical recording shapes
+Run from the project root: python -m benchmarks.bench_audio_conversion
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.harness import add_output_argument, peak_rss_mb, time_calls, write_results
+
+CASES = [
+    # (name, seconds, channels, dtype)
+    ('mono-int16-1s', 1, 1, np.int16),
+    ('mono-float32-1s', 1, 1, np.float32),
+    ('mono-float32-10s', 10, 1, np.float32),
+    ('stereo-float32-10s', 10, 2, np.float32),
+    ('stereo-int16-10s', 10, 2, np.int16),
+]
+
+
+def make_audio(seconds, channels, dtype, sample_rate):
+    rng = np.random.default_rng(0)
+    shape = (seconds * sample_rate, channels) if channels > 1 else (seconds * sample_rate,)
+    audio = rng.standard_normal(shape).astype(np.float32) * 0.1
+    if dtype == np.int16:
+        return (audio * 32767).astype(np.int16)
+    return audio.astype(dtype)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--sample-rate', type=int, default=48000)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    from emotion.audio_emotion import AudioEmotionDetector
+    detector = AudioEmotionDetector()
+    
+    results = []
+    for name, seconds, channels, dtype in CASES:
+        audio = make_audio(seconds, channels, dtype, args.sample_rate)
+        stats = time_calls(lambda data: detector._numpy_to_wav(data, args.sample_rate), [audio] * args.runs)
+        stats.update(case=name, input_mb=round(audio.nbytes / 2 ** 20, 2))
+        results.append(stats)
+        print(f"{name:<22}p50 {stats['p50_ms']:>8.2f}ms  p99 {stats['p99_ms']:>8.2f}ms")
+    
+    write_results('audio_conversion', {'cases': results, 'peak_rss_mb': round(peak_rss_mb(), 1)}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+DatabaseManager history queries on a synthetic database
+Run from the project root: python -m benchmarks.bench_database
+
+Builds a SQLite file with --rows emotion logs and --rows song plays
+(1M each by default) spread over a year and many users. Pass --db to
+reuse a previously generated file.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.harness import add_output_argument, peak_rss_mb, time_calls, write_results
+
+INPUT_TYPES = ['text', 'ml_text', 'audio_file', 'live_audio']
+
+# SQLAlchemy's SQLite DateTime storage format
+SQLITE_DATETIME = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def populate(path, rows, users, songs, seed=0):
+    """Fill an initialized database with synthetic users, songs and history"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    created_at = now.strftime(SQLITE_DATETIME)
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=OFF')
+    connection.execute('PRAGMA synchronous=OFF')
+    
+    emotion_ids = [row[0] for row in connection.execute('SELECT id FROM emotions')]
+    first_user = connection.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0] + 1
+    connection.executemany(
+        'INSERT INTO users (id, username, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)',
+        ((first_user + i, f'bench{i}', f'bench{i}@example.com', 'x', created_at) for i in range(users))
+    )
+    first_song = connection.execute('SELECT COALESCE(MAX(id), 0) FROM songs').fetchone()[0] + 1
+    connection.executemany(
+        'INSERT INTO songs (id, title, artist, spotify_id, created_at) VALUES (?, ?, ?, ?, ?)',
+        ((first_song + i, f'Song {i}', f'Artist {i % 500}', f'bench{i}', created_at) for i in range(songs))
+    )
+    
+    def timestamp():
+        return (now - timedelta(seconds=rng.randrange(365 * 24 * 3600))).strftime(SQLITE_DATETIME)
+    
+    connection.executemany(
+        'INSERT INTO emotion_logs (user_id, emotion_id, input_text, input_type, confidence_score, detected_at) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        ((first_user + rng.randrange(users), rng.choice(emotion_ids), 'synthetic entry',
+          rng.choice(INPUT_TYPES), rng.random(), timestamp()) for _ in range(rows))
+    )
+    connection.executemany(
+        'INSERT INTO user_song_history (user_id, song_id, emotion_id, liked, played_at, input_type, confidence_score) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((first_user + rng.randrange(users), first_song + rng.randrange(songs), rng.choice(emotion_ids),
+          rng.choice([None, True, False]), timestamp(), rng.choice(INPUT_TYPES), rng.random())
+         for _ in range(rows))
+    )
+    connection.commit()
+    connection.execute('ANALYZE')
+    connection.close()
+    return list(range(first_user, first_user + users))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--songs', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--db', help="database file to create or reuse")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='emosound-bench-'), 'bench.db')
+    reuse = os.path.exists(path)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    
+    # Import after DATABASE_URL is set: the engine is created at import time
+    from database.database import DatabaseManager
+    from database.init_db import initialize_database
+    from database.models import engine
+    
+    build_seconds = None
+    if reuse:
+        connection = sqlite3.connect(path)
+        user_ids = [row[0] for row in connection.execute("SELECT id FROM users WHERE username LIKE 'bench%'")]
+        connection.close()
+    else:
+        start = time.perf_counter()
+        initialize_database()
+        # Close pooled connections so the bulk load can switch the journal mode
+        engine.dispose()
+        user_ids = populate(path, args.rows, args.users, args.songs)
+        build_seconds = round(time.perf_counter() - start, 1)
+        print(f"Built {path} in {build_seconds}s")
+    
+    manager = DatabaseManager()
+    rng = random.Random(1)
+    sampled_users = [rng.choice(user_ids) for _ in range(args.queries)]
+    
+    queries = {
+        'get_user_emotion_history_30d': lambda user_id: manager.get_user_emotion_history(user_id, days=30),
+        'get_user_emotion_history_365d': lambda user_id: manager.get_user_emotion_history(user_id, days=365),
+        'get_user_song_history_50': lambda user_id: manager.get_user_song_history(user_id, limit=50),
+    }
+    
+    results = {'db': path, 'rows': args.rows, 'users': len(user_ids), 'build_seconds': build_seconds, 'queries': {}}
+    for name, query in queries.items():
+        stats = time_calls(query, sampled_users)
+        results['queries'][name] = stats
+        print(f"{name:<32}p50 {stats['p50_ms']:>8.2f}ms  p95 {stats['p95_ms']:>8.2f}ms  p99 {stats['p99_ms']:>8.2f}ms")
+    manager.close_session()
+    
+    results['db_size_mb'] = round(os.path.getsize(path) / 2 ** 20, 1)
+    results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    write_results('database', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
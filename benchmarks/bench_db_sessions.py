@@ -0,0 +1,109 @@
+"""
+DatabaseManager under concurrent Streamlit-like sessions
+Run from the project root: python -m benchmarks.bench_db_sessions
+
+Each of --sessions threads plays one user: it logs emotions and reads its
+history back, --operations times, through a DatabaseManager bound to a
+fresh SQLite file. The tuned engine (pool settings, WAL, synchronous=NORMAL,
+mmap) is compared with a stock create_engine on the same workload.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.harness import add_output_argument, latency_stats, peak_rss_mb, write_results
+
+ENGINES = ['default', 'tuned']
+
+
+def build_manager(kind, path, users):
+    from sqlalchemy import create_engine
+
+    from database.database import DatabaseManager
+    from database.models import Base, Emotion, User, create_db_engine
+
+    url = f'sqlite:///{path}'
+    if kind == 'tuned':
+        engine = create_db_engine(url)
+    else:
+        engine = create_engine(url, connect_args={'check_same_thread': False})
+    Base.metadata.create_all(bind=engine)
+
+    manager = DatabaseManager(engine=engine)
+    with manager.session_scope() as session:
+        emotions = [Emotion(name=name, color_code='#000000') for name in ('happy', 'sad', 'calm')]
+        people = [User(username=f'bench{i}', email=f'bench{i}@example.com', password_hash='x')
+                  for i in range(users)]
+        session.add_all(emotions + people)
+    return manager, [user.id for user in people], [emotion.id for emotion in emotions]
+
+
+def run_sessions(manager, user_ids, emotion_ids, operations, write_ratio):
+    """Run one thread per user; return per-call latencies in ms, error count and wall time"""
+    latencies = {'write': [], 'read': []}
+    errors = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(len(user_ids))
+
+    def session_worker(user_id):
+        rng = random.Random(user_id)
+        start_gate.wait()
+        for _ in range(operations):
+            kind = 'write' if rng.random() < write_ratio else 'read'
+            start = time.perf_counter()
+            if kind == 'write':
+                ok = manager.create_emotion_log(user_id, rng.choice(emotion_ids), 'bench', 'text', rng.random())
+            else:
+                ok = manager.get_user_emotion_history(user_id, days=30) is not None
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies[kind].append(elapsed)
+                if not ok:
+                    errors.append(kind)
+
+    threads = [threading.Thread(target=session_worker, args=(user_id,)) for user_id in user_ids]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(errors), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--operations', type=int, default=100, help="calls per session")
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='emosound-bench-')
+    results = {'sessions': args.sessions, 'operations': args.operations,
+               'write_ratio': args.write_ratio, 'engines': {}}
+    for kind in args.engines:
+        manager, user_ids, emotion_ids = build_manager(kind, os.path.join(directory, f'{kind}.db'), args.sessions)
+        latencies, errors, seconds = run_sessions(manager, user_ids, emotion_ids, args.operations, args.write_ratio)
+        calls = sum(len(values) for values in latencies.values())
+        results['engines'][kind] = {
+            'calls_per_second': round(calls / seconds, 1),
+            'errors': errors,
+            'write': latency_stats(latencies['write']),
+            'read': latency_stats(latencies['read']),
+        }
+        manager.engine.dispose()
+        print(f"{kind:<8}{calls / seconds:>9.1f} calls/s  errors {errors:<4}"
+              f"write p95 {results['engines'][kind]['write']['p95_ms']:>8.2f}ms  "
+              f"read p95 {results['engines'][kind]['read']['p95_ms']:>8.2f}ms")
+
+    results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    write_results('db_sessions', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
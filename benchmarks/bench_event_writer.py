@@ -0,0 +1,91 @@
+"""
+Write-behind event writer against per-event commits
+Run from the project root: python -m benchmarks.bench_event_writer
+
+--threads request threads log --events emotion events in total, either with
+DatabaseManager.create_emotion_log (one commit per event) or through an
+EventWriter (enqueue only, batched inserts in the background). Request-path
+latency covers the call the UI waits on; throughput counts until every
+event is committed, including the final drain.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_db_sessions import build_manager
+from benchmarks.harness import add_output_argument, latency_stats, peak_rss_mb, write_results
+
+MODES = ['per_event', 'write_behind']
+
+
+def run(mode, manager, user_ids, emotion_ids, events, threads, batch_size, flush_ms):
+    from database.event_writer import EventWriter
+
+    writer = EventWriter(manager=manager, batch_size=batch_size, flush_ms=flush_ms, enabled=True)
+    if mode == 'per_event':
+        log = manager.create_emotion_log
+    else:
+        log = writer.enqueue_emotion_log
+
+    latencies = []
+    lock = threading.Lock()
+    per_thread = events // threads
+
+    def request_thread(index):
+        rng = random.Random(index)
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            log(rng.choice(user_ids), rng.choice(emotion_ids), 'bench', 'text', rng.random())
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=request_thread, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    writer.close()
+    seconds = time.perf_counter() - start
+
+    return {
+        'events_per_second': round(len(latencies) / seconds, 1),
+        'request': latency_stats(latencies),
+        'writer': writer.stats() if mode == 'write_behind' else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--flush-ms', type=int, default=200)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='emosound-bench-')
+    results = {'events': args.events, 'threads': args.threads, 'batch_size': args.batch_size,
+               'flush_ms': args.flush_ms, 'modes': {}}
+    for mode in args.modes:
+        manager, user_ids, emotion_ids = build_manager('tuned', os.path.join(directory, f'{mode}.db'), 50)
+        result = run(mode, manager, user_ids, emotion_ids, args.events, args.threads,
+                     args.batch_size, args.flush_ms)
+        manager.engine.dispose()
+        results['modes'][mode] = result
+        print(f"{mode:<14}{result['events_per_second']:>10.1f} events/s  "
+              f"request p50 {result['request']['p50_ms']:>7.3f}ms  p99 {result['request']['p99_ms']:>7.3f}ms")
+
+    results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    write_results('event_writer', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Keyword fallback detector: compiled matcher vs the original substring loop
+Run from the project root: python -m benchmarks.bench_keyword_detection
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.harness import add_output_argument, time_calls, write_results
+from emotion.keyword_emotion import EMOTION_KEYWORDS, KeywordEmotionDetector
+
+FILLER = ("today we walked along the river and talked about the weather the news "
+          "our plans for the weekend and what to cook for dinner").split()
+
+
+def legacy_scores(text):
+    """The per-keyword substring scan previously used by simple_emotion_detection"""
+    text_lower = text.lower()
+    scores = {}
+    for emotion, keywords in EMOTION_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword in text_lower)
+        if score > 0:
+            scores[emotion] = score / len(keywords)
+    return scores
+
+
+def make_text(words, seed=0):
+    rng = random.Random(seed)
+    vocabulary = FILLER + [keyword for keywords in EMOTION_KEYWORDS.values() for keyword in keywords]
+    return ' '.join(rng.choice(FILLER) if rng.random() < 0.95 else rng.choice(vocabulary)
+                    for _ in range(words))
+
+
+def time_call(function, text, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(text)
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=200)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    regex_detector = KeywordEmotionDetector(use_automaton=False)
+    automaton_detector = KeywordEmotionDetector()
+    
+    results = []
+    print(f"{'words':>8}{'loop us':>12}{'regex us':>12}{'automaton us':>15}")
+    for words in [10, 100, 1000, 10000]:
+        text = make_text(words)
+        repeats = max(1, args.repeats * 100 // words) if words > 100 else args.repeats
+        row = {
+            'words': words,
+            'loop_us': round(time_call(legacy_scores, text, repeats), 2),
+            'regex_us': round(time_call(regex_detector.score, text, repeats), 2),
+            'automaton_us': None
+        }
+        if automaton_detector.automaton is not None:
+            row['automaton_us'] = round(time_call(automaton_detector.score, text, repeats), 2)
+        results.append(row)
+        automaton = f"{row['automaton_us']:>15.1f}" if row['automaton_us'] is not None else f"{'n/a':>15}"
+        print(f"{words:>8}{row['loop_us']:>12.1f}{row['regex_us']:>12.1f}{automaton}")
+    
+    # End to end through the UI fallback, as called when the model is unavailable
+    from ui.components import simple_emotion_detection
+    texts = [make_text(40, seed) for seed in range(args.repeats)]
+    ui_stats = time_calls(simple_emotion_detection, texts)
+    print(f"simple_emotion_detection (40 words): p50 {ui_stats['p50_ms']:.3f}ms  p99 {ui_stats['p99_ms']:.3f}ms")
+    
+    write_results('keyword_detection', {'scaling': results, 'simple_emotion_detection': ui_stats}, args.output)
+
+
+if __name__ == '__main__':
+    main()
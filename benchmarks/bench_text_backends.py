@@ -0,0 +1,108 @@
+"""
+Latency and memory comparison of the text emotion backends
+Run from the project root: python -m benchmarks.bench_text_backends
+
+Each backend is measured in a fresh subprocess so peak RSS and model
+load time are not shared between them.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_text_emotion import unique_texts
+from benchmarks.harness import add_output_argument, peak_rss_mb, percentile, write_results
+
+BACKENDS = [
+    ('torch', False),
+    ('onnx', False),
+    ('onnx', True),
+]
+
+
+def measure(backend, quantize, runs, batch_size):
+    """Measure one backend inside the current process"""
+    os.environ['TEXT_EMOTION_BACKEND'] = backend
+    os.environ['ONNX_QUANTIZE'] = str(quantize)
+    
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    from emotion.text_emotion import TextEmotionDetector
+    from utils.cache import LRUCache
+    detector = TextEmotionDetector()
+    # No memo or persistent store: every timed call must reach the model
+    detector.cache = LRUCache(max_size=1)
+    detector.store = None
+    if not detector.load_model():
+        raise RuntimeError(f"Could not load {backend} backend")
+    load_seconds = time.perf_counter() - start
+    
+    # Warm up
+    detector.detect_emotions_batch(unique_texts(6, offset=-6))
+    
+    latencies = []
+    for text in unique_texts(runs):
+        start = time.perf_counter()
+        detector.detect_emotions_batch([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    repeats = max(1, runs // 10)
+    batches = [unique_texts(batch_size, offset=runs + i * batch_size) for i in range(repeats)]
+    start = time.perf_counter()
+    for batch in batches:
+        detector.detect_emotions_batch(batch, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        'backend': backend,
+        'quantized': quantize,
+        'load_seconds': round(load_seconds, 3),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'throughput_per_s': round(batch_size * repeats / elapsed, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'model_rss_mb': round(peak_rss_mb() - baseline_rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    parser.add_argument('--quantize', action='store_true', help=argparse.SUPPRESS)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    if args.backend:
+        print(json.dumps(measure(args.backend, args.quantize, args.runs, args.batch_size)))
+        return
+    
+    results = []
+    for backend, quantize in BACKENDS:
+        command = [sys.executable, '-m', 'benchmarks.bench_text_backends', '--backend', backend,
+                   '--runs', str(args.runs), '--batch-size', str(args.batch_size)]
+        if quantize:
+            command.append('--quantize')
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{backend} (quantized={quantize}) failed:\n{completed.stderr[-2000:]}", file=sys.stderr)
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    
+    header = f"{'backend':<12}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'texts/s':>10}{'peak MB':>10}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        name = result['backend'] + ('-int8' if result['quantized'] else '')
+        print(f"{name:<12}{result['load_seconds']:>8}{result['p50_ms']:>9}{result['p95_ms']:>9}"
+              f"{result['throughput_per_s']:>10}{result['peak_rss_mb']:>10}")
+    write_results('text_backends', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Cold start, latency, throughput and memory of TextEmotionDetector
+Run from the project root: python -m benchmarks.bench_text_emotion
+
+Run it as its own process: the cold-start figures include importing the
+ML stack and loading the model.
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.harness import add_output_argument, latency_stats, peak_rss_mb, write_results
+
+SAMPLE_TEXTS = [
+    "I am so happy today!",
+    "Nothing is going right and I feel miserable.",
+    "Why would they do that? I'm furious.",
+    "I'm nervous about the exam tomorrow.",
+    "What a surprise, I didn't expect that at all!",
+    "Just finished work, heading home.",
+]
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def unique_texts(count, offset=0):
+    """Distinct inputs so the prediction memo never answers for the model"""
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({offset + i})" for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--backend', choices=['torch', 'onnx'], help="overrides TEXT_EMOTION_BACKEND")
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--batches', type=int, default=5, help="batches per batch size")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    if args.backend:
+        os.environ['TEXT_EMOTION_BACKEND'] = args.backend
+    
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    from emotion.text_emotion import TextEmotionDetector
+    from utils.cache import LRUCache
+    import_seconds = time.perf_counter() - start
+    
+    detector = TextEmotionDetector()
+    detector.cache = LRUCache(max_size=1)
+    start = time.perf_counter()
+    if not detector.load_model():
+        raise SystemExit("Could not load the text emotion model")
+    load_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    detector.analyze(unique_texts(1, offset=-1)[0])
+    first_prediction_ms = (time.perf_counter() - start) * 1000
+    
+    results = {
+        'backend': detector.backend,
+        'model': detector.model_name,
+        'cold_start': {
+            'import_seconds': round(import_seconds, 3),
+            'load_seconds': round(load_seconds, 3),
+            'first_prediction_ms': round(first_prediction_ms, 2),
+            'model_rss_mb': round(peak_rss_mb() - rss_before, 1),
+        },
+    }
+    
+    latencies = []
+    for text in unique_texts(args.runs):
+        start = time.perf_counter()
+        detector.analyze(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    results['single_item'] = latency_stats(latencies)
+    
+    throughput = []
+    offset = args.runs
+    for batch_size in BATCH_SIZES:
+        batches = [unique_texts(batch_size, offset + i * batch_size) for i in range(args.batches)]
+        offset += batch_size * args.batches
+        start = time.perf_counter()
+        for batch in batches:
+            detector.analyze_batch(batch, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        throughput.append({
+            'batch_size': batch_size,
+            'texts_per_s': round(batch_size * args.batches / elapsed, 1),
+            'ms_per_batch': round(elapsed / args.batches * 1000, 2),
+        })
+    results['throughput'] = throughput
+    results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    
+    single = results['single_item']
+    print(f"load {load_seconds:.2f}s  p50 {single['p50_ms']:.1f}ms  p95 {single['p95_ms']:.1f}ms  "
+          f"p99 {single['p99_ms']:.1f}ms  peak {results['peak_rss_mb']}MB")
+    for row in throughput:
+        print(f"  batch {row['batch_size']:>3}: {row['texts_per_s']:>8} texts/s")
+    write_results('text_emotion', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare two benchmark result files
+Usage: python -m benchmarks.compare BASELINE.json CANDIDATE.json
+
+Prints every numeric metric present in both files with its relative change.
+For *_ms, *_seconds and *_mb metrics lower is better; for rates higher is.
+"""
+
+import argparse
+import json
+
+HIGHER_IS_BETTER = ('_per_s', 'hit_rate')
+
+
+def flatten(value, prefix=''):
+    """{'a': {'b': 1}, 'c': [{'batch_size': 8, 'x': 2}]} -> {'a.b': 1, 'c[batch_size=8].x': 2}"""
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+        return items
+    if isinstance(value, list):
+        items = {}
+        for index, child in enumerate(value):
+            label = index
+            if isinstance(child, dict):
+                # Label rows by their first non-numeric or size-like field so reordering is harmless
+                for key in ('case', 'batch_size', 'words', 'backend'):
+                    if key in child:
+                        label = f"{key}={child[key]}"
+                        break
+            items.update(flatten(child, f"{prefix}[{label}]"))
+        return items
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.0, help="only show changes above this percentage")
+    args = parser.parse_args()
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    
+    print(f"{baseline['benchmark']}: {baseline['environment'].get('commit')} -> {candidate['environment'].get('commit')}")
+    before = flatten(baseline['results'])
+    after = flatten(candidate['results'])
+    for metric in sorted(set(before) & set(after)):
+        old, new = before[metric], after[metric]
+        change = (new - old) / old * 100 if old else 0.0
+        if abs(change) < args.threshold:
+            continue
+        better = change > 0 if metric.endswith(HIGHER_IS_BETTER) else change < 0
+        marker = '' if not change else ('+' if better else '-')
+        print(f"{marker:1} {metric:<60}{old:>12g}{new:>12g}{change:>+9.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Shared helpers for the benchmark scripts
+Latency percentiles, peak memory and machine-readable result files that can
+be compared across commits with python -m benchmarks.compare.
+"""
+
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.getenv('BENCH_RESULTS_DIR', os.path.join('benchmarks', 'results'))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_stats(latencies_ms):
+    """Summary of a list of latencies in milliseconds"""
+    return {
+        'runs': len(latencies_ms),
+        'mean_ms': round(statistics.fmean(latencies_ms), 4),
+        'p50_ms': round(percentile(latencies_ms, 50), 4),
+        'p95_ms': round(percentile(latencies_ms, 95), 4),
+        'p99_ms': round(percentile(latencies_ms, 99), 4),
+        'max_ms': round(max(latencies_ms), 4),
+    }
+
+
+def time_calls(function, inputs, warmup=3):
+    """Call function once per input and return latency_stats in milliseconds"""
+    inputs = list(inputs)
+    for item in inputs[:warmup]:
+        function(item)
+
+    latencies = []
+    for item in inputs:
+        start = time.perf_counter()
+        function(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latency_stats(latencies)
+
+
+def git_commit():
+    """Short hash of HEAD with a -dirty suffix for uncommitted changes, or None"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except Exception:
+        return None
+
+
+def environment():
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_results(name, results, output=None):
+    """Write {'benchmark', 'environment', 'results'} as JSON and return the path
+
+    output defaults to RESULTS_DIR/<name>-<commit>.json; '-' prints to stdout.
+    """
+    document = {'benchmark': name, 'environment': environment(), 'results': results}
+    if output == '-':
+        json.dump(document, sys.stdout, indent=2)
+        print()
+        return None
+
+    if output is None:
+        commit = document['environment']['commit'] or datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{name}-{commit}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {output}")
+    return output
+
+
+def add_output_argument(parser):
+    parser.add_argument('--output', help="JSON results path ('-' for stdout, default benchmarks/results/)")
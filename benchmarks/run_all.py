@@ -0,0 +1,61 @@
+"""
+Run every benchmark, each in a fresh process, and collect the JSON results
+Run from the project root: python -m benchmarks.run_all [--quick]
+
+Results go to benchmarks/results/<benchmark>-<commit>.json; compare two
+commits with python -m benchmarks.compare.
+"""
+
+import argparse
+import subprocess
+import sys
+
+from benchmarks.harness import RESULTS_DIR
+
+BENCHMARKS = {
+    'bench_text_emotion': [],
+    'bench_text_backends': [],
+    'bench_keyword_detection': [],
+    'bench_audio_conversion': [],
+    'bench_audio_capture': [],
+    'bench_database': [],
+    'bench_db_sessions': [],
+    'bench_event_writer': [],
+    'bench_acoustic_features': [],
+}
+
+QUICK_ARGS = {
+    'bench_text_emotion': ['--runs', '30', '--batches', '2'],
+    'bench_text_backends': ['--runs', '20', '--batch-size', '8'],
+    'bench_keyword_detection': ['--repeats', '20'],
+    'bench_audio_conversion': ['--runs', '10'],
+    'bench_audio_capture': ['--seconds', '2'],
+    'bench_database': ['--rows', '100000', '--queries', '50'],
+    'bench_db_sessions': ['--operations', '20'],
+    'bench_event_writer': ['--events', '1000'],
+    'bench_acoustic_features': ['--runs', '4', '--seconds', '2'],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--quick', action='store_true', help="smaller inputs for a smoke run")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="run a subset")
+    args = parser.parse_args()
+    
+    failed = []
+    for name in args.only or BENCHMARKS:
+        extra = QUICK_ARGS[name] if args.quick else BENCHMARKS[name]
+        print(f"== {name}", flush=True)
+        completed = subprocess.run([sys.executable, '-m', f'benchmarks.{name}'] + extra)
+        if completed.returncode != 0:
+            failed.append(name)
+    
+    print(f"Results in {RESULTS_DIR}")
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
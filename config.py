@@ -6,6 +6,20 @@ load_dotenv()
 class Config:
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///emosound.db')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 2 ** 20)))  # bytes
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # ms a writer waits for the lock
+    
+    # Write-behind batching of emotion logs and song interactions
+    EVENT_WRITER_ENABLED = os.getenv('EVENT_WRITER_ENABLED', 'True').lower() == 'true'
+    EVENT_BATCH_SIZE = int(os.getenv('EVENT_BATCH_SIZE', '100'))
+    EVENT_FLUSH_MS = int(os.getenv('EVENT_FLUSH_MS', '200'))  # max delay before a queued event is written
+    EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', '10000'))
+    EVENT_ENQUEUE_TIMEOUT = float(os.getenv('EVENT_ENQUEUE_TIMEOUT', '1.0'))  # seconds a caller waits on a full queue
     
     # Spotify API
     SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
@@ -31,6 +45,78 @@ class Config:
     EMOTION_CONFIDENCE_THRESHOLD = 0.3
     MAX_AUDIO_DURATION = 10  # seconds
     
+    # Speech recognition: 'google' (online, Sphinx fallback), 'sphinx', 'vosk' (offline) or 'fake'
+    ASR_BACKEND = os.getenv('ASR_BACKEND', 'google')
+    ASR_LANGUAGE = os.getenv('ASR_LANGUAGE', 'en-US')
+    ASR_SAMPLE_RATE = int(os.getenv('ASR_SAMPLE_RATE', '16000'))  # audio is downsampled to this before ASR
+    
+    # Voice activity gate: trims silence and skips ASR for clips without speech
+    VAD_ENABLED = os.getenv('VAD_ENABLED', 'True').lower() == 'true'
+    VAD_THRESHOLD_DB = float(os.getenv('VAD_THRESHOLD_DB', '-45'))  # dBFS
+    VAD_MIN_SPEECH_MS = int(os.getenv('VAD_MIN_SPEECH_MS', '200'))
+    NOISE_PROFILE_ALPHA = float(os.getenv('NOISE_PROFILE_ALPHA', '0.3'))  # EWMA weight of each new clip's noise level
+    
+    # Background analysis jobs: a process-wide cap on concurrent audio analysis
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '8'))  # running + queued; further submissions are refused
+    JOB_RETAIN_SECONDS = int(os.getenv('JOB_RETAIN_SECONDS', '600'))  # finished jobs kept for polling
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '0.5'))  # seconds between UI status checks
+    
+    # Audio results keyed by a hash of the upload bytes and of the decoded PCM
+    AUDIO_CACHE_ENABLED = os.getenv('AUDIO_CACHE_ENABLED', 'False').lower() == 'true'
+    AUDIO_CACHE_PATH = os.getenv('AUDIO_CACHE_PATH', 'audio_cache.db')
+    AUDIO_CACHE_MAX_ENTRIES = int(os.getenv('AUDIO_CACHE_MAX_ENTRIES', '10000'))
+    AUDIO_CACHE_MAX_AGE = int(os.getenv('AUDIO_CACHE_MAX_AGE', str(30 * 24 * 3600)))  # seconds
+    
+    # Tone-of-voice classifier: 'fuse' runs it alongside ASR, 'only' skips ASR, 'off' disables it
+    ACOUSTIC_WEIGHTS_PATH = os.getenv('ACOUSTIC_WEIGHTS_PATH', '')  # built by python -m emotion.train_acoustic
+    ACOUSTIC_MODE = os.getenv('ACOUSTIC_MODE', 'fuse')
+    ACOUSTIC_TEXT_WEIGHT = float(os.getenv('ACOUSTIC_TEXT_WEIGHT', '0.6'))  # share of the text scores when fusing
+    VOSK_MODEL_PATH = os.getenv('VOSK_MODEL_PATH', '')  # e.g. models/vosk-model-small-en-us-0.15
+    
+    # Live recordings are transcribed segment by segment while the user speaks
+    AUDIO_STREAMING_ENABLED = os.getenv('AUDIO_STREAMING_ENABLED', 'True').lower() == 'true'
+    AUDIO_STREAMING_WORKERS = int(os.getenv('AUDIO_STREAMING_WORKERS', '2'))
+    AUDIO_SEGMENT_MIN_SECONDS = float(os.getenv('AUDIO_SEGMENT_MIN_SECONDS', '3'))
+    AUDIO_SEGMENT_MAX_SECONDS = float(os.getenv('AUDIO_SEGMENT_MAX_SECONDS', '6'))
+    AUDIO_SEGMENT_SILENCE_RMS = float(os.getenv('AUDIO_SEGMENT_SILENCE_RMS', '0.01'))  # fraction of full scale
+    
+    # Text emotion model
+    TEXT_EMOTION_MODEL = os.getenv('TEXT_EMOTION_MODEL', 'j-hartmann/emotion-english-distilroberta-base')
+    TEXT_EMOTION_BACKEND = os.getenv('TEXT_EMOTION_BACKEND', 'torch')  # 'torch' or 'onnx'
+    MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', 'models')
+    ONNX_QUANTIZE = os.getenv('ONNX_QUANTIZE', 'True').lower() == 'true'
+    ONNX_NUM_THREADS = int(os.getenv('ONNX_NUM_THREADS', '0'))  # 0 lets onnxruntime decide
+    
+    # Shared model server ('unix:/path/to.sock' or 'host:port'; empty = in-process model)
+    EMOTION_SERVER_ADDRESS = os.getenv('EMOTION_SERVER_ADDRESS', '')
+    EMOTION_SERVER_THREADS = int(os.getenv('EMOTION_SERVER_THREADS', '4'))
+    EMOTION_SERVER_TIMEOUT = float(os.getenv('EMOTION_SERVER_TIMEOUT', '5'))
+    
+    # Cascade: cheap first-stage model; inputs below the margin escalate to the transformer
+    CASCADE_WEIGHTS_PATH = os.getenv('CASCADE_WEIGHTS_PATH', '')  # built by python -m emotion.distill_cascade
+    CASCADE_MARGIN = float(os.getenv('CASCADE_MARGIN', '0.5'))
+    
+    # Long texts are scored in overlapping token windows and aggregated ('mean', 'max' or 'length')
+    TEXT_CHUNK_MAX_TOKENS = int(os.getenv('TEXT_CHUNK_MAX_TOKENS', '256'))
+    TEXT_CHUNK_STRIDE = int(os.getenv('TEXT_CHUNK_STRIDE', '32'))
+    TEXT_CHUNK_AGGREGATE = os.getenv('TEXT_CHUNK_AGGREGATE', 'length')
+    
+    # Text prediction memo (process-wide LRU with TTL)
+    TEXT_CACHE_MAX_SIZE = int(os.getenv('TEXT_CACHE_MAX_SIZE', '2048'))
+    TEXT_CACHE_TTL = int(os.getenv('TEXT_CACHE_TTL', '3600'))  # seconds
+    
+    # Persistent prediction store shared across processes and restarts
+    PREDICTION_STORE_ENABLED = os.getenv('PREDICTION_STORE_ENABLED', 'False').lower() == 'true'
+    PREDICTION_STORE_PATH = os.getenv('PREDICTION_STORE_PATH', 'prediction_cache.db')
+    PREDICTION_STORE_MAX_ENTRIES = int(os.getenv('PREDICTION_STORE_MAX_ENTRIES', '200000'))
+    PREDICTION_STORE_MAX_AGE = int(os.getenv('PREDICTION_STORE_MAX_AGE', str(30 * 24 * 3600)))  # seconds
+    
+    # Text model micro-batching (coalesces concurrent sessions into one forward pass)
+    TEXT_BATCHING_ENABLED = os.getenv('TEXT_BATCHING_ENABLED', 'False').lower() == 'true'
+    TEXT_BATCH_WINDOW_MS = int(os.getenv('TEXT_BATCH_WINDOW_MS', '10'))
+    TEXT_BATCH_MAX_SIZE = int(os.getenv('TEXT_BATCH_MAX_SIZE', '16'))
+    
     # UI
     SONGS_PER_PAGE = 10
     HISTORY_DAYS_DEFAULT = 30
@@ -6,23 +6,35 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SONG_COLUMNS = ('title', 'artist', 'spotify_id', 'preview_url', 'external_url',
+                'album_image', 'duration_ms', 'popularity')
+
 class DatabaseManager:
-    def __init__(self):
-        self.session = None
+    """Database operations, each run as its own short unit of work
+    
+    Sessions are thread-local (scoped_session) and removed after every
+    operation, so concurrent Streamlit sessions never share one and
+    identity maps do not grow across requests. Pass an engine to work
+    against a database other than DATABASE_URL.
+    """
+    
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.sessions = scoped_session(create_session_factory(engine)) if engine is not None else ScopedSession
+    
+    def session_scope(self):
+        """Context manager yielding a session that commits on exit and rolls back on error"""
+        return session_scope(self.sessions)
     
     def get_session(self):
-        if not self.session:
-            self.session = get_db_session()
-        return self.session
+        """This thread's session for ad-hoc queries; release it with close_session()"""
+        return self.sessions()
     
     def close_session(self):
-        if self.session:
-            self.session.close()
-            self.session = None
+        self.sessions.remove()
     
     # User operations
     def create_user(self, username, email, password):
-        session = self.get_session()
         try:
             # Hash password
             password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -32,19 +44,18 @@ class DatabaseManager:
                 email=email,
                 password_hash=password_hash
             )
-            session.add(user)
-            session.commit()
+            with self.session_scope() as session:
+                session.add(user)
             logger.info(f"User created: {username}")
             return user
         except Exception as e:
-            session.rollback()
             logger.error(f"Error creating user: {e}")
             return None
     
     def authenticate_user(self, username, password):
-        session = self.get_session()
         try:
-            user = session.query(User).filter(User.username == username).first()
+            with self.session_scope() as session:
+                user = session.query(User).filter(User.username == username).first()
             if user and bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
                 logger.info(f"User authenticated: {username}")
                 return user
@@ -54,36 +65,34 @@ class DatabaseManager:
             return None
     
     def get_user_by_id(self, user_id):
-        session = self.get_session()
-        return session.query(User).filter(User.id == user_id).first()
+        with self.session_scope() as session:
+            return session.query(User).filter(User.id == user_id).first()
     
     def update_spotify_tokens(self, user_id, access_token, refresh_token, expires_in):
-        session = self.get_session()
         try:
-            user = session.query(User).filter(User.id == user_id).first()
-            if user:
-                user.spotify_access_token = access_token
-                user.spotify_refresh_token = refresh_token
-                user.spotify_token_expires = datetime.utcnow() + timedelta(seconds=expires_in)
-                session.commit()
-                return True
-            return False
+            with self.session_scope() as session:
+                user = session.query(User).filter(User.id == user_id).first()
+                if user:
+                    user.spotify_access_token = access_token
+                    user.spotify_refresh_token = refresh_token
+                    user.spotify_token_expires = datetime.utcnow() + timedelta(seconds=expires_in)
+                    return True
+                return False
         except Exception as e:
-            session.rollback()
             logger.error(f"Error updating Spotify tokens: {e}")
             return False
     
     # Emotion operations
     def get_all_emotions(self):
-        session = self.get_session()
-        return session.query(Emotion).all()
+        with self.session_scope() as session:
+            return session.query(Emotion).all()
     
     def get_emotion_by_name(self, name):
-        session = self.get_session()
-        return session.query(Emotion).filter(Emotion.name.ilike(f"%{name}%")).first()
+        # Names are stored lowercase; an exact match uses the unique index instead of a full scan
+        with self.session_scope() as session:
+            return session.query(Emotion).filter(Emotion.name == name.strip().lower()).first()
     
     def create_emotion_log(self, user_id, emotion_id, input_text, input_type, confidence_score):
-        session = self.get_session()
         try:
             emotion_log = EmotionLog(
                 user_id=user_id,
@@ -92,46 +101,86 @@ class DatabaseManager:
                 input_type=input_type,
                 confidence_score=confidence_score
             )
-            session.add(emotion_log)
-            session.commit()
+            with self.session_scope() as session:
+                session.add(emotion_log)
             return emotion_log
         except Exception as e:
-            session.rollback()
             logger.error(f"Error creating emotion log: {e}")
             return None
     
     # Song operations
     def add_or_get_song(self, title, artist, spotify_id=None, preview_url=None, 
                        external_url=None, album_image=None, duration_ms=None, popularity=None):
-        session = self.get_session()
         try:
-            # Check if song exists
-            existing_song = None
-            if spotify_id:
-                existing_song = session.query(Song).filter(Song.spotify_id == spotify_id).first()
-            
-            if not existing_song:
-                song = Song(
-                    title=title,
-                    artist=artist,
-                    spotify_id=spotify_id,
-                    preview_url=preview_url,
-                    external_url=external_url,
-                    album_image=album_image,
-                    duration_ms=duration_ms,
-                    popularity=popularity
-                )
-                session.add(song)
-                session.commit()
-                return song
-            return existing_song
+            with self.session_scope() as session:
+                # Check if song exists
+                existing_song = None
+                if spotify_id:
+                    existing_song = session.query(Song).filter(Song.spotify_id == spotify_id).first()
+                
+                if not existing_song:
+                    song = Song(
+                        title=title,
+                        artist=artist,
+                        spotify_id=spotify_id,
+                        preview_url=preview_url,
+                        external_url=external_url,
+                        album_image=album_image,
+                        duration_ms=duration_ms,
+                        popularity=popularity
+                    )
+                    session.add(song)
+                    return song
+                return existing_song
         except Exception as e:
-            session.rollback()
             logger.error(f"Error adding song: {e}")
             return None
     
+    def upsert_songs(self, songs):
+        """Insert or refresh a page of song dicts by spotify_id; return {spotify_id: song id}
+        
+        SQLite and PostgreSQL get one INSERT ... ON CONFLICT DO UPDATE for the
+        whole page. Songs without a spotify_id are skipped.
+        """
+        rows = {}
+        for song in songs:
+            if song.get('spotify_id'):
+                # One row per id: a statement may not update the same row twice
+                rows[song['spotify_id']] = {column: song.get(column) for column in SONG_COLUMNS}
+        if not rows:
+            return {}
+        
+        try:
+            with self.session_scope() as session:
+                dialect = session.get_bind().dialect.name
+                if dialect == 'sqlite':
+                    from sqlalchemy.dialects.sqlite import insert
+                elif dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    insert = None
+                
+                if insert is not None:
+                    statement = insert(Song).values(list(rows.values()))
+                    statement = statement.on_conflict_do_update(
+                        index_elements=[Song.spotify_id],
+                        set_={column: statement.excluded[column] for column in SONG_COLUMNS if column != 'spotify_id'}
+                    )
+                    session.execute(statement)
+                else:
+                    # No portable upsert: insert only the songs that are missing
+                    existing = {spotify_id for (spotify_id,) in session.query(Song.spotify_id).filter(
+                        Song.spotify_id.in_(rows)
+                    )}
+                    session.add_all(Song(**row) for spotify_id, row in rows.items() if spotify_id not in existing)
+                    session.flush()
+                
+                return dict(session.query(Song.spotify_id, Song.id).filter(Song.spotify_id.in_(rows)).all())
+        except Exception as e:
+            logger.error(f"Error upserting songs: {e}")
+            return {}
+    
     def log_song_interaction(self, user_id, song_id, emotion_id, input_type, confidence_score, liked=None):
-        session = self.get_session()
         try:
             interaction = UserSongHistory(
                 user_id=user_id,
@@ -141,70 +190,82 @@ class DatabaseManager:
                 input_type=input_type,
                 confidence_score=confidence_score
             )
-            session.add(interaction)
-            session.commit()
+            with self.session_scope() as session:
+                session.add(interaction)
             return interaction
         except Exception as e:
-            session.rollback()
             logger.error(f"Error logging song interaction: {e}")
             return None
     
     def update_song_feedback(self, user_id, song_id, liked):
-        session = self.get_session()
         try:
-            # Find the most recent interaction
-            interaction = session.query(UserSongHistory).filter(
-                UserSongHistory.user_id == user_id,
-                UserSongHistory.song_id == song_id
-            ).order_by(UserSongHistory.played_at.desc()).first()
-            
-            if interaction:
-                interaction.liked = liked
-                session.commit()
-                return True
-            return False
+            with self.session_scope() as session:
+                # Find the most recent interaction
+                interaction = session.query(UserSongHistory).filter(
+                    UserSongHistory.user_id == user_id,
+                    UserSongHistory.song_id == song_id
+                ).order_by(UserSongHistory.played_at.desc()).first()
+                
+                if interaction:
+                    interaction.liked = liked
+                    return True
+                return False
         except Exception as e:
-            session.rollback()
             logger.error(f"Error updating song feedback: {e}")
             return False
     
+    def delete_user_data(self, user_id, delete_account=False):
+        """Delete a user's emotion logs and song history, and the user too with delete_account
+        
+        Flush the event writer first, or rows still queued for this user are
+        written after the delete.
+        """
+        try:
+            with self.session_scope() as session:
+                session.query(EmotionLog).filter(EmotionLog.user_id == user_id).delete()
+                session.query(UserSongHistory).filter(UserSongHistory.user_id == user_id).delete()
+                if delete_account:
+                    session.query(User).filter(User.id == user_id).delete()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting data for user {user_id}: {e}")
+            return False
+    
     # Analytics operations
     def get_user_emotion_history(self, user_id, days=30):
-        session = self.get_session()
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        return session.query(
-            EmotionLog.detected_at,
-            Emotion.name,
-            Emotion.color_code,
-            EmotionLog.confidence_score
-        ).join(Emotion).filter(
-            EmotionLog.user_id == user_id,
-            EmotionLog.detected_at >= cutoff_date
-        ).order_by(EmotionLog.detected_at.desc()).all()
+        with self.session_scope() as session:
+            return session.query(
+                EmotionLog.detected_at,
+                Emotion.name,
+                Emotion.color_code,
+                EmotionLog.confidence_score
+            ).join(Emotion).filter(
+                EmotionLog.user_id == user_id,
+                EmotionLog.detected_at >= cutoff_date
+            ).order_by(EmotionLog.detected_at.desc()).all()
     
     def get_user_song_history(self, user_id, limit=50):
-        session = self.get_session()
-        
-        return session.query(
-            UserSongHistory.played_at,
-            Song.title,
-            Song.artist,
-            Song.album_image,
-            Emotion.name.label('emotion'),
-            Emotion.color_code,
-            UserSongHistory.liked,
-            UserSongHistory.input_type
-        ).join(Song).join(Emotion).filter(
-            UserSongHistory.user_id == user_id
-        ).order_by(UserSongHistory.played_at.desc()).limit(limit).all()
+        with self.session_scope() as session:
+            return session.query(
+                UserSongHistory.played_at,
+                Song.title,
+                Song.artist,
+                Song.album_image,
+                Emotion.name.label('emotion'),
+                Emotion.color_code,
+                UserSongHistory.liked,
+                UserSongHistory.input_type
+            ).join(Song).join(Emotion).filter(
+                UserSongHistory.user_id == user_id
+            ).order_by(UserSongHistory.played_at.desc()).limit(limit).all()
     
     def get_predefined_songs_for_emotion(self, emotion_id, limit=10):
-        session = self.get_session()
-        
-        return session.query(Song).join(PredefinedPlaylist).filter(
-            PredefinedPlaylist.emotion_id == emotion_id
-        ).order_by(PredefinedPlaylist.priority.desc()).limit(limit).all()
+        with self.session_scope() as session:
+            return session.query(Song).join(PredefinedPlaylist).filter(
+                PredefinedPlaylist.emotion_id == emotion_id
+            ).order_by(PredefinedPlaylist.priority.desc()).limit(limit).all()
 
 # Global database manager instance
 db_manager = DatabaseManager()
\ No newline at end of file
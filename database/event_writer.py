@@ -0,0 +1,192 @@
+"""
+Write-behind writer for emotion logs and song interactions
+The request path only enqueues a row and returns; a background thread
+inserts queued rows in batches (every batch_size rows or flush_ms after the
+first one) with one executemany and one commit per batch. A full queue
+blocks callers for up to enqueue_timeout seconds before refusing the event,
+and queued rows are drained when the process exits.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+from database.database import db_manager
+from database.models import EmotionLog, UserSongHistory
+from utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class EventWriter:
+    """Background worker batching EmotionLog and UserSongHistory inserts
+    
+    With enabled=False every enqueue writes synchronously, which keeps the
+    same interface for scripts and tests that need rows visible at once.
+    """
+    
+    def __init__(self, manager=None, batch_size=None, flush_ms=None, max_queue=None,
+                 enqueue_timeout=None, enabled=None, retries=3, name="event-writer"):
+        self.manager = manager or db_manager
+        self.batch_size = batch_size or Config.EVENT_BATCH_SIZE
+        self.window = (flush_ms if flush_ms is not None else Config.EVENT_FLUSH_MS) / 1000.0
+        self.enqueue_timeout = enqueue_timeout if enqueue_timeout is not None else Config.EVENT_ENQUEUE_TIMEOUT
+        self.enabled = enabled if enabled is not None else Config.EVENT_WRITER_ENABLED
+        self.retries = retries
+        self.name = name
+        
+        self.queue = queue.Queue(maxsize=max_queue or Config.EVENT_QUEUE_SIZE)
+        self.worker = None
+        self.lock = threading.Lock()
+        
+        self.counters = Counter('enqueued', 'written', 'rejected', 'failed', 'batches')
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256, 512])
+    
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self.lock:
+            if self.worker and self.worker.is_alive():
+                return
+            self.worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.worker.start()
+    
+    def close(self, timeout=None):
+        """Write everything queued so far, then stop the worker"""
+        with self.lock:
+            worker = self.worker
+            self.worker = None
+        if worker and worker.is_alive():
+            self.queue.put(_STOP)
+            worker.join(timeout)
+    
+    def flush(self):
+        """Block until every event enqueued so far has been written (or dropped)"""
+        if self.worker and self.worker.is_alive():
+            self.queue.join()
+    
+    def enqueue_emotion_log(self, user_id, emotion_id, input_text, input_type, confidence_score):
+        """Queue an EmotionLog row; True once accepted, False if the queue stayed full"""
+        return self._enqueue(EmotionLog, {
+            'user_id': user_id,
+            'emotion_id': emotion_id,
+            'input_text': input_text,
+            'input_type': input_type,
+            'confidence_score': confidence_score,
+            # Stamped now so batching never shifts when an event happened
+            'detected_at': datetime.utcnow()
+        })
+    
+    def enqueue_song_interaction(self, user_id, song_id, emotion_id, input_type, confidence_score, liked=None):
+        """Queue a UserSongHistory row; True once accepted, False if the queue stayed full"""
+        return self._enqueue(UserSongHistory, {
+            'user_id': user_id,
+            'song_id': song_id,
+            'emotion_id': emotion_id,
+            'liked': liked,
+            'input_type': input_type,
+            'confidence_score': confidence_score,
+            'played_at': datetime.utcnow()
+        })
+    
+    def _enqueue(self, model, row):
+        if not self.enabled:
+            return self._write([(model, row)])
+        
+        self.start()
+        try:
+            self.queue.put((model, row), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.counters.inc('rejected')
+            logger.warning(f"{self.name} queue full, dropping {model.__tablename__} event")
+            return False
+        self.counters.inc('enqueued')
+        return True
+    
+    def stats(self):
+        stats = self.counters.snapshot()
+        stats['pending'] = self.queue.qsize()
+        stats['batch_size'] = self.batch_sizes.snapshot()
+        return stats
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is _STOP:
+                self.queue.task_done()
+                break
+            
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    self.queue.task_done()
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            self._process(batch)
+        
+        # Drain anything enqueued before the stop request
+        pending = []
+        while True:
+            try:
+                entry = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self.queue.task_done()
+            else:
+                pending.append(entry)
+        for start in range(0, len(pending), self.batch_size):
+            self._process(pending[start:start + self.batch_size])
+    
+    def _process(self, batch):
+        try:
+            self._write(batch)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+    
+    def _write(self, batch):
+        """Insert a batch with one executemany per table and a single commit"""
+        rows = {}
+        for model, row in batch:
+            rows.setdefault(model, []).append(row)
+        
+        for attempt in range(self.retries):
+            try:
+                with self.manager.session_scope() as session:
+                    for model, mappings in rows.items():
+                        session.bulk_insert_mappings(model, mappings)
+                self.counters.inc('written', len(batch))
+                self.counters.inc('batches')
+                self.batch_sizes.observe(len(batch))
+                return True
+            except Exception as e:
+                # Usually a locked SQLite file: back off and retry the whole batch
+                logger.warning(f"{self.name} batch of {len(batch)} failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.retries:
+                    time.sleep(0.05 * 2 ** attempt)
+        
+        self.counters.inc('failed', len(batch))
+        logger.error(f"{self.name} dropped {len(batch)} events after {self.retries} attempts")
+        return False
+
+# Global instance
+event_writer = EventWriter()
+atexit.register(event_writer.close)
@@ -1,5 +1,7 @@
 from database.models import create_tables, get_db_session
 from database.models import User, Emotion, Song, PredefinedPlaylist
+from database.migrations import migrate
+from emotion.catalog import emotion_catalog
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +14,9 @@ def initialize_database():
         create_tables()
         logger.info("Database tables created successfully")
         
+        # Bring databases created by older versions up to date
+        migrate()
+        
         # Add default emotions
         session = get_db_session()
         
@@ -77,6 +82,9 @@ def initialize_database():
         session.commit()
         session.close()
         logger.info("Sample songs added successfully")
+        
+        # The emotions table may have changed under a running app
+        emotion_catalog.reload()
         logger.info("Database initialization completed")
         
     except Exception as e:
@@ -0,0 +1,101 @@
+"""
+Versioned schema migrations
+Each migration runs once, in order, inside its own transaction and records
+its version in the schema_version table. create_tables() still builds a
+fresh database from the models; migrate() brings existing databases up to
+the same schema. Migrations must be idempotent for that reason.
+
+Run from the project root: python -m database.migrations [--target N]
+"""
+
+import argparse
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select
+
+from database import models
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', 'version description upgrade')
+
+version_metadata = MetaData()
+schema_version = Table(
+    'schema_version', version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def create_model_indexes(*names):
+    """Upgrade step creating the named indexes declared on the models, skipping existing ones"""
+    def upgrade(connection):
+        indexes = {index.name: index for table in models.Base.metadata.sorted_tables for index in table.indexes}
+        for name in names:
+            indexes[name].create(connection, checkfirst=True)
+    return upgrade
+
+
+MIGRATIONS = [
+    Migration(1, "Composite indexes for history, feedback and playlist lookups", create_model_indexes(
+        'ix_emotion_logs_user_detected',
+        'ix_user_song_history_user_played',
+        'ix_user_song_history_user_song_played',
+        'ix_predefined_playlists_emotion_priority',
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(engine=None):
+    """Highest applied migration, 0 for a database that was never migrated"""
+    engine = engine or models.engine
+    if not inspect(engine).has_table(schema_version.name):
+        return 0
+    with engine.connect() as connection:
+        return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def migrate(engine=None, target=None):
+    """Apply pending migrations up to target (the latest by default); return applied versions
+    
+    Application tables must already exist (create_tables). A second process
+    migrating at the same time fails on the schema_version primary key and
+    rolls back its copy of the step.
+    """
+    engine = engine or models.engine
+    target = LATEST_VERSION if target is None else target
+    schema_version.create(engine, checkfirst=True)
+    
+    current = current_version(engine)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= current or migration.version > target:
+            continue
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(schema_version.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+        logger.info(f"Applied migration {migration.version}: {migration.description}")
+        applied.append(migration.version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--target', type=int, help="stop at this version (default: latest)")
+    args = parser.parse_args()
+    
+    applied = migrate(target=args.target)
+    print(f"Applied {applied or 'nothing'}; schema version {current_version()}")
+
+
+if __name__ == '__main__':
+    main()
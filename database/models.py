@@ -1,9 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, event, Column, Index, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, scoped_session, sessionmaker
+from contextlib import contextmanager
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from config import Config
 
 load_dotenv()
 
@@ -67,6 +70,13 @@ class UserSongHistory(Base):
     input_type = Column(String(20), nullable=False)  # 'text', 'audio_file', 'live_audio'
     confidence_score = Column(Float, nullable=True)
     
+    __table_args__ = (
+        # Covers get_user_song_history: newest plays of one user without touching the table
+        Index('ix_user_song_history_user_played', 'user_id', 'played_at', 'song_id', 'emotion_id', 'liked', 'input_type'),
+        # update_song_feedback: latest play of one song by one user
+        Index('ix_user_song_history_user_song_played', 'user_id', 'song_id', 'played_at'),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="song_history")
     song = relationship("Song", back_populates="song_history")
@@ -83,6 +93,11 @@ class EmotionLog(Base):
     confidence_score = Column(Float, nullable=False)
     detected_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Covers get_user_emotion_history: one user's logs in a time window
+        Index('ix_emotion_logs_user_detected', 'user_id', 'detected_at', 'emotion_id', 'confidence_score'),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="emotion_logs")
     emotion = relationship("Emotion", back_populates="emotion_logs")
@@ -95,27 +110,87 @@ class PredefinedPlaylist(Base):
     song_id = Column(Integer, ForeignKey('songs.id'), nullable=False)
     priority = Column(Integer, default=0)  # Higher priority songs shown first
     
+    __table_args__ = (
+        # Covers get_predefined_songs_for_emotion: one emotion's songs by priority
+        Index('ix_predefined_playlists_emotion_priority', 'emotion_id', 'priority', 'song_id'),
+    )
+    
     # Relationships
     emotion = relationship("Emotion", back_populates="predefined_playlists")
     song = relationship("Song", back_populates="playlist_songs")
 
 # Database engine and session
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///emosound.db')
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run while one writer commits; NORMAL syncs at checkpoints only
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
+
+def create_db_engine(url=None, **overrides):
+    """Engine with a bounded, pre-pinged, recycled connection pool
+    
+    File-backed SQLite databases also get WAL, synchronous=NORMAL and mmap
+    pragmas on every new connection. Keyword arguments override the pool
+    settings from Config.
+    """
+    url = make_url(url or DATABASE_URL)
+    options = {
+        'pool_pre_ping': Config.DB_POOL_PRE_PING,
+        'pool_recycle': Config.DB_POOL_RECYCLE,
+    }
+    sqlite = url.get_backend_name() == 'sqlite'
+    in_memory = sqlite and url.database in (None, '', ':memory:')
+    if not in_memory:
+        # In-memory SQLite lives in a single connection, so it keeps its default pool
+        options.update({
+            'pool_size': Config.DB_POOL_SIZE,
+            'max_overflow': Config.DB_MAX_OVERFLOW,
+            'pool_timeout': Config.DB_POOL_TIMEOUT,
+        })
+    if sqlite:
+        # Pooled connections are handed between Streamlit's script threads
+        options['connect_args'] = {'check_same_thread': False}
+    options.update(overrides)
+    
+    db_engine = create_engine(url, echo=False, **options)
+    if sqlite and not in_memory:
+        event.listen(db_engine, 'connect', _set_sqlite_pragmas)
+    return db_engine
+
+def create_session_factory(db_engine):
+    """Session factory whose objects stay readable after their unit of work commits and closes"""
+    return sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=db_engine)
+
+engine = create_db_engine(DATABASE_URL)
+SessionLocal = create_session_factory(engine)
+# One session per thread, so concurrent Streamlit scripts never share an identity map
+ScopedSession = scoped_session(SessionLocal)
 
 def get_db_session():
-    session = SessionLocal()
+    """A new session; the caller closes it (prefer session_scope)"""
+    return SessionLocal()
+
+@contextmanager
+def session_scope(sessions=None):
+    """One unit of work: commit on success, roll back on error, always close
+    
+    sessions is a scoped_session registry (ScopedSession by default).
+    """
+    sessions = sessions or ScopedSession
+    session = sessions()
     try:
-        return session
-    except Exception as e:
+        yield session
+        session.commit()
+    except Exception:
         session.rollback()
-        raise e
+        raise
     finally:
-        pass  # Don't close here, let caller handle it
+        sessions.remove()
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
-
-
-    
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+Acoustic (tone of voice) emotion classification
+Prosody features are computed for a whole batch of clips with one STFT, one
+YIN pitch track and vectorized per-clip statistics, then scored by a small
+standardized linear softmax model. Transcription is not needed, so this can
+run alongside speech recognition or replace it.
+
+Weights file format (.npz, written by AcousticEmotionClassifier.save):
+    format_version  int, currently 1
+    feature_names   unicode [n_features], must match FEATURE_NAMES
+    mean            float32 [n_features], feature standardization
+    scale           float32 [n_features]
+    weights         float32 [n_features, n_labels]
+    bias            float32 [n_labels]
+    labels          unicode [n_labels], app emotion names in column order
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import Config
+from emotion.audio_preprocessing import resample, to_mono_float32
+from emotion.text_emotion import EmotionResult
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+FEATURE_SAMPLE_RATE = 16000
+N_FFT = 512
+HOP_LENGTH = 256
+N_MELS = 40
+N_MFCC = 13
+PITCH_RANGE = (65.0, 400.0)  # Hz, covers adult speaking voices
+
+FEATURE_NAMES = (
+    [f'mfcc{i}_mean' for i in range(N_MFCC)]
+    + [f'mfcc{i}_std' for i in range(N_MFCC)]
+    + ['energy_mean_db', 'energy_std_db', 'energy_max_db',
+       'pitch_mean', 'pitch_std', 'pitch_range', 'voiced_fraction',
+       'zero_crossing_rate', 'spectral_centroid',
+       'onset_rate', 'tempo']
+)
+
+# Acoustic scoring never waits behind transcription or segment workers
+acoustic_executor = ThreadPoolExecutor(
+    max_workers=Config.AUDIO_STREAMING_WORKERS,
+    thread_name_prefix="acoustic"
+)
+
+
+def _to_feature_rate(clip, sample_rate):
+    """Mono float32 in [-1, 1] at FEATURE_SAMPLE_RATE"""
+    clip = np.asarray(clip)
+    is_integer = np.issubdtype(clip.dtype, np.integer)
+    samples = to_mono_float32(clip)
+    if is_integer:
+        samples *= 1.0 / 32768
+    return resample(samples, sample_rate, FEATURE_SAMPLE_RATE)
+
+
+def extract_features(clips, sample_rate):
+    """(len(clips), len(FEATURE_NAMES)) float32 prosody features
+    
+    Clips are zero-padded to the longest one and analyzed as one 2-D batch;
+    statistics only cover each clip's own frames.
+    """
+    import librosa
+    
+    clips = [_to_feature_rate(clip, sample_rate) for clip in clips]
+    if not clips:
+        return np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32)
+    
+    lengths = np.array([len(clip) for clip in clips])
+    batch = np.zeros((len(clips), max(int(lengths.max()), N_FFT * 2)), dtype=np.float32)
+    for row, clip in enumerate(clips):
+        batch[row, :len(clip)] = clip
+    
+    rate = FEATURE_SAMPLE_RATE
+    power = np.abs(librosa.stft(batch, n_fft=N_FFT, hop_length=HOP_LENGTH)) ** 2
+    log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=rate, n_mels=N_MELS))
+    mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=N_MFCC)
+    onset_envelope = librosa.onset.onset_strength(S=log_mel, sr=rate, hop_length=HOP_LENGTH)
+    f0 = librosa.yin(batch, fmin=PITCH_RANGE[0], fmax=PITCH_RANGE[1], sr=rate,
+                     frame_length=N_FFT * 2, hop_length=HOP_LENGTH)
+    
+    # Frame energy, zero crossings and centroid share the power spectrogram / one framing pass
+    energy_db = 10 * np.log10(power.sum(axis=1) / (N_FFT ** 2 / 2) + 1e-10)
+    frames = librosa.util.frame(np.pad(batch, ((0, 0), (N_FFT // 2, N_FFT // 2))),
+                                frame_length=N_FFT, hop_length=HOP_LENGTH)
+    signs = np.signbit(frames)
+    zero_crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (N_FFT - 1)
+    frequencies = librosa.fft_frequencies(sr=rate, n_fft=N_FFT)
+    centroid = np.einsum('f,bft->bt', frequencies, power) / (power.sum(axis=1) + 1e-10) / (rate / 2)
+    
+    features = np.zeros((len(clips), len(FEATURE_NAMES)), dtype=np.float32)
+    for row, length in enumerate(lengths):
+        n_frames = min(1 + length // HOP_LENGTH, mfcc.shape[-1])
+        energy = energy_db[row, :n_frames]
+        # Pitch is only meaningful in frames within 30 dB of the loudest one
+        voiced = energy > max(-50.0, energy.max() - 30)
+        pitch = np.log2(f0[row, :n_frames][voiced]) if voiced.any() else np.zeros(1)
+        envelope = onset_envelope[row, :n_frames]
+        onsets = librosa.util.peak_pick(envelope, pre_max=3, post_max=3, pre_avg=3, post_avg=5,
+                                        delta=0.5, wait=5) if n_frames > 10 else []
+        tempo = librosa.feature.tempo(onset_envelope=envelope, sr=rate, hop_length=HOP_LENGTH)[0] \
+            if n_frames > 10 else 0.0
+        seconds = max(length / rate, 1e-3)
+        
+        features[row] = np.concatenate([
+            mfcc[row, :, :n_frames].mean(axis=1),
+            mfcc[row, :, :n_frames].std(axis=1),
+            [energy.mean(), energy.std(), energy.max(),
+             pitch.mean(), pitch.std(), np.percentile(pitch, 90) - np.percentile(pitch, 10),
+             voiced.mean(),
+             zero_crossings[row, :n_frames].mean(), centroid[row, :n_frames].mean(),
+             len(onsets) / seconds, tempo / 60.0]
+        ])
+    return features
+
+
+class AcousticEmotionClassifier:
+    """Linear softmax classifier over standardized prosody features"""
+    
+    def __init__(self, labels, mean=None, scale=None, weights=None, bias=None):
+        n_features = len(FEATURE_NAMES)
+        self.labels = [str(label) for label in labels]
+        self.mean = np.zeros(n_features, dtype=np.float32) if mean is None else np.asarray(mean, dtype=np.float32)
+        self.scale = np.ones(n_features, dtype=np.float32) if scale is None else np.asarray(scale, dtype=np.float32)
+        self.weights = (np.zeros((n_features, len(self.labels)), dtype=np.float32)
+                        if weights is None else np.asarray(weights, dtype=np.float32))
+        self.bias = (np.zeros(len(self.labels), dtype=np.float32)
+                     if bias is None else np.asarray(bias, dtype=np.float32))
+    
+    def _standardize(self, features):
+        return (np.asarray(features, dtype=np.float32) - self.mean) / self.scale
+    
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+    
+    def predict_proba(self, features):
+        """(n_clips, n_labels) array of emotion probabilities"""
+        return self._softmax(self._standardize(features) @ self.weights + self.bias)
+    
+    def predict(self, features):
+        """Emotion score dicts, in the same format as text EmotionResult.scores"""
+        return [dict(zip(self.labels, row.tolist())) for row in self.predict_proba(features)]
+    
+    def fit(self, features, targets, epochs=500, learning_rate=0.1, l2=1e-3):
+        """Full-batch gradient descent on cross-entropy; targets are emotion names"""
+        features = np.asarray(features, dtype=np.float32)
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0) + 1e-6
+        standardized = self._standardize(features)
+        
+        index = {label: column for column, label in enumerate(self.labels)}
+        one_hot = np.zeros((len(targets), len(self.labels)), dtype=np.float32)
+        one_hot[np.arange(len(targets)), [index[target] for target in targets]] = 1.0
+        
+        for epoch in range(epochs):
+            probabilities = self._softmax(standardized @ self.weights + self.bias)
+            error = (probabilities - one_hot) / len(targets)
+            self.weights -= learning_rate * (standardized.T @ error + l2 * self.weights)
+            self.bias -= learning_rate * error.sum(axis=0)
+        
+        loss = -float(np.mean(np.sum(one_hot * np.log(probabilities + 1e-12), axis=1)))
+        logger.info(f"Acoustic classifier trained on {len(targets)} clips: loss {loss:.4f}")
+        return self
+    
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                format_version=np.int64(FORMAT_VERSION),
+                feature_names=np.array(FEATURE_NAMES),
+                mean=self.mean,
+                scale=self.scale,
+                weights=self.weights,
+                bias=self.bias,
+                labels=np.array(self.labels)
+            )
+        return path
+    
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported acoustic weights format {version}")
+            if data['feature_names'].tolist() != FEATURE_NAMES:
+                raise ValueError("Acoustic weights were trained on a different feature set")
+            return cls(
+                labels=data['labels'].tolist(),
+                mean=data['mean'],
+                scale=data['scale'],
+                weights=data['weights'],
+                bias=data['bias']
+            )
+
+
+class AcousticEmotionDetector:
+    """Scores raw audio with an AcousticEmotionClassifier"""
+    
+    def __init__(self, classifier, fingerprint=''):
+        self.classifier = classifier
+        self.fingerprint = fingerprint
+    
+    @classmethod
+    def from_path(cls, path):
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        return cls(AcousticEmotionClassifier.load(path), fingerprint=digest)
+    
+    def analyze_batch(self, clips, sample_rate):
+        """EmotionResult per clip, with one feature extraction pass for the batch"""
+        results = []
+        for scores in self.classifier.predict(extract_features(clips, sample_rate)):
+            emotion = max(scores, key=scores.get)
+            results.append(EmotionResult(emotion, scores[emotion], scores))
+        return results
+    
+    def analyze(self, audio, sample_rate):
+        return self.analyze_batch([audio], sample_rate)[0]
+
+
+def fuse_results(text_result, acoustic_result, text_weight=0.6):
+    """Weighted sum of text and acoustic emotion scores; either side may be None"""
+    if acoustic_result is None or acoustic_result.emotion is None:
+        return text_result
+    if text_result is None or text_result.emotion is None:
+        return acoustic_result
+    
+    scores = {emotion: text_weight * score for emotion, score in text_result.scores.items()}
+    for emotion, score in acoustic_result.scores.items():
+        scores[emotion] = scores.get(emotion, 0.0) + (1 - text_weight) * score
+    emotion = max(scores, key=scores.get)
+    return EmotionResult(emotion, scores[emotion], scores)
@@ -0,0 +1,171 @@
+"""
+Speech recognition backends for AudioEmotionDetector
+Every backend takes a speech_recognition AudioData and returns the transcript
+or None, and records its own latency histogram and outcome counters.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import speech_recognition as sr
+
+from utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds; remote recognizers sit in the upper buckets
+ASR_LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+ASR_BACKENDS = ('google', 'sphinx', 'vosk', 'fake')
+
+
+class ASRBackend:
+    """Base class timing every transcription and counting its outcome"""
+    
+    name = 'base'
+    
+    def __init__(self):
+        self.latency = Histogram(ASR_LATENCY_BUCKETS)
+        self.counters = Counter('transcripts', 'no_speech', 'errors')
+    
+    def transcribe(self, audio):
+        """Return the transcript of an sr.AudioData, or None"""
+        start = time.perf_counter()
+        try:
+            text = self._transcribe(audio)
+        except Exception as e:
+            logger.error(f"{self.name} speech recognition failed: {e}")
+            self.counters.inc('errors')
+            text = None
+        else:
+            self.counters.inc('transcripts' if text else 'no_speech')
+        finally:
+            self.latency.observe((time.perf_counter() - start) * 1000)
+        return text or None
+    
+    def _transcribe(self, audio):
+        raise NotImplementedError
+    
+    def stats(self):
+        """Latency histogram in milliseconds plus outcome counters"""
+        stats = self.counters.snapshot()
+        stats['backend'] = self.name
+        stats['latency_ms'] = self.latency.snapshot()
+        return stats
+
+
+class GoogleASRBackend(ASRBackend):
+    """Google Web Speech API, falling back to Sphinx when Google hears nothing"""
+    
+    name = 'google'
+    
+    def __init__(self, recognizer=None, language='en-US', sphinx_fallback=True):
+        super().__init__()
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+        self.sphinx_fallback = sphinx_fallback
+    
+    def _transcribe(self, audio):
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            logger.warning("Google Speech Recognition could not understand audio")
+        
+        if not self.sphinx_fallback:
+            return None
+        try:
+            return self.recognizer.recognize_sphinx(audio)
+        except (sr.UnknownValueError, sr.RequestError):
+            logger.warning("Sphinx could not understand audio")
+            return None
+
+
+class SphinxASRBackend(ASRBackend):
+    """CMU PocketSphinx, fully offline"""
+    
+    name = 'sphinx'
+    
+    def __init__(self, recognizer=None, language='en-US'):
+        super().__init__()
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+    
+    def _transcribe(self, audio):
+        try:
+            return self.recognizer.recognize_sphinx(audio, language=self.language)
+        except sr.UnknownValueError:
+            return None
+
+
+class VoskASRBackend(ASRBackend):
+    """Offline Kaldi recognizer; the model is loaded once per process and path"""
+    
+    name = 'vosk'
+    
+    _models = {}
+    _models_lock = threading.Lock()
+    
+    def __init__(self, model_path, sample_rate=16000):
+        super().__init__()
+        import vosk
+        
+        self.vosk = vosk
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.model = self._load_model(model_path)
+    
+    @classmethod
+    def _load_model(cls, model_path):
+        with cls._models_lock:
+            if model_path not in cls._models:
+                import vosk
+                
+                start = time.perf_counter()
+                vosk.SetLogLevel(-1)
+                cls._models[model_path] = vosk.Model(model_path)
+                logger.info(f"Vosk model loaded from {model_path} in {time.perf_counter() - start:.1f}s")
+            return cls._models[model_path]
+    
+    def _transcribe(self, audio):
+        # Recognizers are cheap and not thread-safe; the model is shared
+        recognizer = self.vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        return json.loads(recognizer.FinalResult()).get('text', '').strip() or None
+
+
+class FakeASRBackend(ASRBackend):
+    """Deterministic backend for tests: transcripts keyed by the audio's sha1"""
+    
+    name = 'fake'
+    
+    def __init__(self, transcripts=None, default=None):
+        super().__init__()
+        self.transcripts = dict(transcripts or {})
+        self.default = default
+        self.calls = 0
+    
+    @staticmethod
+    def audio_key(audio):
+        return hashlib.sha1(audio.get_raw_data()).hexdigest()
+    
+    def _transcribe(self, audio):
+        self.calls += 1
+        return self.transcripts.get(self.audio_key(audio), self.default)
+
+
+def create_asr_backend(name, recognizer=None, language='en-US', vosk_model_path=None):
+    """Build the backend selected by name (see ASR_BACKENDS)"""
+    if name == 'google':
+        return GoogleASRBackend(recognizer, language=language)
+    if name == 'sphinx':
+        return SphinxASRBackend(recognizer, language=language)
+    if name == 'vosk':
+        if not vosk_model_path:
+            raise ValueError("VOSK_MODEL_PATH must point to an unpacked Vosk model")
+        return VoskASRBackend(vosk_model_path)
+    if name == 'fake':
+        return FakeASRBackend()
+    raise ValueError(f"Unknown ASR backend: {name}")
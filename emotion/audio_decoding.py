@@ -0,0 +1,108 @@
+"""
+Streaming decoder for uploaded audio files
+Files are decoded block by block with soundfile (WAV, FLAC, OGG, MP3 with
+libsndfile >= 1.1) or PyAV (M4A/AAC, WebM/Opus and anything FFmpeg reads),
+downmixed to int16 mono and cut off at a maximum duration. Neither the whole
+file nor the whole decoded signal is ever held in memory beyond that cap.
+"""
+
+import logging
+
+import numpy as np
+
+from config import Config
+from emotion.audio_preprocessing import to_mono_float32
+from utils.ring_buffer import AudioRingBuffer
+
+logger = logging.getLogger(__name__)
+
+BLOCK_FRAMES = 16384
+
+
+def _float_to_int16(block):
+    """float32 mono block in [-1, 1] to int16"""
+    np.clip(block, -1.0, 1.0, out=block)
+    block *= 32767
+    return block.astype(np.int16)
+
+
+def _soundfile_blocks(source, max_seconds, block_frames):
+    import soundfile as sf
+    
+    with sf.SoundFile(source) as audio:
+        sample_rate = audio.samplerate
+        for block in audio.blocks(blocksize=block_frames, dtype='float32', always_2d=True,
+                                  frames=int(max_seconds * sample_rate)):
+            yield _float_to_int16(to_mono_float32(block)), sample_rate
+
+
+def _pyav_blocks(source, max_seconds):
+    import av
+    
+    with av.open(source) as container:
+        stream = container.streams.audio[0]
+        sample_rate = stream.codec_context.sample_rate or stream.rate
+        # FFmpeg converts to packed s16 mono at the native rate while decoding
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=sample_rate)
+        remaining = int(max_seconds * sample_rate)
+        
+        for frame in container.decode(stream):
+            for converted in resampler.resample(frame):
+                block = np.frombuffer(converted.planes[0], dtype=np.int16)[:min(converted.samples, remaining)]
+                remaining -= len(block)
+                if len(block):
+                    yield block, sample_rate
+                if remaining == 0:
+                    return
+
+
+def iter_audio_blocks(source, max_seconds=None, block_frames=BLOCK_FRAMES):
+    """Yield (int16 mono block, sample_rate) from a path or seekable file object
+    
+    Decoding stops after max_seconds (MAX_AUDIO_DURATION by default).
+    soundfile is tried first and PyAV handles what it cannot open.
+    """
+    max_seconds = max_seconds or Config.MAX_AUDIO_DURATION
+    start = source.tell() if hasattr(source, 'tell') else None
+    try:
+        blocks = _soundfile_blocks(source, max_seconds, block_frames)
+        first = next(blocks, None)
+    except Exception as e:
+        logger.debug(f"soundfile cannot decode upload, trying PyAV: {e}")
+    else:
+        if first is not None:
+            yield first
+            yield from blocks
+        return
+    
+    if start is not None:
+        source.seek(start)
+    yield from _pyav_blocks(source, max_seconds)
+
+
+def decode_audio(source, max_seconds=None):
+    """(int16 mono samples, sample_rate) of at most max_seconds, or (None, None)
+    
+    Blocks are copied straight into one preallocated buffer sized for the cap.
+    The clip is materialised on purpose: VAD takes its noise floor from the
+    quietest frames of the whole clip, and ASR and the acoustic model score
+    it in one pass. Callers that can work block by block should use
+    iter_audio_blocks instead.
+    """
+    max_seconds = max_seconds or Config.MAX_AUDIO_DURATION
+    buffer, sample_rate = None, None
+    try:
+        for block, sample_rate in iter_audio_blocks(source, max_seconds):
+            if buffer is None:
+                buffer = AudioRingBuffer.for_duration(max_seconds, sample_rate)
+            buffer.write(block)
+    except Exception as e:
+        logger.error(f"Error decoding audio file: {e}")
+        return None, None
+    
+    if buffer is None or not len(buffer):
+        return None, None
+    samples = buffer.view()
+    if len(samples) >= int(max_seconds * sample_rate):
+        logger.info(f"Audio file truncated to {max_seconds}s")
+    return samples, sample_rate
@@ -1,10 +1,20 @@
 import speech_recognition as sr
 import streamlit as st
+import hashlib
 import io
+import json
 import numpy as np
 import wave
 import logging
+from config import Config
+from emotion.acoustic_emotion import AcousticEmotionDetector, acoustic_executor, fuse_results
+from emotion.asr import create_asr_backend
+from emotion.audio_decoding import decode_audio
+from emotion.audio_preprocessing import prepare_for_asr
 from emotion.text_emotion import text_emotion_detector
+from emotion.vad import VoiceActivityDetector
+from utils.disk_cache import SQLiteCache
+from utils.metrics import Counter
 
 logger = logging.getLogger(__name__)
 
@@ -18,85 +28,326 @@ class AudioEmotionDetector:
         self.recognizer.operation_timeout = None
         self.recognizer.phrase_threshold = 0.3
         self.recognizer.non_speaking_duration = 0.8
+        self.asr = self._create_asr_backend()
+        self.vad = None
+        if Config.VAD_ENABLED:
+            self.vad = VoiceActivityDetector(
+                threshold_db=Config.VAD_THRESHOLD_DB,
+                min_speech_ms=Config.VAD_MIN_SPEECH_MS
+            )
+        self.vad_counters = Counter('clips', 'rejected', 'trimmed_seconds')
+        self.acoustic = self._load_acoustic_detector()
+        self.acoustic_mode = Config.ACOUSTIC_MODE
+        self.cache = None
+        self.cache_options = None
     
-    def detect_emotion_from_webrtc_audio(self, audio_data, sample_rate=48000):
+    def _load_acoustic_detector(self):
+        """Tone-of-voice classifier when ACOUSTIC_WEIGHTS_PATH is set, otherwise None"""
+        if not Config.ACOUSTIC_WEIGHTS_PATH or Config.ACOUSTIC_MODE == 'off':
+            return None
+        try:
+            return AcousticEmotionDetector.from_path(Config.ACOUSTIC_WEIGHTS_PATH)
+        except Exception as e:
+            logger.error(f"Could not load acoustic emotion weights: {e}")
+            return None
+    
+    def set_acoustic_detector(self, detector, mode='fuse'):
+        """Use an AcousticEmotionDetector ('fuse' with the transcript or 'only'); None disables it"""
+        self.acoustic = detector
+        self.acoustic_mode = mode
+        self._reopen_result_cache()
+        return detector
+    
+    def result_fingerprint(self):
+        """Identifier for everything that shapes a result: ASR, VAD, text and acoustic models"""
+        identity = json.dumps({
+            'asr': self.asr.name,
+            'language': Config.ASR_LANGUAGE,
+            'asr_sample_rate': Config.ASR_SAMPLE_RATE,
+            'max_seconds': Config.MAX_AUDIO_DURATION,
+            'vad': vars(self.vad) if self.vad is not None else None,
+            'text': text_emotion_detector.model_fingerprint(),
+            'acoustic': getattr(self.acoustic, 'fingerprint', None) if self.acoustic is not None else None,
+            'acoustic_mode': self.acoustic_mode,
+            'text_weight': Config.ACOUSTIC_TEXT_WEIGHT
+        }, sort_keys=True)
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+    
+    def enable_result_cache(self, path, max_entries=10000, max_age=None):
+        """Remember results by content hash so repeated clips skip decoding, ASR and scoring"""
+        self.cache_options = (path, max_entries, max_age)
+        self.cache = SQLiteCache(
+            path,
+            namespace='audio_emotion',
+            fingerprint=self.result_fingerprint(),
+            max_entries=max_entries,
+            max_age=max_age
+        )
+        return self.cache
+    
+    def _reopen_result_cache(self):
+        # A new fingerprint invalidates results produced by the previous configuration
+        if self.cache_options is not None:
+            self.enable_result_cache(*self.cache_options)
+    
+    def _bound_cache(self):
+        """The result cache, reopened if the text model or any other fingerprinted setting changed"""
+        cache = self.cache
+        if cache is not None and cache.fingerprint != self.result_fingerprint():
+            logger.info("Audio pipeline configuration changed, rebinding result cache")
+            cache = self.enable_result_cache(cache.path, cache.max_entries, cache.max_age)
+        return cache
+    
+    def cache_stats(self):
+        """Hits, misses, hit rate and size of the result cache ({} when disabled)"""
+        return self.cache.stats() if self.cache is not None else {}
+    
+    @staticmethod
+    def _bytes_digest(data):
+        """Cache key for an encoded file or WAV payload, hashed without copying it"""
+        return 'raw:' + hashlib.blake2b(data, digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _pcm_digest(samples, sample_rate):
+        """Cache key for decoded samples: identical audio in any container shares it"""
+        samples = np.ascontiguousarray(samples)
+        digest = hashlib.blake2b(f"{samples.dtype.str}{samples.shape}@{sample_rate}".encode(), digest_size=16)
+        digest.update(samples.data)
+        return 'pcm:' + digest.hexdigest()
+    
+    def _cache_lookup(self, key):
+        if self.cache is None or key is None:
+            return None
+        try:
+            value = self._bound_cache().get(key)
+        except Exception as e:
+            logger.warning(f"Audio result cache read failed: {e}")
+            return None
+        if value is None:
+            return None
+        logger.info(f"Audio result cache hit: {value['emotion']}")
+        return value['emotion'], value['confidence'], value['text']
+    
+    def _cache_store(self, keys, result):
+        emotion, confidence, text = result
+        # Failures (e.g. an ASR outage) are not cached so the next attempt retries them
+        if self.cache is None or not emotion:
+            return
+        value = {'emotion': emotion, 'confidence': confidence, 'text': text}
+        try:
+            self._bound_cache().set_many({key: value for key in keys if key is not None})
+        except Exception as e:
+            logger.warning(f"Audio result cache write failed: {e}")
+    
+    def _create_asr_backend(self):
+        """Build the configured ASR backend, falling back to Google if it cannot load"""
+        try:
+            return create_asr_backend(
+                Config.ASR_BACKEND,
+                self.recognizer,
+                language=Config.ASR_LANGUAGE,
+                vosk_model_path=Config.VOSK_MODEL_PATH
+            )
+        except Exception as e:
+            logger.error(f"Could not load {Config.ASR_BACKEND} ASR backend, using google: {e}")
+            return create_asr_backend('google', self.recognizer, language=Config.ASR_LANGUAGE)
+    
+    def set_asr_backend(self, backend):
+        """Swap the speech recognition backend (an emotion.asr.ASRBackend)"""
+        self.asr = backend
+        self._reopen_result_cache()
+        return backend
+    
+    def asr_stats(self):
+        """Latency histogram and outcome counters of the current ASR backend"""
+        return self.asr.stats()
+    
+    def vad_stats(self):
+        """Clips gated, clips rejected as silent and total seconds of silence trimmed"""
+        return self.vad_counters.snapshot()
+    
+    def _trim_silence(self, samples, sample_rate, noise_profile=None):
+        """Speech span of samples (along the first axis), or None when there is no speech
+        
+        A session NoiseProfile supplies the noise floor and learns from this
+        clip's non-speech frames, instead of calibrating on its first half second.
+        """
+        if self.vad is None:
+            return samples
+        
+        samples = np.asarray(samples)
+        channel = samples if samples.ndim == 1 else samples[:, 0]
+        floor_db = noise_profile.floor_db if noise_profile is not None else None
+        result = self.vad.detect(channel, sample_rate, floor_db)
+        if noise_profile is not None:
+            noise_profile.update(result.noise_db)
+        self.vad_counters.inc('clips')
+        self.vad_counters.inc('trimmed_seconds', result.trimmed_seconds)
+        
+        if not result.has_speech:
+            self.vad_counters.inc('rejected')
+            logger.info(f"No speech detected in {result.trimmed_seconds:.1f}s clip, skipping recognition")
+            return None
+        
+        logger.info(f"Trimmed {result.trimmed_seconds:.2f}s of silence before recognition")
+        return samples[result.start:result.end]
+    
+    def start_acoustic(self, audio_data, sample_rate):
+        """Score tone of voice on the acoustic worker pool; returns a future or None"""
+        if self.acoustic is None or audio_data is None:
+            return None
+        return acoustic_executor.submit(self.analyze_acoustic, audio_data, sample_rate)
+    
+    def analyze_acoustic(self, audio_data, sample_rate):
+        """EmotionResult from the acoustic classifier, or None for silent or failed clips"""
+        try:
+            if self.vad is not None:
+                audio_data, _ = self.vad.trim(np.asarray(audio_data), sample_rate)
+                if audio_data is None:
+                    return None
+            return self.acoustic.analyze(audio_data, sample_rate)
+        except Exception as e:
+            logger.error(f"Error in acoustic emotion detection: {e}")
+            return None
+    
+    def score_audio(self, audio_data, sample_rate, transcribe, text_detector=None, progress=None):
+        """(EmotionResult or None, transcript or None) for one clip under the acoustic mode
+        
+        In 'only' mode transcription is skipped entirely. Otherwise ASR ->
+        text emotion runs with the acoustic classifier alongside and the two
+        are fused; tone of voice alone decides when there is no transcript.
+        progress, when given, is called as progress(fraction, message).
+        """
+        if self.acoustic is not None and self.acoustic_mode == 'only':
+            result = self.analyze_acoustic(audio_data, sample_rate) if audio_data is not None else None
+            return result, None
+        
+        text_detector = text_detector or text_emotion_detector
+        acoustic = self.start_acoustic(audio_data, sample_rate)
+        if progress:
+            progress(0.3, "Transcribing speech")
+        text = transcribe()
+        if progress:
+            progress(0.8, "Scoring emotion")
+        text_result = text_detector.analyze(text) if text else None
+        acoustic_result = acoustic.result() if acoustic is not None else None
+        return fuse_results(text_result, acoustic_result, Config.ACOUSTIC_TEXT_WEIGHT), text or None
+    
+    def _detect(self, source, audio_data, sample_rate, transcribe, progress=None):
+        """(emotion, confidence, transcript) for one clip via score_audio"""
+        result, text = self.score_audio(audio_data, sample_rate, transcribe, progress=progress)
+        if result is None or result.emotion is None:
+            return None, 0.0, text
+        if text:
+            logger.info(f"{source} -> Text: '{text}' -> Emotion: {result.emotion}")
+        else:
+            logger.info(f"{source} -> Acoustic emotion: {result.emotion}")
+        return result.emotion, result.confidence, text
+    
+    def _upload_digest(self, uploaded_file):
+        """Raw-bytes cache key for an in-memory upload (UploadedFile/BytesIO), else None"""
+        if not hasattr(uploaded_file, 'getbuffer'):
+            return None
+        with uploaded_file.getbuffer() as view:
+            return self._bytes_digest(view)
+    
+    def _decode_samples(self, audio_bytes):
+        """(int16 samples, sample rate) for the acoustic classifier; (None, None) when unused or undecodable"""
+        if self.acoustic is None:
+            return None, None
+        return decode_audio(io.BytesIO(audio_bytes))
+    
+    def detect_emotion_from_webrtc_audio(self, audio_data, sample_rate=48000, noise_profile=None, progress=None):
         """Detect emotion from WebRTC audio data"""
         try:
-            # Convert numpy array to WAV bytes
-            wav_bytes = self._numpy_to_wav(audio_data, sample_rate)
+            key = self._pcm_digest(audio_data, sample_rate) if self.cache is not None else None
+            cached = self._cache_lookup(key)
+            if cached:
+                return cached
             
-            # Convert to text using speech recognition
-            text = self._audio_bytes_to_text(wav_bytes)
-            
-            if text:
-                # Use text emotion detection
-                emotion, confidence = text_emotion_detector.detect_emotion(text)
-                logger.info(f"WebRTC Audio -> Text: '{text}' -> Emotion: {emotion}")
-                return emotion, confidence, text
-            else:
-                return None, 0.0, None
-                
+            result = self._detect(
+                "WebRTC Audio", audio_data, sample_rate,
+                lambda: self.transcribe_audio(audio_data, sample_rate, noise_profile),
+                progress
+            )
+            self._cache_store([key], result)
+            return result
+        
         except Exception as e:
             logger.error(f"Error detecting emotion from WebRTC audio: {e}")
             return None, 0.0, None
     
-    def detect_emotion_from_audio_file(self, uploaded_file):
+    def detect_emotion_from_audio_file(self, uploaded_file, progress=None):
         """Detect emotion from uploaded audio file"""
         try:
-            # Read file content
-            file_content = uploaded_file.read()
-            
-            # Convert to text
-            text = self._file_content_to_text(file_content, uploaded_file.type)
+            # A re-uploaded file is answered before it is even decoded
+            raw_key = self._upload_digest(uploaded_file) if self.cache is not None else None
+            cached = self._cache_lookup(raw_key)
+            if cached:
+                return cached
             
-            if text:
-                # Use text emotion detection
-                emotion, confidence = text_emotion_detector.detect_emotion(text)
-                logger.info(f"Audio File -> Text: '{text}' -> Emotion: {emotion}")
-                return emotion, confidence, text
-            else:
+            if progress:
+                progress(0.1, "Decoding audio")
+            # Decode block by block, up to MAX_AUDIO_DURATION, without reading the whole file
+            samples, sample_rate = decode_audio(uploaded_file)
+            if samples is None:
                 return None, 0.0, None
-                
+            
+            pcm_key = self._pcm_digest(samples, sample_rate) if self.cache is not None else None
+            cached = self._cache_lookup(pcm_key)
+            if cached:
+                self._cache_store([raw_key], cached)
+                return cached
+            
+            # Uploads come from anywhere, so the session's microphone profile does not apply
+            result = self._detect(
+                "Audio File", samples, sample_rate,
+                lambda: self.transcribe_audio(samples, sample_rate),
+                progress
+            )
+            self._cache_store([raw_key, pcm_key], result)
+            return result
+        
         except Exception as e:
             logger.error(f"Error detecting emotion from audio file: {e}")
             return None, 0.0, None
     
-    def detect_emotion_from_simple_recorder(self, wav_audio_data):
+    def detect_emotion_from_simple_recorder(self, wav_audio_data, noise_profile=None, progress=None):
         """Detect emotion from st_audiorec data"""
         try:
             if wav_audio_data is None:
                 return None, 0.0, None
             
-            # Convert to text
-            text = self._audio_bytes_to_text(wav_audio_data)
+            key = self._bytes_digest(wav_audio_data) if self.cache is not None else None
+            cached = self._cache_lookup(key)
+            if cached:
+                return cached
             
-            if text:
-                # Use text emotion detection
-                emotion, confidence = text_emotion_detector.detect_emotion(text)
-                logger.info(f"Simple Recorder -> Text: '{text}' -> Emotion: {emotion}")
-                return emotion, confidence, text
-            else:
-                return None, 0.0, None
-                
+            samples, sample_rate = self._decode_samples(wav_audio_data)
+            result = self._detect(
+                "Simple Recorder", samples, sample_rate,
+                lambda: self._audio_bytes_to_text(wav_audio_data, noise_profile),
+                progress
+            )
+            self._cache_store([key], result)
+            return result
+        
         except Exception as e:
             logger.error(f"Error detecting emotion from simple recorder: {e}")
             return None, 0.0, None
     
+    def transcribe_audio(self, audio_data, sample_rate=48000, noise_profile=None):
+        """Transcribe a numpy array of samples with the configured ASR backend"""
+        # Gate before normalization so noise levels are comparable between clips
+        speech = self._trim_silence(audio_data, sample_rate, noise_profile)
+        if speech is None:
+            return None
+        return self._audio_bytes_to_text(self._numpy_to_wav(speech, sample_rate), trim=False)
+    
     def _numpy_to_wav(self, audio_data, sample_rate=48000):
-        """Convert numpy audio data to WAV bytes"""
-        # Ensure mono audio
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
-        
-        # Normalize and convert to int16
-        if audio_data.dtype != np.int16:
-            # Normalize to [-1, 1] range first
-            audio_data = audio_data.astype(np.float32)
-            if np.max(np.abs(audio_data)) > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
-            
-            # Convert to int16
-            audio_data = np.int16(audio_data * 32767)
+        """Convert numpy audio data to 16-bit mono WAV bytes at the ASR sample rate"""
+        # Downmix, resample, normalize and pack to int16 in one pass
+        samples, sample_rate = prepare_for_asr(audio_data, sample_rate)
         
         # Create WAV file in memory
         buffer = io.BytesIO()
@@ -104,75 +355,36 @@ class AudioEmotionDetector:
             wav_file.setnchannels(1)  # Mono
             wav_file.setsampwidth(2)  # 16-bit
             wav_file.setframerate(sample_rate)
-            wav_file.writeframes(audio_data.tobytes())
+            wav_file.writeframes(samples)
         
-        buffer.seek(0)
         return buffer.getvalue()
     
-    def _audio_bytes_to_text(self, audio_bytes):
+    def _audio_bytes_to_text(self, audio_bytes, noise_profile=None, trim=True):
         """Convert audio bytes to text using speech recognition"""
         try:
             # Create AudioFile from bytes
             audio_file = io.BytesIO(audio_bytes)
             
             with sr.AudioFile(audio_file) as source:
-                # Adjust for ambient noise
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                # Record the audio
+                # Record the whole clip; noise is handled by the voice activity gate
                 audio = self.recognizer.record(source)
             
-            # Try Google Speech Recognition first
-            try:
-                text = self.recognizer.recognize_google(audio, language='en-US')
-                return text
-            except sr.UnknownValueError:
-                logger.warning("Google Speech Recognition could not understand audio")
-                
-                # Fallback to offline recognition (if available)
-                try:
-                    text = self.recognizer.recognize_sphinx(audio)
-                    return text
-                except (sr.UnknownValueError, sr.RequestError):
-                    logger.warning("Sphinx could not understand audio")
+            # Silent clips never reach the recognizer
+            if trim:
+                samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype=np.int16)
+                speech = self._trim_silence(samples, audio.sample_rate, noise_profile)
+                if speech is None:
                     return None
-                    
-            except sr.RequestError as e:
-                logger.error(f"Google Speech Recognition request failed: {e}")
-                return None
-                
+                audio = sr.AudioData(speech.tobytes(), audio.sample_rate, 2)
+            return self.asr.transcribe(audio)
+        
         except Exception as e:
             logger.error(f"Error converting audio to text: {e}")
             return None
     
-    def _file_content_to_text(self, file_content, file_type):
-        """Convert uploaded file content to text"""
-        try:
-            # Create audio file object
-            audio_file = io.BytesIO(file_content)
-            
-            # Handle different file types
-            if file_type in ['audio/wav', 'audio/wave']:
-                with sr.AudioFile(audio_file) as source:
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                    audio = self.recognizer.record(source)
-            else:
-                # For other formats, we might need additional processing
-                # This is a simplified approach - in production, you'd use pydub
-                logger.warning(f"File type {file_type} may not be fully supported")
-                with sr.AudioFile(audio_file) as source:
-                    audio = self.recognizer.record(source)
-            
-            # Convert to text
-            text = self.recognizer.recognize_google(audio, language='en-US')
-            return text
-            
-        except Exception as e:
-            logger.error(f"Error converting file to text: {e}")
-            return None
-    
     def get_supported_formats(self):
         """Get list of supported audio formats"""
-        return ['wav', 'flac', 'aiff']
+        return ['wav', 'flac', 'aiff', 'ogg', 'mp3', 'm4a', 'webm']
     
     def validate_audio_file(self, uploaded_file, max_size_mb=10):
         """Validate uploaded audio file"""
@@ -197,4 +409,14 @@ class AudioEmotionDetector:
         return True, "Valid audio file"
 
 # Global instance
-audio_emotion_detector = AudioEmotionDetector()
\ No newline at end of file
+audio_emotion_detector = AudioEmotionDetector()
+
+if Config.AUDIO_CACHE_ENABLED:
+    try:
+        audio_emotion_detector.enable_result_cache(
+            Config.AUDIO_CACHE_PATH,
+            max_entries=Config.AUDIO_CACHE_MAX_ENTRIES,
+            max_age=Config.AUDIO_CACHE_MAX_AGE
+        )
+    except Exception as e:
+        logger.error(f"Could not open audio result cache: {e}")
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+Audio preparation for speech recognition
+Downmixes to mono, resamples to the recognizer's native rate with a
+polyphase filter, peak-normalizes in place and packs to int16. Only the
+float working copy, the resampled signal and the int16 output are allocated.
+"""
+
+import logging
+from math import gcd
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+INT16_MAX = 32767
+
+
+def to_mono_float32(audio_data):
+    """Mono float32 working copy; (samples, channels) input is averaged across channels"""
+    audio_data = np.asarray(audio_data)
+    if audio_data.ndim == 1:
+        return audio_data.astype(np.float32, copy=True)
+    
+    # Accumulate column by column: mean(axis=1) over interleaved channels is far slower
+    channels = audio_data.shape[1]
+    mono = audio_data[:, 0].astype(np.float32)
+    for channel in range(1, channels):
+        mono += audio_data[:, channel]
+    if channels > 1:
+        mono *= 1.0 / channels
+    return mono
+
+
+def normalize_in_place(samples, peak=1.0):
+    """Scale samples so the largest magnitude equals peak; silence is left alone"""
+    # max/min avoid the temporary array np.abs would allocate
+    largest = max(float(samples.max(initial=0.0)), -float(samples.min(initial=0.0)))
+    if largest > 0:
+        samples *= peak / largest
+    return samples
+
+
+def resample(samples, sample_rate, target_rate):
+    """Polyphase resampling to target_rate; returns samples unchanged when the rates match"""
+    if sample_rate == target_rate:
+        return samples
+    divisor = gcd(int(sample_rate), int(target_rate))
+    return resample_poly(samples, target_rate // divisor, sample_rate // divisor).astype(np.float32, copy=False)
+
+
+def prepare_for_asr(audio_data, sample_rate, target_rate=None):
+    """Return (int16 mono samples at target_rate, target_rate) ready for WAV encoding"""
+    target_rate = target_rate or Config.ASR_SAMPLE_RATE
+    # Never resample up: it adds bytes without adding information
+    target_rate = min(int(target_rate), int(sample_rate))
+    
+    samples = resample(to_mono_float32(audio_data), sample_rate, target_rate)
+    normalize_in_place(samples, peak=INT16_MAX)
+    np.rint(samples, out=samples)
+    np.clip(samples, -INT16_MAX, INT16_MAX, out=samples)
+    return samples.astype(np.int16), target_rate
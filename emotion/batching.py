@@ -0,0 +1,127 @@
+"""
+Micro-batching for model inference
+Coalesces requests arriving from many threads into batched calls
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Background worker that groups submitted items into batches
+    
+    Items arriving within ``window_ms`` of the first queued item (up to
+    ``max_batch_size``) are passed to ``batch_fn`` in one call. ``batch_fn``
+    must return one result per item, in order.
+    """
+    
+    def __init__(self, batch_fn, window_ms=10, max_batch_size=16, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.name = name
+        
+        self.queue = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+        
+        self.queue_depth = Histogram([0, 1, 2, 4, 8, 16, 32, 64])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64])
+    
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self.lock:
+            if self.worker and self.worker.is_alive():
+                return
+            self.worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.worker.start()
+    
+    def stop(self, timeout=None):
+        """Process queued items, then stop the worker"""
+        with self.lock:
+            worker = self.worker
+            self.worker = None
+        if worker and worker.is_alive():
+            self.queue.put(_STOP)
+            worker.join(timeout)
+    
+    def submit(self, item):
+        """Queue an item and return a Future for its result"""
+        self.start()
+        future = Future()
+        self.queue_depth.observe(self.queue.qsize())
+        self.queue.put((item, future))
+        return future
+    
+    def get_metrics(self):
+        """Export queue-depth and batch-size histograms"""
+        return {
+            'pending': self.queue.qsize(),
+            'queue_depth': self.queue_depth.snapshot(),
+            'batch_size': self.batch_size.snapshot()
+        }
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is _STOP:
+                break
+            
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            self._process(batch)
+        
+        # Drain anything submitted before the stop request
+        pending = []
+        while True:
+            try:
+                entry = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                pending.append(entry)
+        for start in range(0, len(pending), self.max_batch_size):
+            self._process(pending[start:start + self.max_batch_size])
+    
+    def _process(self, batch):
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        
+        self.batch_size.observe(len(batch))
+        
+        try:
+            results = list(self.batch_fn([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            logger.error(f"Error processing batch in {self.name}: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,242 @@
+"""
+Confidence-gated model cascade for text emotion detection
+A NumPy-only hashed n-gram linear model answers confident inputs; the rest
+escalate to the transformer.
+
+Weights file format (.npz, written by HashedNgramClassifier.save):
+    format_version  int, currently 1
+    weights         float32 [n_features, n_labels]
+    bias            float32 [n_labels]
+    labels          unicode [n_labels], raw transformer labels in column order
+    n_features      int, hash space size
+    word_ngrams     int [2], inclusive (min, max) word n-gram sizes
+    char_ngrams     int [2], inclusive (min, max) character n-gram sizes
+"""
+
+import hashlib
+import logging
+import re
+import zlib
+
+import numpy as np
+
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+class HashedNgramClassifier:
+    """Linear softmax classifier over signed, hashed word and character n-grams"""
+    
+    def __init__(self, labels, n_features=2 ** 18, word_ngrams=(1, 2), char_ngrams=(3, 4),
+                 weights=None, bias=None):
+        self.labels = [str(label) for label in labels]
+        self.n_features = int(n_features)
+        self.word_ngrams = tuple(int(n) for n in word_ngrams)
+        self.char_ngrams = tuple(int(n) for n in char_ngrams)
+        self.weights = (np.zeros((self.n_features, len(self.labels)), dtype=np.float32)
+                        if weights is None else np.asarray(weights, dtype=np.float32))
+        self.bias = (np.zeros(len(self.labels), dtype=np.float32)
+                     if bias is None else np.asarray(bias, dtype=np.float32))
+    
+    # Features
+    
+    def _ngrams(self, text):
+        text = text.lower()
+        words = _WORD_RE.findall(text)
+        low, high = self.word_ngrams
+        for n in range(low, high + 1):
+            for i in range(len(words) - n + 1):
+                yield 'w:' + ' '.join(words[i:i + n])
+        
+        padded = f" {' '.join(words)} "
+        low, high = self.char_ngrams
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                yield 'c:' + padded[i:i + n]
+    
+    def featurize(self, text):
+        """Return (indices, values) of the L2-normalized hashed feature vector"""
+        hashes = np.fromiter(
+            (zlib.crc32(gram.encode('utf-8')) for gram in self._ngrams(text)),
+            dtype=np.uint32
+        )
+        if hashes.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        # Low bits pick the bucket, the top bit picks the sign to reduce collision bias
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        indices = (hashes % self.n_features).astype(np.int64)
+        
+        order = np.argsort(indices, kind='stable')
+        indices, signs = indices[order], signs[order]
+        unique, starts = np.unique(indices, return_index=True)
+        values = np.add.reduceat(signs, starts)
+        
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values /= norm
+        return unique, values.astype(np.float32)
+    
+    def _featurize_batch(self, texts):
+        all_indices, all_values, doc_ids = [], [], []
+        for doc, text in enumerate(texts):
+            indices, values = self.featurize(text)
+            all_indices.append(indices)
+            all_values.append(values)
+            doc_ids.append(np.full(indices.size, doc, dtype=np.int64))
+        return np.concatenate(all_indices), np.concatenate(all_values), np.concatenate(doc_ids)
+    
+    # Inference
+    
+    def _logits(self, features, n_docs):
+        indices, values, doc_ids = features
+        logits = np.tile(self.bias, (n_docs, 1))
+        np.add.at(logits, doc_ids, self.weights[indices] * values[:, None])
+        return logits
+    
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+    
+    def predict_proba(self, texts):
+        """(len(texts), n_labels) array of label probabilities"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return self._softmax(self._logits(self._featurize_batch(texts), len(texts)))
+    
+    def predict(self, texts):
+        """Raw label score dicts, in the same format as the transformer"""
+        return [dict(zip(self.labels, row.tolist())) for row in self.predict_proba(texts)]
+    
+    # Training
+    
+    def fit(self, texts, targets, epochs=5, learning_rate=0.5, l2=1e-6, batch_size=64, seed=0):
+        """Distill from soft targets (teacher probabilities) with mini-batch AdaGrad"""
+        targets = np.asarray(targets, dtype=np.float32)
+        features = [self.featurize(text) for text in texts]
+        rng = np.random.default_rng(seed)
+        
+        weight_accumulator = np.full_like(self.weights, 1e-8)
+        bias_accumulator = np.full_like(self.bias, 1e-8)
+        
+        for epoch in range(epochs):
+            order = rng.permutation(len(features))
+            total_loss = 0.0
+            
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                indices = np.concatenate([features[i][0] for i in batch])
+                values = np.concatenate([features[i][1] for i in batch])
+                doc_ids = np.concatenate([np.full(features[i][0].size, row, dtype=np.int64)
+                                          for row, i in enumerate(batch)])
+                
+                probabilities = self._softmax(self._logits((indices, values, doc_ids), len(batch)))
+                batch_targets = targets[batch]
+                total_loss -= float(np.sum(batch_targets * np.log(probabilities + 1e-12)))
+                
+                error = (probabilities - batch_targets) / len(batch)
+                
+                touched, inverse = np.unique(indices, return_inverse=True)
+                weight_grad = np.zeros((touched.size, len(self.labels)), dtype=np.float32)
+                np.add.at(weight_grad, inverse, values[:, None] * error[doc_ids])
+                weight_grad += l2 * self.weights[touched]
+                bias_grad = error.sum(axis=0)
+                
+                weight_accumulator[touched] += weight_grad ** 2
+                self.weights[touched] -= learning_rate * weight_grad / np.sqrt(weight_accumulator[touched])
+                bias_accumulator += bias_grad ** 2
+                self.bias -= learning_rate * bias_grad / np.sqrt(bias_accumulator)
+            
+            logger.info(f"Cascade distillation epoch {epoch + 1}/{epochs}: "
+                        f"loss {total_loss / max(1, len(features)):.4f}")
+        return self
+    
+    # Persistence
+    
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                format_version=np.int64(FORMAT_VERSION),
+                weights=self.weights,
+                bias=self.bias,
+                labels=np.array(self.labels),
+                n_features=np.int64(self.n_features),
+                word_ngrams=np.array(self.word_ngrams, dtype=np.int64),
+                char_ngrams=np.array(self.char_ngrams, dtype=np.int64)
+            )
+        return path
+    
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported cascade weights format {version}")
+            return cls(
+                labels=data['labels'].tolist(),
+                n_features=int(data['n_features']),
+                word_ngrams=data['word_ngrams'].tolist(),
+                char_ngrams=data['char_ngrams'].tolist(),
+                weights=data['weights'],
+                bias=data['bias']
+            )
+
+
+def top_margin(probabilities):
+    """Gap between the best and second best probability per row"""
+    if probabilities.shape[1] < 2:
+        return probabilities[:, 0]
+    top_two = np.partition(probabilities, -2, axis=1)[:, -2:]
+    return top_two[:, 1] - top_two[:, 0]
+
+
+class EmotionCascade:
+    """Answers inputs the first stage is confident about, escalates the rest"""
+    
+    def __init__(self, first_stage, margin=0.5, fingerprint=''):
+        self.first_stage = first_stage
+        self.margin = margin
+        self.fingerprint = fingerprint
+        self.counters = Counter('total', 'accepted', 'escalated')
+    
+    @classmethod
+    def load(cls, path, margin=0.5):
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        return cls(HashedNgramClassifier.load(path), margin, fingerprint=f"{digest}@{margin}")
+    
+    def split(self, texts):
+        """Return ({index: raw label scores} for accepted texts, [escalated indices])"""
+        probabilities = self.first_stage.predict_proba(texts)
+        confident = top_margin(probabilities) >= self.margin
+        
+        accepted = {
+            int(i): dict(zip(self.first_stage.labels, probabilities[i].tolist()))
+            for i in np.flatnonzero(confident)
+        }
+        escalated = [int(i) for i in np.flatnonzero(~confident)]
+        
+        self.counters.inc('total', len(texts))
+        self.counters.inc('accepted', len(accepted))
+        self.counters.inc('escalated', len(escalated))
+        return accepted, escalated
+    
+    def escalation_rate(self):
+        total = self.counters.get('total')
+        return self.counters.get('escalated') / total if total else 0.0
+    
+    def stats(self):
+        stats = self.counters.snapshot()
+        stats['escalation_rate'] = self.escalation_rate()
+        stats['margin'] = self.margin
+        return stats
@@ -0,0 +1,153 @@
+"""
+Process-wide emotion catalog
+The emotions table holds a handful of static rows, so it is read once and
+served from memory: lookups by name, alias or id are dictionary hits and
+colors, complementary colors and gradients are computed at load time.
+Snapshots are immutable and replaced as a whole by reload(), so readers
+never need a lock.
+"""
+
+import colorsys
+import logging
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLOR = "#808080"
+
+# Classifier labels and common synonyms for the catalog's emotion names
+EMOTION_ALIASES = {
+    'joy': 'happy',
+    'happiness': 'happy',
+    'sadness': 'sad',
+    'anger': 'angry',
+    'fear': 'anxious',
+    'surprise': 'excited',
+    'love': 'romantic',
+    'disgust': 'angry',
+    'optimism': 'confident',
+    'pessimism': 'sad'
+}
+
+
+def complementary_color(hex_color):
+    """Hex color with the opposite hue; raises ValueError on malformed input"""
+    hex_color = hex_color.lstrip('#')
+    rgb = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    hue, saturation, value = colorsys.rgb_to_hsv(rgb[0]/255, rgb[1]/255, rgb[2]/255)
+    comp_rgb = colorsys.hsv_to_rgb((hue + 0.5) % 1.0, saturation, value)
+    comp_rgb = tuple(int(c * 255) for c in comp_rgb)
+    return f"#{comp_rgb[0]:02x}{comp_rgb[1]:02x}{comp_rgb[2]:02x}"
+
+
+def gradient_css(base_color, comp_color):
+    return f"linear-gradient(135deg, {base_color} 0%, {comp_color} 100%)"
+
+
+DEFAULT_GRADIENT = gradient_css(DEFAULT_COLOR, complementary_color(DEFAULT_COLOR))
+
+
+@dataclass(frozen=True)
+class EmotionEntry:
+    """One emotion row with its derived colors, safe to share between threads"""
+    id: int
+    name: str
+    color_code: str
+    description: Optional[str]
+    complementary_color: str
+    gradient: str
+    
+    @classmethod
+    def from_row(cls, row):
+        try:
+            comp_color = complementary_color(row.color_code)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Invalid color {row.color_code!r} for emotion {row.name}: {e}")
+            comp_color = "#ffffff"
+        return cls(
+            id=row.id,
+            name=row.name,
+            color_code=row.color_code,
+            description=row.description,
+            complementary_color=comp_color,
+            gradient=gradient_css(row.color_code, comp_color)
+        )
+
+
+def _normalize(name):
+    return str(name).strip().casefold()
+
+
+def _load_emotions():
+    # Imported lazily so catalogs with their own loader never open the database
+    from database.database import db_manager
+    return db_manager.get_all_emotions()
+
+
+class EmotionCatalog:
+    """Immutable in-memory view of the emotions table, loaded on first use"""
+    
+    def __init__(self, loader=None, aliases=None):
+        self.loader = loader or _load_emotions
+        self.aliases = MappingProxyType({
+            _normalize(alias): _normalize(name)
+            for alias, name in (EMOTION_ALIASES if aliases is None else aliases).items()
+        })
+        self.by_name = None
+        self.by_id = None
+        self.lock = threading.Lock()
+    
+    def _ensure_loaded(self):
+        if self.by_name is None:
+            with self.lock:
+                if self.by_name is None:
+                    self._load()
+    
+    def _load(self):
+        try:
+            entries = [EmotionEntry.from_row(row) for row in self.loader()]
+        except Exception as e:
+            # Leave the catalog unloaded so the next lookup retries
+            logger.error(f"Error loading emotion catalog: {e}")
+            return False
+        # by_id is published first: by_name doubles as the "loaded" flag
+        self.by_id = MappingProxyType({entry.id: entry for entry in entries})
+        self.by_name = MappingProxyType({_normalize(entry.name): entry for entry in entries})
+        logger.info(f"Emotion catalog loaded with {len(entries)} emotions")
+        return True
+    
+    def reload(self):
+        """Re-read the emotions table after it changed; the old snapshot stays live until then"""
+        with self.lock:
+            return self._load()
+    
+    def get(self, name):
+        """Entry for an emotion name or alias (case-insensitive), or None"""
+        if not name:
+            return None
+        self._ensure_loaded()
+        if self.by_name is None:
+            return None
+        key = _normalize(name)
+        return self.by_name.get(key) or self.by_name.get(self.aliases.get(key))
+    
+    def get_by_id(self, emotion_id):
+        self._ensure_loaded()
+        return self.by_id.get(emotion_id) if self.by_id is not None else None
+    
+    def color(self, name, default=DEFAULT_COLOR):
+        entry = self.get(name)
+        return entry.color_code if entry else default
+    
+    def names(self):
+        self._ensure_loaded()
+        return list(self.by_name) if self.by_name is not None else []
+    
+    def __len__(self):
+        return len(self.names())
+
+# Global instance
+emotion_catalog = EmotionCatalog()
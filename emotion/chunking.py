@@ -0,0 +1,93 @@
+"""
+Sliding-window chunking for long texts
+Splits a document into overlapping windows of at most max_tokens model tokens,
+cut on tokenizer offsets so no token is split, and aggregates the per-chunk
+emotion distributions back into one.
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_METHODS = ('mean', 'max', 'length')
+
+_WORD_PATTERN = re.compile(r'\S+')
+
+
+def token_offsets(text, tokenizer=None):
+    """Character (start, end) span of every token in text
+    
+    Uses the tokenizer's offset mapping when it provides one (fast HF
+    tokenizers do) and falls back to whitespace-separated words.
+    """
+    if tokenizer is not None:
+        try:
+            encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            return [tuple(span) for span in encoded['offset_mapping'] if span[1] > span[0]]
+        except Exception as e:
+            logger.debug(f"Tokenizer offsets unavailable, chunking on words: {e}")
+    return [match.span() for match in _WORD_PATTERN.finditer(text)]
+
+
+def chunk_spans(offsets, max_tokens=256, stride=32):
+    """Group token offsets into overlapping windows
+    
+    Returns (start_char, end_char, n_tokens) per chunk. Consecutive windows
+    share stride tokens, and a window is shortened rather than cut inside a
+    word made of several sub-word tokens.
+    """
+    if max_tokens <= stride:
+        raise ValueError("max_tokens must be larger than stride")
+    if not offsets:
+        return []
+    
+    chunks = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, len(offsets))
+        
+        # Back off to a word boundary: the next token must not continue this one
+        boundary = end
+        while boundary < len(offsets) and boundary > start + 1 and offsets[boundary][0] == offsets[boundary - 1][1]:
+            boundary -= 1
+        if boundary > start + stride:
+            end = boundary
+        
+        chunks.append((offsets[start][0], offsets[end - 1][1], end - start))
+        if end == len(offsets):
+            return chunks
+        
+        # Start the next window on a word boundary too, as long as it moves forward
+        previous_start, start = start, end - stride
+        while start - 1 > previous_start and offsets[start][0] == offsets[start - 1][1]:
+            start -= 1
+
+
+def aggregate_scores(score_dicts, weights=None, method='mean'):
+    """Combine per-chunk emotion distributions
+    
+    mean averages the distributions, length weights each chunk by its token
+    count, and max keeps each emotion's strongest chunk score.
+    """
+    if method not in AGGREGATE_METHODS:
+        raise ValueError(f"Unknown aggregate method: {method}")
+    if not score_dicts:
+        return {}
+    
+    if method == 'max':
+        combined = {}
+        for scores in score_dicts:
+            for emotion, score in scores.items():
+                combined[emotion] = max(combined.get(emotion, 0.0), score)
+        return combined
+    
+    if method == 'mean' or weights is None:
+        weights = [1.0] * len(score_dicts)
+    total = float(sum(weights)) or 1.0
+    
+    combined = {}
+    for scores, weight in zip(score_dicts, weights):
+        for emotion, score in scores.items():
+            combined[emotion] = combined.get(emotion, 0.0) + score * weight / total
+    return combined
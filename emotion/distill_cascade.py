@@ -0,0 +1,122 @@
+"""
+Distill the cascade's first-stage model from the transformer
+Run from the project root:
+    python -m emotion.distill_cascade --input journal_texts.txt --output models/cascade.npz
+
+The input file holds one text per line. The transformer scores every text,
+a hashed n-gram model is trained on its probabilities, and an
+accuracy-vs-latency report over a range of confidence margins is printed
+and written next to the weights as <output>.report.json.
+"""
+
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from emotion.cascade import HashedNgramClassifier, top_margin
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MARGINS = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.01]
+
+
+def score_with_teacher(detector, texts, batch_size=32):
+    """Teacher probabilities (n, labels), label order and mean seconds per text"""
+    rows = []
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        rows.extend(detector._predict_raw(texts[offset:offset + batch_size]))
+    elapsed = time.perf_counter() - start
+    
+    labels = list(rows[0])
+    matrix = np.array([[row[label] for label in labels] for row in rows], dtype=np.float32)
+    return matrix, labels, elapsed / len(texts)
+
+
+def evaluate_cascade(student, texts, teacher_probabilities, teacher_seconds, margins=DEFAULT_MARGINS):
+    """Agreement with the teacher and expected latency for each margin"""
+    start = time.perf_counter()
+    student_probabilities = student.predict_proba(texts)
+    student_seconds = (time.perf_counter() - start) / len(texts)
+    
+    teacher_top = teacher_probabilities.argmax(axis=1)
+    student_top = student_probabilities.argmax(axis=1)
+    margins_per_text = top_margin(student_probabilities)
+    
+    report = []
+    for margin in margins:
+        escalated = margins_per_text < margin
+        # Escalated texts get the teacher's answer, so they always agree
+        agreement = float(np.mean(np.where(escalated, True, student_top == teacher_top)))
+        escalation_rate = float(np.mean(escalated))
+        report.append({
+            'margin': margin,
+            'escalation_rate': round(escalation_rate, 4),
+            'agreement_with_teacher': round(agreement, 4),
+            'expected_ms_per_text': round(
+                (student_seconds + escalation_rate * teacher_seconds) * 1000, 3
+            ),
+        })
+    
+    return {
+        'texts': len(texts),
+        'student_ms_per_text': round(student_seconds * 1000, 3),
+        'teacher_ms_per_text': round(teacher_seconds * 1000, 3),
+        'student_only_agreement': round(float(np.mean(student_top == teacher_top)), 4),
+        'margins': report,
+    }
+
+
+def print_report(report):
+    print(f"Holdout texts: {report['texts']}  "
+          f"student {report['student_ms_per_text']} ms/text, "
+          f"teacher {report['teacher_ms_per_text']} ms/text")
+    print(f"{'margin':>8}{'escalated':>12}{'agreement':>12}{'ms/text':>10}")
+    for row in report['margins']:
+        print(f"{row['margin']:>8.2f}{row['escalation_rate']:>12.1%}"
+              f"{row['agreement_with_teacher']:>12.1%}{row['expected_ms_per_text']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the cascade first-stage model")
+    parser.add_argument('--input', required=True, help="File with one text per line")
+    parser.add_argument('--output', default='models/cascade.npz')
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--n-features', type=int, default=2 ** 18)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    with open(args.input, encoding='utf-8') as f:
+        texts = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    
+    from emotion.text_emotion import TextEmotionDetector
+    teacher = TextEmotionDetector()
+    if not teacher.load_model():
+        raise SystemExit("Could not load the teacher model")
+    
+    probabilities, labels, teacher_seconds = score_with_teacher(teacher, texts)
+    
+    order = np.random.default_rng(args.seed).permutation(len(texts))
+    holdout_size = int(len(texts) * args.holdout)
+    holdout, train = order[:holdout_size], order[holdout_size:]
+    
+    student = HashedNgramClassifier(labels, n_features=args.n_features)
+    student.fit([texts[i] for i in train], probabilities[train], epochs=args.epochs, seed=args.seed)
+    student.save(args.output)
+    logger.info(f"Saved cascade weights to {args.output}")
+    
+    if holdout_size:
+        report = evaluate_cascade(student, [texts[i] for i in holdout], probabilities[holdout], teacher_seconds)
+        print_report(report)
+        with open(f"{args.output}.report.json", 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Keyword-based emotion detection
+A fast fallback when the ML model is unavailable. All keywords are compiled
+once into a single Aho-Corasick automaton when pyahocorasick is installed,
+otherwise into a single word-bounded regular expression.
+"""
+
+import logging
+import re
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+EMOTION_KEYWORDS = {
+    'happy': ['happy', 'joy', 'excited', 'great', 'wonderful', 'amazing', 'good', 'fantastic', 'awesome', 'love'],
+    'sad': ['sad', 'down', 'depressed', 'unhappy', 'blue', 'melancholy', 'disappointed', 'hurt', 'crying'],
+    'angry': ['angry', 'mad', 'furious', 'irritated', 'annoyed', 'rage', 'hate', 'frustrated', 'pissed'],
+    'excited': ['excited', 'thrilled', 'pumped', 'energized', 'enthusiastic', 'eager', 'stoked'],
+    'calm': ['calm', 'peaceful', 'relaxed', 'serene', 'tranquil', 'zen', 'composed', 'chill'],
+    'anxious': ['anxious', 'nervous', 'worried', 'stressed', 'tense', 'afraid', 'scared', 'panicked'],
+    'romantic': ['love', 'romantic', 'affection', 'adore', 'crush', 'heart', 'passion', 'loving'],
+    'confident': ['confident', 'sure', 'certain', 'strong', 'proud', 'bold', 'empowered', 'determined']
+}
+
+
+def build_trie_pattern(words):
+    """Alternation of words factored by common prefix, e.g. lov(?:e|ing)"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node):
+        is_word = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not is_word:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if is_word else group
+    
+    return build(trie)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class KeywordEmotionDetector:
+    """Scores emotions by the weighted share of their keywords present in a text
+    
+    keywords maps emotion -> list of keywords, or emotion -> {keyword: weight}.
+    Each emotion's weights are normalized to sum to 1, so an emotion whose
+    keywords all appear scores 1.0. A keyword counts once however often it
+    appears, and only as a whole word ("sad" does not match "crusade").
+    """
+    
+    def __init__(self, keywords=None, use_automaton=True):
+        keywords = keywords or EMOTION_KEYWORDS
+        self.emotions = list(keywords)
+        self.keyword_weights = {}
+        
+        for emotion, entries in keywords.items():
+            if not isinstance(entries, dict):
+                entries = {keyword: 1.0 for keyword in entries}
+            total = sum(entries.values())
+            for keyword, weight in entries.items():
+                self.keyword_weights.setdefault(keyword.lower(), []).append((emotion, weight / total))
+        
+        self.pattern = re.compile(r'\b' + build_trie_pattern(self.keyword_weights) + r'\b')
+        
+        self.automaton = None
+        if use_automaton and ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for keyword in self.keyword_weights:
+                self.automaton.add_word(keyword, (len(keyword), keyword))
+            self.automaton.make_automaton()
+    
+    def find_keywords(self, text):
+        """Return the set of distinct keywords present in text as whole words"""
+        text = text.lower()
+        if self.automaton is None:
+            return set(self.pattern.findall(text))
+        
+        found = set()
+        last = len(text) - 1
+        for end, (length, keyword) in self.automaton.iter(text):
+            start = end - length + 1
+            if keyword in found:
+                continue
+            # Same boundary rule as \b: no word character on either side
+            if start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if end < last and _is_word_char(text[end + 1]):
+                continue
+            found.add(keyword)
+        return found
+    
+    def score(self, text):
+        """Return {emotion: score} for emotions with at least one keyword present"""
+        if not text:
+            return {}
+        
+        scores = {}
+        for keyword in self.find_keywords(text):
+            for emotion, weight in self.keyword_weights[keyword]:
+                scores[emotion] = scores.get(emotion, 0.0) + weight
+        return scores
+    
+    def detect_emotion(self, text):
+        """Return (emotion, confidence), or (None, 0.0) when no keyword matches"""
+        scores = self.score(text)
+        if not scores:
+            return None, 0.0
+        
+        # Ties go to the emotion listed first, as in the keyword table
+        best_emotion = max((emotion for emotion in self.emotions if emotion in scores), key=scores.get)
+        confidence = min(scores[best_emotion] * 0.8, 0.9)
+        return best_emotion, confidence
+
+# Global instance, compiled once at import
+keyword_emotion_detector = KeywordEmotionDetector()
@@ -0,0 +1,293 @@
+"""
+Shared text emotion model server
+Loads the model once per node and serves raw label scores to Streamlit workers
+
+Run from the project root:
+    python -m emotion.model_server --address unix:/tmp/emosound-model.sock
+
+Wire protocol (all integers big-endian, every message is one frame):
+    frame     = u32 payload length, payload
+    request   = u8 opcode, u32 text count, (u32 byte length, utf-8 text) * count
+    response  = u8 status, body
+    ok body   = u16 label count, (u8 byte length, ascii label) * labels,
+                u32 row count, float32 little-endian scores (rows x labels)
+    error body= utf-8 message
+"""
+
+import argparse
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+from config import Config
+from emotion.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+OP_PING = 0
+OP_ANALYZE_BATCH = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+
+def parse_address(address):
+    """Return (socket family, bind/connect address) for 'unix:/path' or 'host:port'"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('/'):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(sock):
+    (length,) = struct.unpack('>I', _recv_exact(sock, 4))
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds limit")
+    return _recv_exact(sock, length)
+
+
+def write_frame(sock, payload):
+    sock.sendall(struct.pack('>I', len(payload)) + payload)
+
+
+def encode_request(opcode, texts=()):
+    parts = [struct.pack('>BI', opcode, len(texts))]
+    for text in texts:
+        encoded = text.encode('utf-8')
+        parts.append(struct.pack('>I', len(encoded)))
+        parts.append(encoded)
+    return b''.join(parts)
+
+
+def decode_request(payload):
+    opcode, count = struct.unpack_from('>BI', payload)
+    offset = 5
+    texts = []
+    for _ in range(count):
+        (length,) = struct.unpack_from('>I', payload, offset)
+        offset += 4
+        texts.append(payload[offset:offset + length].decode('utf-8'))
+        offset += length
+    return opcode, texts
+
+
+def encode_scores(labels, matrix):
+    parts = [struct.pack('>BH', STATUS_OK, len(labels))]
+    for label in labels:
+        encoded = label.encode('ascii')
+        parts.append(struct.pack('>B', len(encoded)))
+        parts.append(encoded)
+    matrix = np.ascontiguousarray(matrix, dtype='<f4')
+    parts.append(struct.pack('>I', matrix.shape[0]))
+    parts.append(matrix.tobytes())
+    return b''.join(parts)
+
+
+def decode_response(payload):
+    """Return raw label score dicts, raising RuntimeError for server errors"""
+    status = payload[0]
+    if status != STATUS_OK:
+        raise RuntimeError(payload[1:].decode('utf-8', errors='replace'))
+    
+    (label_count,) = struct.unpack_from('>H', payload, 1)
+    offset = 3
+    labels = []
+    for _ in range(label_count):
+        length = payload[offset]
+        labels.append(payload[offset + 1:offset + 1 + length].decode('ascii'))
+        offset += 1 + length
+    
+    (rows,) = struct.unpack_from('>I', payload, offset)
+    offset += 4
+    matrix = np.frombuffer(payload, dtype='<f4', count=rows * label_count, offset=offset)
+    matrix = matrix.reshape(rows, label_count)
+    return [dict(zip(labels, row.tolist())) for row in matrix]
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class EmotionModelServer:
+    """Serves a single in-process model to many clients, coalescing their requests"""
+    
+    def __init__(self, address, detector, window_ms=5, max_batch_size=32):
+        self.address = address
+        self.detector = detector
+        self.batcher = MicroBatcher(
+            detector._predict_raw,
+            window_ms=window_ms,
+            max_batch_size=max_batch_size,
+            name="model-server-batcher"
+        )
+        self.server = self._build_server()
+    
+    def _build_server(self):
+        family, bind_address = parse_address(self.address)
+        server_ref = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        payload = read_frame(self.request)
+                    except (ConnectionError, OSError):
+                        return
+                    write_frame(self.request, server_ref.handle_payload(payload))
+        
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):
+                os.unlink(bind_address)
+            return _UnixServer(bind_address, Handler)
+        return _TCPServer(bind_address, Handler)
+    
+    def handle_payload(self, payload):
+        """Answer one request frame"""
+        try:
+            opcode, texts = decode_request(payload)
+            if opcode == OP_PING:
+                return encode_scores([], np.zeros((0, 0), dtype=np.float32))
+            if opcode != OP_ANALYZE_BATCH:
+                raise ValueError(f"Unknown opcode {opcode}")
+            
+            predictions = [future.result() for future in [self.batcher.submit(text) for text in texts]]
+            labels = list(predictions[0]) if predictions else []
+            matrix = np.array([[scores[label] for label in labels] for scores in predictions],
+                              dtype=np.float32).reshape(len(predictions), len(labels))
+            return encode_scores(labels, matrix)
+        except Exception as e:
+            logger.error(f"Model server request failed: {e}")
+            return bytes([STATUS_ERROR]) + str(e).encode('utf-8')
+    
+    def serve_forever(self):
+        logger.info(f"Emotion model server listening on {self.address}")
+        self.server.serve_forever()
+    
+    def start(self):
+        """Serve on a background thread (used by tests and embedding)"""
+        thread = threading.Thread(target=self.serve_forever, name="model-server", daemon=True)
+        thread.start()
+        return thread
+    
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.batcher.stop()
+        family, bind_address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.unlink(bind_address)
+
+
+class ModelServerClient:
+    """Thin client for EmotionModelServer with a per-thread persistent connection"""
+    
+    def __init__(self, address, timeout=5.0, retry_after=30.0):
+        self.address = address
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.unavailable_until = 0.0
+        self.local = threading.local()
+    
+    def available(self):
+        """False while backing off after a failed request"""
+        return time.monotonic() >= self.unavailable_until
+    
+    def _connection(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is None:
+            family, connect_address = parse_address(self.address)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(connect_address)
+            self.local.sock = sock
+        return sock
+    
+    def _close(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+            self.local.sock = None
+    
+    def _request(self, payload):
+        if not self.available():
+            raise ConnectionError(f"Model server at {self.address} is backing off")
+        
+        # Retry once in case the cached connection went stale
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                write_frame(sock, payload)
+                return read_frame(sock)
+            except (OSError, ConnectionError) as e:
+                self._close()
+                if attempt == 1:
+                    self.unavailable_until = time.monotonic() + self.retry_after
+                    raise ConnectionError(f"Model server at {self.address} unavailable: {e}")
+    
+    def ping(self):
+        decode_response(self._request(encode_request(OP_PING)))
+        return True
+    
+    def predict_raw(self, texts):
+        """Raw label scores per text, computed by the server"""
+        return decode_response(self._request(encode_request(OP_ANALYZE_BATCH, list(texts))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared text emotion model server")
+    parser.add_argument('--address', default=Config.EMOTION_SERVER_ADDRESS or 'unix:/tmp/emosound-model.sock')
+    parser.add_argument('--threads', type=int, default=Config.EMOTION_SERVER_THREADS)
+    parser.add_argument('--window-ms', type=int, default=Config.TEXT_BATCH_WINDOW_MS)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    import torch
+    torch.set_num_threads(args.threads)
+    
+    from emotion.text_emotion import TextEmotionDetector
+    detector = TextEmotionDetector()
+    if not detector.load_model():
+        raise SystemExit("Could not load the text emotion model")
+    
+    server = EmotionModelServer(args.address, detector, args.window_ms, args.max_batch_size)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-session ambient noise estimate
+The noise floor of a microphone is learned from the non-speech frames the
+voice activity detector already measures, and smoothed across recordings
+with an exponentially weighted moving average. Nothing is recorded just
+for calibration, so every clip is recognized from its first sample.
+"""
+
+import logging
+import threading
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class NoiseProfile:
+    """EWMA of one session's (or device's) background noise level in dBFS"""
+    
+    def __init__(self, alpha=None):
+        self.alpha = alpha if alpha is not None else Config.NOISE_PROFILE_ALPHA
+        self.floor_db = None
+        self.updates = 0
+        self.lock = threading.Lock()
+    
+    def update(self, noise_db):
+        """Fold in the noise level measured on one clip and return the new floor"""
+        if noise_db is None:
+            return self.floor_db
+        with self.lock:
+            if self.floor_db is None:
+                self.floor_db = float(noise_db)
+            else:
+                self.floor_db += self.alpha * (float(noise_db) - self.floor_db)
+            self.updates += 1
+            return self.floor_db
+    
+    def snapshot(self):
+        with self.lock:
+            return {'floor_db': self.floor_db, 'updates': self.updates}
+
+
+def session_noise_profile(key):
+    """NoiseProfile kept in Streamlit session state under key; None if session state is unavailable"""
+    try:
+        import streamlit as st
+        
+        state_key = f"{key}_noise_profile"
+        if state_key not in st.session_state:
+            st.session_state[state_key] = NoiseProfile()
+        return st.session_state[state_key]
+    except Exception as e:
+        logger.debug(f"No session for noise profile {key}: {e}")
+        return None
@@ -0,0 +1,147 @@
+"""
+ONNX Runtime backend for the text emotion model
+Exports the transformer once, optionally int8-quantizes it and serves it on CPU
+"""
+
+import inspect
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class OnnxEmotionModel:
+    """Emotion classifier served through an onnxruntime session"""
+    
+    def __init__(self, model_path, tokenizer, id2label, num_threads=0):
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        
+        self.model_path = model_path
+        self.tokenizer = tokenizer
+        self.labels = [id2label[i].lower() for i in range(len(id2label))]
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+    
+    def predict_proba(self, texts):
+        """Return a (len(texts), num_labels) array of probabilities"""
+        encoded = self.tokenizer(texts, padding=True, truncation=True, return_tensors='np')
+        feeds = {
+            name: np.asarray(value, dtype=np.int64)
+            for name, value in encoded.items() if name in self.input_names
+        }
+        logits = self.session.run(['logits'], feeds)[0]
+        
+        # Softmax in float64 to match the torch pipeline closely
+        logits = logits.astype(np.float64)
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+    
+    def predict(self, texts):
+        """Return raw label scores per text"""
+        return [dict(zip(self.labels, row.tolist())) for row in self.predict_proba(texts)]
+    
+    def __call__(self, text):
+        """Pipeline-compatible single text call"""
+        scores = self.predict([text])[0]
+        return [[{'label': label, 'score': score} for label, score in scores.items()]]
+
+
+def export_onnx_model(model, output_path, opset_version=14):
+    """Export a sequence classification model to ONNX with dynamic batch/sequence axes"""
+    import torch
+    
+    class _LogitsOnly(torch.nn.Module):
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+        
+        def forward(self, input_ids, attention_mask):
+            return self.wrapped(input_ids=input_ids, attention_mask=attention_mask).logits
+    
+    # Wrap in eval mode: export restores the wrapper's mode, which recurses into the model
+    wrapper = _LogitsOnly(model).eval()
+    
+    # Trace with a padded batch so the attention-mask path is not constant-folded
+    dummy_ids = torch.full((2, 8), 5, dtype=torch.long)
+    dummy_mask = torch.ones((2, 8), dtype=torch.long)
+    dummy_mask[1, 4:] = 0
+    
+    export_kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+        export_kwargs['dynamo'] = False
+    
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (dummy_ids, dummy_mask),
+            output_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'}
+            },
+            opset_version=opset_version,
+            **export_kwargs
+        )
+    return output_path
+
+
+def quantize_onnx_model(input_path, output_path):
+    """Dynamically quantize an ONNX model's weights to int8"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+    return output_path
+
+
+def get_artifact_dir(model_name, cache_dir):
+    """Directory holding the exported artifacts for a model"""
+    return os.path.join(cache_dir, model_name.replace('/', '__'))
+
+
+def load_onnx_classifier(model_name, cache_dir, quantize=True, num_threads=0):
+    """Load the ONNX classifier, exporting and quantizing it on first use"""
+    from transformers import AutoTokenizer
+    
+    artifact_dir = get_artifact_dir(model_name, cache_dir)
+    fp32_path = os.path.join(artifact_dir, 'model.onnx')
+    int8_path = os.path.join(artifact_dir, 'model.int8.onnx')
+    labels_path = os.path.join(artifact_dir, 'labels.json')
+    model_path = int8_path if quantize else fp32_path
+    
+    if not os.path.exists(model_path) or not os.path.exists(labels_path):
+        from transformers import AutoModelForSequenceClassification
+        
+        logger.info(f"Exporting {model_name} to ONNX in {artifact_dir}")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        
+        if not os.path.exists(fp32_path):
+            export_onnx_model(model, fp32_path)
+        if quantize and not os.path.exists(int8_path):
+            quantize_onnx_model(fp32_path, int8_path)
+        
+        tokenizer.save_pretrained(artifact_dir)
+        with open(labels_path, 'w') as f:
+            json.dump({str(i): label for i, label in model.config.id2label.items()}, f)
+    
+    tokenizer = AutoTokenizer.from_pretrained(artifact_dir)
+    with open(labels_path) as f:
+        id2label = {int(i): label for i, label in json.load(f).items()}
+    
+    logger.info(f"Loaded ONNX emotion model from {model_path}")
+    return OnnxEmotionModel(model_path, tokenizer, id2label, num_threads=num_threads)
@@ -0,0 +1,198 @@
+"""
+Incremental transcription of live recordings
+Frames are grouped into segments while the user is still talking. Each
+segment is cut at a quiet frame once it is long enough, and is transcribed
+and scored on a background worker. When recording stops only the final
+segment is left to process.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from config import Config
+from emotion.chunking import aggregate_scores
+from utils.ring_buffer import AudioRingBuffer
+
+logger = logging.getLogger(__name__)
+
+INT16 = np.dtype(np.int16)
+
+# Weight of a segment scored by tone of voice alone, in words per second of audio
+SPEECH_WORDS_PER_SECOND = 2.5
+
+# Shared by every recording session so concurrent users cannot oversubscribe the CPU
+segment_executor = ThreadPoolExecutor(
+    max_workers=Config.AUDIO_STREAMING_WORKERS,
+    thread_name_prefix="audio-segment"
+)
+
+
+@dataclass(frozen=True)
+class SegmentResult:
+    """Transcript and emotion (text, tone of voice or both) of one recorded segment"""
+    index: int
+    seconds: float
+    text: Optional[str]
+    emotion: Optional[str] = None
+    confidence: float = 0.0
+    scores: Optional[dict] = None
+
+
+def frame_to_mono(frame):
+    """int16 mono samples from an av.AudioFrame (packed or planar, any channel count)
+    
+    Mono s16 frames, what the browser sends with channelCount 1, come back
+    as a zero-copy view of the frame's plane.
+    """
+    # nb_channels avoids building the per-channel objects on newer PyAV
+    channels = getattr(frame.layout, 'nb_channels', None) or len(frame.layout.channels)
+    if channels == 1 and frame.format.name == 's16':
+        return np.frombuffer(frame.planes[0], dtype=INT16)[:frame.samples]
+    
+    samples = frame.to_ndarray()
+    is_float = np.issubdtype(samples.dtype, np.floating)
+    if frame.format.is_planar:
+        samples = samples.mean(axis=0) if channels > 1 else samples[0]
+    else:
+        samples = samples.reshape(-1, channels).mean(axis=1) if channels > 1 else samples.reshape(-1)
+    if is_float:
+        samples = np.clip(samples, -1.0, 1.0) * 32767
+    return samples.astype(np.int16, copy=False)
+
+
+class StreamingAudioAnalyzer:
+    """Segments a live recording and analyzes each segment while recording continues
+    
+    Only the first max_seconds (MAX_AUDIO_DURATION by default) of a recording
+    are analyzed; later frames are counted in dropped_samples and ignored.
+    """
+    
+    def __init__(self, audio_detector=None, text_detector=None, min_segment_seconds=None,
+                 max_segment_seconds=None, silence_rms=None, executor=None, noise_profile=None,
+                 max_seconds=None):
+        if audio_detector is None:
+            from emotion.audio_emotion import audio_emotion_detector as audio_detector
+        if text_detector is None:
+            from emotion.text_emotion import text_emotion_detector as text_detector
+        
+        self.audio_detector = audio_detector
+        self.text_detector = text_detector
+        self.min_segment_seconds = min_segment_seconds or Config.AUDIO_SEGMENT_MIN_SECONDS
+        self.max_segment_seconds = max_segment_seconds or Config.AUDIO_SEGMENT_MAX_SECONDS
+        self.silence_rms = silence_rms if silence_rms is not None else Config.AUDIO_SEGMENT_SILENCE_RMS
+        self.executor = executor or segment_executor
+        self.noise_profile = noise_profile
+        self.max_seconds = max_seconds or Config.MAX_AUDIO_DURATION
+        
+        self.lock = threading.Lock()
+        self.sample_rate = None
+        self.buffer = None
+        self.futures = []
+        self.received_samples = 0
+        self.dropped_samples = 0
+    
+    def add_frame(self, samples, sample_rate):
+        """Copy one frame of int16 mono samples into the segment buffer"""
+        with self.lock:
+            if self.buffer is None:
+                self.sample_rate = sample_rate
+                # Segments never outgrow the maximum; one extra second absorbs the last frame
+                self.buffer = AudioRingBuffer.for_duration(self.max_segment_seconds + 1, sample_rate)
+            
+            # Past the duration cap nothing more is buffered or sent to ASR
+            remaining = int(self.max_seconds * self.sample_rate) - self.received_samples
+            if remaining <= 0:
+                self.dropped_samples += len(samples)
+                return
+            if len(samples) > remaining:
+                self.dropped_samples += len(samples) - remaining
+                samples = samples[:remaining]
+            self.received_samples += len(samples)
+            self.buffer.write(samples)
+            if self.received_samples >= int(self.max_seconds * self.sample_rate):
+                self._submit_segment()
+                return
+            
+            seconds = len(self.buffer) / self.sample_rate
+            if seconds < self.min_segment_seconds:
+                return
+            # Cut at a pause so words are not split between segments
+            if seconds >= self.max_segment_seconds or self._is_quiet(samples):
+                self._submit_segment()
+    
+    def _is_quiet(self, samples):
+        if not len(samples):
+            return True
+        rms = np.sqrt(np.mean(np.square(samples, dtype=np.float64))) / 32768.0
+        return rms < self.silence_rms
+    
+    def _submit_segment(self):
+        """Hand the buffered frames to the worker; the caller holds the lock"""
+        if self.buffer is None or not len(self.buffer):
+            return
+        audio = self.buffer.to_array()
+        self.buffer.clear()
+        index = len(self.futures)
+        self.futures.append(self.executor.submit(self._analyze_segment, index, audio, self.sample_rate))
+    
+    def _analyze_segment(self, index, audio, sample_rate):
+        seconds = len(audio) / sample_rate
+        try:
+            # Same acoustic-mode handling as whole clips: 'only' skips ASR, silence falls back to tone
+            result, text = self.audio_detector.score_audio(
+                audio, sample_rate,
+                lambda: self.audio_detector.transcribe_audio(audio, sample_rate, self.noise_profile),
+                text_detector=self.text_detector
+            )
+            if result is None or result.emotion is None:
+                return SegmentResult(index, seconds, text)
+            return SegmentResult(index, seconds, text, result.emotion, result.confidence, dict(result.scores))
+        except Exception as e:
+            logger.error(f"Error analyzing audio segment {index}: {e}")
+            return SegmentResult(index, seconds, None)
+    
+    def completed_segments(self):
+        """Segments analyzed so far, in recording order"""
+        with self.lock:
+            futures = list(self.futures)
+        return [future.result() for future in futures if future.done()]
+    
+    def provisional(self):
+        """(emotion, confidence, transcript) over the segments analyzed so far"""
+        return self._combine(self.completed_segments())
+    
+    def finish(self):
+        """Analyze the remaining audio and return (emotion, confidence, transcript)"""
+        with self.lock:
+            self._submit_segment()
+            futures = list(self.futures)
+            if self.dropped_samples:
+                logger.warning(f"Recording exceeded {self.max_seconds}s; dropped the last "
+                               f"{self.dropped_samples / self.sample_rate:.1f}s")
+        return self._combine([future.result() for future in futures])
+    
+    @staticmethod
+    def _combine(segments):
+        """Join transcripts and weight segment emotions by their word count
+        
+        Segments scored without a transcript count as SPEECH_WORDS_PER_SECOND
+        words per second of audio.
+        """
+        transcript = ' '.join(segment.text for segment in segments if segment.text) or None
+        scored = [segment for segment in segments if segment.emotion]
+        if not scored:
+            return None, 0.0, transcript
+        
+        scores = aggregate_scores(
+            [segment.scores for segment in scored],
+            [len(segment.text.split()) if segment.text else max(1, round(segment.seconds * SPEECH_WORDS_PER_SECOND))
+             for segment in scored],
+            method='length'
+        )
+        emotion = max(scores, key=scores.get)
+        return emotion, scores[emotion], transcript
@@ -1,89 +1,427 @@
 from transformers import pipeline
+import hashlib
+import json
 import logging
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
 import streamlit as st
+from config import Config
+from emotion.batching import MicroBatcher
+from emotion.catalog import EMOTION_ALIASES
+from emotion.chunking import aggregate_scores, chunk_spans, token_offsets
+from emotion.onnx_backend import OnnxEmotionModel
+from utils.cache import LRUCache
+from utils.disk_cache import SQLiteCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Process-wide memo shared by every detector instance and Streamlit session
+text_prediction_cache = LRUCache(
+    max_size=Config.TEXT_CACHE_MAX_SIZE,
+    ttl=Config.TEXT_CACHE_TTL
+)
+
+@dataclass(frozen=True)
+class EmotionResult:
+    """Top emotion, its confidence and the full mapped distribution for one text"""
+    emotion: Optional[str]
+    confidence: float
+    scores: Mapping[str, float] = field(default_factory=dict)
+    
+    def __post_init__(self):
+        # Results are shared through the cache, so keep the scores read-only
+        object.__setattr__(self, 'scores', MappingProxyType(dict(self.scores)))
+    
+    def to_dict(self):
+        """JSON-serializable form, accepted back by EmotionResult(**data)"""
+        return {'emotion': self.emotion, 'confidence': self.confidence, 'scores': dict(self.scores)}
+    
+    def as_tuple(self):
+        """(emotion, confidence, scores) with a mutable copy of the scores"""
+        return self.emotion, self.confidence, dict(self.scores)
+
+EMPTY_RESULT = EmotionResult(None, 0.0)
+
+@dataclass(frozen=True)
+class ChunkProgress:
+    """Aggregate result over the chunks of a long text scored so far"""
+    result: EmotionResult
+    chunks_done: int
+    chunks_total: int
+    
+    @property
+    def is_final(self):
+        return self.chunks_done >= self.chunks_total
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different inputs share a cache entry"""
+    return ' '.join((text or '').split())
+
 class TextEmotionDetector:
     def __init__(self):
         self.classifier = None
-        self.emotion_mapping = {
-            'joy': 'happy',
-            'happiness': 'happy',
-            'sadness': 'sad',
-            'anger': 'angry',
-            'fear': 'anxious',
-            'surprise': 'excited',
-            'love': 'romantic',
-            'disgust': 'angry',
-            'optimism': 'confident',
-            'pessimism': 'sad'
-        }
+        self.batcher = None
+        self.cache = text_prediction_cache
+        self.store = None
+        self.remote = None
+        self.cascade = None
+        self.chunk_max_tokens = Config.TEXT_CHUNK_MAX_TOKENS
+        self.chunk_stride = Config.TEXT_CHUNK_STRIDE
+        self.model_name = Config.TEXT_EMOTION_MODEL
+        self.backend = Config.TEXT_EMOTION_BACKEND
+        self.emotion_mapping = dict(EMOTION_ALIASES)
     
     @st.cache_resource
     def load_model(_self):
         """Load the emotion classification model"""
         try:
-            _self.classifier = pipeline(
-                "text-classification",
-                model="j-hartmann/emotion-english-distilroberta-base",
-                return_all_scores=True
-            )
-            logger.info("Text emotion model loaded successfully")
+            if _self.backend == 'onnx':
+                from emotion.onnx_backend import load_onnx_classifier
+                _self.classifier = load_onnx_classifier(
+                    _self.model_name,
+                    Config.MODEL_CACHE_DIR,
+                    quantize=Config.ONNX_QUANTIZE,
+                    num_threads=Config.ONNX_NUM_THREADS
+                )
+            else:
+                _self.classifier = pipeline(
+                    "text-classification",
+                    model=_self.model_name,
+                    return_all_scores=True
+                )
+            logger.info(f"Text emotion model loaded successfully ({_self.backend} backend)")
             return True
         except Exception as e:
             logger.error(f"Error loading text emotion model: {e}")
             return False
     
-    def detect_emotion(self, text):
-        """Detect emotion from text input"""
-        if not self.classifier:
-            if not self.load_model():
-                return None, 0.0
+    def enable_batching(self, window_ms=10, max_batch_size=16):
+        """Route cache misses through a shared micro-batching worker"""
+        if self.batcher is None:
+            self.batcher = MicroBatcher(
+                self._analyze_batch_uncached,
+                window_ms=window_ms,
+                max_batch_size=max_batch_size,
+                name="text-emotion-batcher"
+            )
+        return self.batcher
+    
+    def disable_batching(self):
+        """Stop the micro-batching worker and run inference inline again"""
+        if self.batcher is not None:
+            self.batcher.stop()
+            self.batcher = None
+    
+    def analyze(self, text):
+        """Classify text and return an EmotionResult, chunking it if it is long"""
+        return self.analyze_long(text)
+    
+    def analyze_long(self, text, aggregate=None, batch_size=8):
+        """Score every chunk of text and return the aggregated EmotionResult"""
+        progress = None
+        for progress in self.iter_analyze_long(text, aggregate, batch_size):
+            pass
+        return progress.result
+    
+    def iter_analyze_long(self, text, aggregate=None, batch_size=8):
+        """Score text in sliding token windows, yielding a ChunkProgress per batch
+        
+        Chunks are scored in document order, so each yielded result is a
+        provisional answer for the text read so far. The last one is final.
+        Texts that fit in one window produce a single ChunkProgress.
+        """
+        text = normalize_text(text)
+        aggregate = aggregate or Config.TEXT_CHUNK_AGGREGATE
+        
+        spans = self.chunk_text(text)
+        if len(spans) <= 1:
+            yield ChunkProgress(self._analyze_cached([text], use_batcher=True)[0], 1, 1)
+            return
+        
+        chunk_results = []
+        weights = []
+        for start in range(0, len(spans), batch_size):
+            batch = spans[start:start + batch_size]
+            chunk_results.extend(self.analyze_batch([text[begin:end] for begin, end, _ in batch], batch_size))
+            weights.extend(n_tokens for _, _, n_tokens in batch)
+            yield ChunkProgress(
+                self._aggregate_results(chunk_results, weights, aggregate),
+                len(chunk_results),
+                len(spans)
+            )
+    
+    def chunk_text(self, text):
+        """(start_char, end_char, n_tokens) windows covering text"""
+        # Every token covers at least one character, so short texts fit in one window
+        if len(text) <= self.chunk_max_tokens:
+            return [(0, len(text), len(text))]
+        
+        # Count real model tokens when the model runs in-process; the model
+        # server path falls back to word windows
+        if not self.classifier and self.remote is None:
+            self.load_model()
+        tokenizer = getattr(self.classifier, 'tokenizer', None)
+        
+        return chunk_spans(token_offsets(text, tokenizer), self.chunk_max_tokens, self.chunk_stride)
+    
+    @staticmethod
+    def _aggregate_results(results, weights, method):
+        """Combine chunk results into one EmotionResult, skipping failed chunks"""
+        scored = [(result, weight) for result, weight in zip(results, weights) if result.emotion is not None]
+        if not scored:
+            return EMPTY_RESULT
+        
+        scores = aggregate_scores(
+            [result.scores for result, _ in scored],
+            [weight for _, weight in scored],
+            method
+        )
+        best_emotion = max(scores, key=scores.get)
+        return EmotionResult(best_emotion, scores[best_emotion], scores)
+    
+    def analyze_batch(self, texts, batch_size=32):
+        """Classify many texts, reusing cached results and batching the rest"""
+        return self._analyze_cached([normalize_text(text) for text in texts], batch_size=batch_size)
+    
+    def _analyze_cached(self, texts, batch_size=32, use_batcher=False):
+        """Resolve texts from the memo, then the persistent store, then the model"""
+        fingerprint = self.model_fingerprint()
+        store = self._bound_store(fingerprint)
+        digests = [self._text_digest(text) for text in texts]
+        keys = [f"{fingerprint}:{digest}" for digest in digests]
+        results = [self.cache.get(key) for key in keys]
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing and store is not None:
+            try:
+                stored = store.get_many([digests[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"Prediction store lookup failed: {e}")
+                stored = {}
+            for i in missing:
+                if digests[i] in stored:
+                    results[i] = EmotionResult(**stored[digests[i]])
+                    self.cache.set(keys[i], results[i])
+            missing = [i for i in missing if results[i] is None]
+        
+        if not missing:
+            return results
         
         try:
-            # Get predictions
-            predictions = self.classifier(text)
-            
-            # Find the highest confidence prediction
-            best_prediction = max(predictions[0], key=lambda x: x['score'])
-            
-            # Map to our emotion categories
-            detected_emotion = best_prediction['label'].lower()
-            confidence = best_prediction['score']
-            
-            # Map to our standardized emotions
-            mapped_emotion = self.emotion_mapping.get(detected_emotion, detected_emotion)
-            
-            logger.info(f"Detected emotion: {mapped_emotion} (confidence: {confidence:.2f})")
-            
-            return mapped_emotion, confidence
-            
+            if use_batcher and self.batcher is not None and len(missing) == 1:
+                computed = [self.batcher.submit(texts[missing[0]]).result()]
+            else:
+                computed = self._analyze_batch_uncached([texts[i] for i in missing], batch_size)
         except Exception as e:
             logger.error(f"Error detecting emotion from text: {e}")
-            return None, 0.0
+            computed = [EMPTY_RESULT for _ in missing]
+        
+        to_store = {}
+        for i, result in zip(missing, computed):
+            results[i] = result
+            if result.emotion is not None:
+                self.cache.set(keys[i], result)
+                to_store[digests[i]] = result.to_dict()
+        
+        if to_store and store is not None:
+            try:
+                store.set_many(to_store)
+            except Exception as e:
+                logger.warning(f"Prediction store write failed: {e}")
+        
+        if len(texts) == 1 and results[0].emotion is not None:
+            logger.info(f"Detected emotion: {results[0].emotion} (confidence: {results[0].confidence:.2f})")
+        return results
+    
+    def detect_emotion(self, text):
+        """Detect emotion from text input"""
+        result = self.analyze(text)
+        return result.emotion, result.confidence
+    
+    def detect_emotions_batch(self, texts, batch_size=32):
+        """Detect emotions for many texts with one forward pass per batch
+        
+        Returns a list of (emotion, confidence, scores) tuples in input order,
+        where scores holds the full mapped emotion distribution.
+        """
+        return [result.as_tuple() for result in self.analyze_batch(texts, batch_size)]
     
     def get_emotion_breakdown(self, text):
         """Get detailed emotion breakdown with all scores"""
-        if not self.classifier:
+        return dict(self.analyze(text).scores)
+    
+    def cache_stats(self):
+        """Hit/miss counters and size of the prediction cache"""
+        return self.cache.stats()
+    
+    def model_fingerprint(self):
+        """Identifier for the model, backend and label mapping producing results"""
+        identity = json.dumps({
+            'model': self.model_name,
+            'backend': self.backend,
+            'quantized': self.backend == 'onnx' and Config.ONNX_QUANTIZE,
+            'mapping': self.emotion_mapping,
+            # Confidence is the summed mapped score, not the top raw label's
+            'confidence': 'mapped_sum',
+            'cascade': self.cascade.fingerprint if self.cascade is not None else None
+        }, sort_keys=True)
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+    
+    def enable_cascade(self, weights_path, margin=0.5):
+        """Answer confident inputs with the distilled first-stage model"""
+        from emotion.cascade import EmotionCascade
+        self.cascade = EmotionCascade.load(weights_path, margin=margin)
+        logger.info(f"Emotion cascade enabled (margin {margin})")
+        return self.cascade
+    
+    def use_model_server(self, address, timeout=5.0):
+        """Run inference in a shared model server, falling back to the local model"""
+        from emotion.model_server import ModelServerClient
+        self.remote = ModelServerClient(address, timeout=timeout)
+        return self.remote
+    
+    def enable_persistent_store(self, path, max_entries=100000, max_age=None):
+        """Share predictions across processes and restarts through a SQLite file"""
+        self.store = SQLiteCache(
+            path,
+            namespace='text_emotion',
+            fingerprint=self.model_fingerprint(),
+            max_entries=max_entries,
+            max_age=max_age
+        )
+        return self.store
+    
+    def _bound_store(self, fingerprint):
+        """The persistent store, reopened if the backend, model, mapping or cascade changed"""
+        store = self.store
+        if store is not None and store.fingerprint != fingerprint:
+            # Entries of the old configuration are no longer read and age out through eviction
+            logger.info("Text model configuration changed, rebinding prediction store")
+            store = self.enable_persistent_store(store.path, store.max_entries, store.max_age)
+        return store
+    
+    @staticmethod
+    def _text_digest(text):
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _analyze_batch_uncached(self, texts, batch_size=32):
+        """Run the cascade and model over texts, one forward pass per batch"""
+        texts = list(texts)
+        if not texts:
+            return []
+        
+        results = [None] * len(texts)
+        pending = list(range(len(texts)))
+        
+        # Confident first-stage answers never reach the transformer
+        if self.cascade is not None:
+            try:
+                accepted, pending = self.cascade.split(texts)
+                for i, label_scores in accepted.items():
+                    results[i] = self._map_prediction(label_scores)
+            except Exception as e:
+                logger.warning(f"Cascade first stage failed, escalating all texts: {e}")
+                pending = list(range(len(texts)))
+        
+        if not pending:
+            return results
+        
+        if not self.classifier and self.remote is None:
             if not self.load_model():
-                return {}
+                for i in pending:
+                    results[i] = EMPTY_RESULT
+                return results
         
-        try:
-            predictions = self.classifier(text)
-            emotion_scores = {}
-            
-            for pred in predictions[0]:
-                emotion = pred['label'].lower()
-                mapped_emotion = self.emotion_mapping.get(emotion, emotion)
-                emotion_scores[mapped_emotion] = pred['score']
-            
-            return emotion_scores
-            
-        except Exception as e:
-            logger.error(f"Error getting emotion breakdown: {e}")
-            return {}
+        # Group texts of similar length so dynamic padding stays small
+        order = sorted(pending, key=lambda i: len(texts[i]))
+        
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            try:
+                predictions = self._predict_raw([texts[i] for i in indices])
+                for i, label_scores in zip(indices, predictions):
+                    results[i] = self._map_prediction(label_scores)
+            except Exception as e:
+                logger.error(f"Error detecting emotion batch: {e}")
+                for i in indices:
+                    results[i] = EMPTY_RESULT
+        
+        return results
+    
+    def _predict_raw(self, texts):
+        """Run a single forward pass and return raw label scores per text"""
+        if self.remote is not None and self.remote.available():
+            try:
+                return self.remote.predict_raw(texts)
+            except Exception as e:
+                logger.warning(f"Model server unavailable, using in-process model: {e}")
+        
+        if not self.classifier and not self.load_model():
+            raise RuntimeError("Text emotion model is not available")
+        
+        if isinstance(self.classifier, OnnxEmotionModel):
+            return self.classifier.predict(texts)
+        
+        import torch
+        
+        tokenizer = self.classifier.tokenizer
+        model = self.classifier.model
+        
+        # Pad to the longest text in this batch rather than the model maximum
+        encoded = tokenizer(texts, padding=True, truncation=True, return_tensors='pt')
+        
+        with torch.inference_mode():
+            logits = model(**encoded).logits
+        
+        probabilities = torch.softmax(logits, dim=-1).cpu().numpy()
+        labels = [model.config.id2label[i].lower() for i in range(probabilities.shape[1])]
+        
+        return [dict(zip(labels, row.tolist())) for row in probabilities]
+    
+    def _map_prediction(self, label_scores):
+        """Map raw label scores to an EmotionResult
+        
+        The confidence is the top emotion's mapped score, as for aggregated
+        chunks, so it means the same whether or not a text was chunked.
+        """
+        # Several model labels share a category (anger/disgust), so sum them
+        scores = {}
+        for label, score in label_scores.items():
+            mapped_emotion = self.emotion_mapping.get(label, label)
+            scores[mapped_emotion] = scores.get(mapped_emotion, 0.0) + float(score)
+        
+        best_emotion = max(scores, key=scores.get)
+        return EmotionResult(best_emotion, scores[best_emotion], scores)
 
 # Global instance
-text_emotion_detector = TextEmotionDetector()
\ No newline at end of file
+text_emotion_detector = TextEmotionDetector()
+
+if Config.CASCADE_WEIGHTS_PATH:
+    try:
+        text_emotion_detector.enable_cascade(Config.CASCADE_WEIGHTS_PATH, margin=Config.CASCADE_MARGIN)
+    except Exception as e:
+        logger.error(f"Could not load cascade weights: {e}")
+
+if Config.EMOTION_SERVER_ADDRESS:
+    text_emotion_detector.use_model_server(
+        Config.EMOTION_SERVER_ADDRESS,
+        timeout=Config.EMOTION_SERVER_TIMEOUT
+    )
+
+if Config.PREDICTION_STORE_ENABLED:
+    try:
+        text_emotion_detector.enable_persistent_store(
+            Config.PREDICTION_STORE_PATH,
+            max_entries=Config.PREDICTION_STORE_MAX_ENTRIES,
+            max_age=Config.PREDICTION_STORE_MAX_AGE
+        )
+    except Exception as e:
+        logger.error(f"Could not open prediction store: {e}")
+
+if Config.TEXT_BATCHING_ENABLED:
+    text_emotion_detector.enable_batching(
+        window_ms=Config.TEXT_BATCH_WINDOW_MS,
+        max_batch_size=Config.TEXT_BATCH_MAX_SIZE
+    )
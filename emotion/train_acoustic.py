@@ -0,0 +1,103 @@
+"""
+Train the acoustic emotion classifier from labelled recordings
+Run from the project root:
+    python -m emotion.train_acoustic --manifest clips.csv --output models/acoustic.npz
+
+The manifest is a CSV with ``path,emotion`` rows (no header), where emotion
+is one of the app's emotion names (happy, sad, angry, calm, ...). Features
+are extracted in batches, a held-out accuracy report is printed and written
+next to the weights as <output>.report.json.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import time
+
+import numpy as np
+
+from emotion.acoustic_emotion import AcousticEmotionClassifier, extract_features
+
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [(row[0], row[1].strip().lower()) for row in csv.reader(f) if len(row) >= 2]
+
+
+def featurize_files(paths, batch_size=32):
+    """Feature matrix for audio files and mean extraction seconds per second of audio"""
+    import soundfile as sf
+    
+    rows, audio_seconds, elapsed = [], 0.0, 0.0
+    for offset in range(0, len(paths), batch_size):
+        # Batches are grouped by sample rate so each one is a single extraction pass
+        by_rate = {}
+        for path in paths[offset:offset + batch_size]:
+            samples, sample_rate = sf.read(path, dtype='float32', always_2d=False)
+            by_rate.setdefault(sample_rate, []).append((path, samples))
+            audio_seconds += len(samples) / sample_rate
+        
+        features = {}
+        for sample_rate, clips in by_rate.items():
+            start = time.perf_counter()
+            matrix = extract_features([samples for _, samples in clips], sample_rate)
+            elapsed += time.perf_counter() - start
+            features.update(zip((path for path, _ in clips), matrix))
+        rows.extend(features[path] for path in paths[offset:offset + batch_size])
+    return np.array(rows, dtype=np.float32), elapsed / max(audio_seconds, 1e-9)
+
+
+def evaluate(classifier, features, targets):
+    predicted = [classifier.labels[i] for i in classifier.predict_proba(features).argmax(axis=1)]
+    per_emotion = {}
+    for emotion in sorted(set(targets)):
+        hits = [p == t for p, t in zip(predicted, targets) if t == emotion]
+        per_emotion[emotion] = round(float(np.mean(hits)), 4)
+    return {
+        'clips': len(targets),
+        'accuracy': round(float(np.mean([p == t for p, t in zip(predicted, targets)])), 4),
+        'per_emotion': per_emotion,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the acoustic emotion classifier")
+    parser.add_argument('--manifest', required=True, help="CSV of path,emotion rows")
+    parser.add_argument('--output', default='models/acoustic.npz')
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--epochs', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    manifest = load_manifest(args.manifest)
+    features, seconds_per_second = featurize_files([path for path, _ in manifest])
+    targets = [emotion for _, emotion in manifest]
+    logger.info(f"Extracted features for {len(manifest)} clips "
+                f"({seconds_per_second * 1000:.2f} ms per second of audio)")
+    
+    order = np.random.default_rng(args.seed).permutation(len(manifest))
+    holdout_size = int(len(manifest) * args.holdout)
+    holdout, train = order[:holdout_size], order[holdout_size:]
+    
+    classifier = AcousticEmotionClassifier(sorted(set(targets)))
+    classifier.fit(features[train], [targets[i] for i in train], epochs=args.epochs)
+    classifier.save(args.output)
+    logger.info(f"Saved acoustic weights to {args.output}")
+    
+    if holdout_size:
+        report = evaluate(classifier, features[holdout], [targets[i] for i in holdout])
+        report['feature_ms_per_audio_second'] = round(seconds_per_second * 1000, 3)
+        print(f"Holdout clips: {report['clips']}  accuracy {report['accuracy']:.1%}")
+        for emotion, accuracy in report['per_emotion'].items():
+            print(f"{emotion:>12} {accuracy:>8.1%}")
+        with open(f"{args.output}.report.json", 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -61,4 +61,89 @@ def mock_spotify_api():
         mock_instance = MagicMock()
         mock_instance.search.return_value = mock_response
         mock_spotify.return_value = mock_instance
-        yield mock_instance
\ No newline at end of file
+        yield mock_instance
+
+class FakeTokenizer:
+    """Whitespace tokenizer producing padded id tensors like a HF tokenizer"""
+    
+    vocab = {'happy': 1, 'joyful': 1, 'sad': 2, 'crying': 2, 'angry': 3, 'furious': 3}
+    
+    def __call__(self, texts, padding=True, truncation=True, return_tensors='pt',
+                 add_special_tokens=True, return_offsets_mapping=False):
+        import torch
+        
+        if return_offsets_mapping:
+            return {'offset_mapping': self.offsets(texts)}
+        if isinstance(texts, str):
+            texts = [texts]
+        token_ids = [[self.vocab.get(word.strip('.,!?'), 4) for word in text.lower().split()] or [4]
+                     for text in texts]
+        max_length = max(len(ids) for ids in token_ids)
+        input_ids = torch.zeros((len(texts), max_length), dtype=torch.long)
+        attention_mask = torch.zeros((len(texts), max_length), dtype=torch.long)
+        for row, ids in enumerate(token_ids):
+            input_ids[row, :len(ids)] = torch.tensor(ids)
+            attention_mask[row, :len(ids)] = 1
+        return {'input_ids': input_ids, 'attention_mask': attention_mask}
+    
+    def offsets(self, text):
+        """Character spans per token; words over six letters become two sub-word tokens"""
+        import re
+        
+        spans = []
+        for match in re.finditer(r'\S+', text):
+            start, end = match.span()
+            if end - start > 6:
+                spans.extend([(start, start + 3), (start + 3, end)])
+            else:
+                spans.append((start, end))
+        return spans
+
+
+class FakeModel:
+    """Deterministic classifier scoring joy/sadness/anger/neutral by token counts"""
+    
+    def __init__(self):
+        self.config = MagicMock()
+        self.config.id2label = {0: 'neutral', 1: 'joy', 2: 'sadness', 3: 'anger'}
+        self.forward_calls = 0
+        self.batch_shapes = []
+    
+    def __call__(self, input_ids, attention_mask):
+        import torch
+        
+        self.forward_calls += 1
+        self.batch_shapes.append(tuple(input_ids.shape))
+        logits = torch.zeros((input_ids.shape[0], 4))
+        for label_id in range(1, 4):
+            logits[:, label_id] = ((input_ids == label_id) & (attention_mask == 1)).sum(dim=1) * 3.0
+        logits[:, 0] = 1.0
+        return MagicMock(logits=logits)
+
+
+class FakePipeline:
+    """Stand-in for the transformers text-classification pipeline"""
+    
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.model = FakeModel()
+    
+    def __call__(self, text):
+        import torch
+        
+        logits = self.model(**self.tokenizer([text])).logits
+        probabilities = torch.softmax(logits, dim=-1)[0].tolist()
+        return [[{'label': self.model.config.id2label[i], 'score': score}
+                 for i, score in enumerate(probabilities)]]
+
+
+@pytest.fixture
+def fake_text_detector():
+    """TextEmotionDetector backed by a small deterministic fake model"""
+    from emotion.text_emotion import TextEmotionDetector
+    from utils.cache import LRUCache
+    
+    detector = TextEmotionDetector()
+    detector.classifier = FakePipeline()
+    detector.cache = LRUCache(max_size=128, ttl=60)
+    return detector
@@ -1,7 +1,11 @@
 import pytest
+import numpy as np
 from unittest.mock import patch, MagicMock
+import io
 import sys
+import time
 import os
+from types import SimpleNamespace
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -225,5 +229,1728 @@ class TestUtilities:
         assert not validate_email("@domain.com")
         assert not validate_email("user@")
 
+class TestBatchedTextEmotion:
+
+    def test_batch_matches_single_predictions(self, fake_text_detector):
+        """Test batched detection agrees with one-at-a-time detection"""
+        texts = ["I am so happy today", "I feel sad and crying", "furious and angry", "just a normal day"]
+        
+        results = fake_text_detector.detect_emotions_batch(texts, batch_size=2)
+        
+        assert [r[0] for r in results] == ['happy', 'sad', 'angry', 'neutral']
+        for text, (emotion, confidence, scores) in zip(texts, results):
+            single_emotion, single_confidence = fake_text_detector.detect_emotion(text)
+            assert emotion == single_emotion
+            assert abs(confidence - single_confidence) < 1e-6
+            assert abs(sum(scores.values()) - 1.0) < 1e-5
+    
+    def test_one_forward_pass_per_batch(self, fake_text_detector):
+        """Test batches run one forward pass with dynamic padding"""
+        model = fake_text_detector.classifier.model
+        texts = ["happy"] * 3 + ["so very sad and crying today"] * 3
+        
+        fake_text_detector.detect_emotions_batch(texts, batch_size=3)
+        
+        assert model.forward_calls == 2
+        # Length-sorted batches pad only to their own longest text
+        assert model.batch_shapes == [(3, 1), (3, 6)]
+    
+    def test_empty_batch(self, fake_text_detector):
+        """Test empty input returns no results"""
+        assert fake_text_detector.detect_emotions_batch([]) == []
+
+class TestMicroBatching:
+
+    def test_concurrent_requests_are_coalesced(self):
+        """Test requests from many threads share batched calls"""
+        from emotion.batching import MicroBatcher
+        from concurrent.futures import ThreadPoolExecutor
+        
+        calls = []
+        
+        def batch_fn(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+        
+        batcher = MicroBatcher(batch_fn, window_ms=50, max_batch_size=8)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda n: batcher.submit(n).result(timeout=5), range(8)))
+        finally:
+            batcher.stop()
+        
+        assert results == [n * 2 for n in range(8)]
+        assert len(calls) < 8
+        assert all(len(batch) <= 8 for batch in calls)
+        
+        metrics = batcher.get_metrics()
+        assert metrics['batch_size']['count'] == len(calls)
+        assert metrics['queue_depth']['count'] == 8
+    
+    def test_batch_errors_reach_callers(self):
+        """Test a failing batch resolves every future with the error"""
+        from emotion.batching import MicroBatcher
+        
+        def batch_fn(items):
+            raise RuntimeError("model unavailable")
+        
+        batcher = MicroBatcher(batch_fn, window_ms=1)
+        try:
+            with pytest.raises(RuntimeError):
+                batcher.submit("text").result(timeout=5)
+        finally:
+            batcher.stop()
+    
+    def test_detector_routes_through_batcher(self, fake_text_detector):
+        """Test detect_emotion uses the shared batching worker when enabled"""
+        fake_text_detector.enable_batching(window_ms=1, max_batch_size=4)
+        try:
+            emotion, confidence = fake_text_detector.detect_emotion("so happy")
+        finally:
+            batcher = fake_text_detector.batcher
+            fake_text_detector.disable_batching()
+        
+        assert emotion == 'happy'
+        assert 0 < confidence <= 1
+        assert batcher.get_metrics()['batch_size']['count'] == 1
+
+class TestOnnxBackend:
+
+    @pytest.fixture
+    def tiny_model(self):
+        """Small randomly initialised RoBERTa classifier (no download needed)"""
+        torch = pytest.importorskip("torch")
+        from transformers import RobertaConfig, RobertaForSequenceClassification
+        
+        torch.manual_seed(0)
+        config = RobertaConfig(
+            vocab_size=16, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+            intermediate_size=64, max_position_embeddings=64, num_labels=4,
+            id2label={0: 'neutral', 1: 'joy', 2: 'sadness', 3: 'anger'},
+            label2id={'neutral': 0, 'joy': 1, 'sadness': 2, 'anger': 3}
+        )
+        return RobertaForSequenceClassification(config).eval()
+    
+    def _torch_probabilities(self, model, tokenizer, texts):
+        import torch
+        
+        encoded = tokenizer(texts)
+        with torch.no_grad():
+            return torch.softmax(model(**encoded).logits, dim=-1).numpy()
+    
+    def test_onnx_matches_torch(self, tiny_model, fake_text_detector, tmp_path):
+        """Test fp32 ONNX outputs match the torch model"""
+        pytest.importorskip("onnxruntime")
+        import numpy as np
+        from emotion.onnx_backend import OnnxEmotionModel, export_onnx_model
+        
+        tokenizer = fake_text_detector.classifier.tokenizer
+        texts = ["so happy", "sad and crying all day long", "angry"]
+        
+        model_path = export_onnx_model(tiny_model, str(tmp_path / "model.onnx"))
+        onnx_model = OnnxEmotionModel(model_path, tokenizer, tiny_model.config.id2label)
+        
+        expected = self._torch_probabilities(tiny_model, tokenizer, texts)
+        np.testing.assert_allclose(onnx_model.predict_proba(texts), expected, atol=1e-4)
+    
+    def test_quantized_model_stays_close(self, tiny_model, fake_text_detector, tmp_path):
+        """Test int8 quantized outputs stay close to the torch model"""
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+        import numpy as np
+        from emotion.onnx_backend import OnnxEmotionModel, export_onnx_model, quantize_onnx_model
+        
+        tokenizer = fake_text_detector.classifier.tokenizer
+        texts = ["so happy", "sad and crying all day long", "angry"]
+        
+        fp32_path = export_onnx_model(tiny_model, str(tmp_path / "model.onnx"))
+        int8_path = quantize_onnx_model(fp32_path, str(tmp_path / "model.int8.onnx"))
+        onnx_model = OnnxEmotionModel(int8_path, tokenizer, tiny_model.config.id2label)
+        
+        expected = self._torch_probabilities(tiny_model, tokenizer, texts)
+        np.testing.assert_allclose(onnx_model.predict_proba(texts), expected, atol=0.05)
+    
+    def test_detector_uses_onnx_predictions(self, tiny_model, fake_text_detector, tmp_path):
+        """Test the detector maps ONNX label scores like the torch path"""
+        pytest.importorskip("onnxruntime")
+        from emotion.onnx_backend import OnnxEmotionModel, export_onnx_model
+        
+        tokenizer = fake_text_detector.classifier.tokenizer
+        model_path = export_onnx_model(tiny_model, str(tmp_path / "model.onnx"))
+        fake_text_detector.classifier = OnnxEmotionModel(model_path, tokenizer, tiny_model.config.id2label)
+        
+        (emotion, confidence, scores), = fake_text_detector.detect_emotions_batch(["so happy"])
+        single_emotion, single_confidence = fake_text_detector.detect_emotion("so happy")
+        
+        assert emotion == single_emotion
+        assert abs(confidence - single_confidence) < 1e-6
+        assert set(scores) == {'neutral', 'happy', 'sad', 'angry'}
+
+class TestEmotionResultCache:
+
+    def test_analyze_returns_full_result(self, fake_text_detector):
+        """Test analyze returns label, confidence and distribution together"""
+        result = fake_text_detector.analyze("I am so happy")
+        
+        assert result.emotion == 'happy'
+        assert result.confidence == max(result.scores.values())
+        assert abs(sum(result.scores.values()) - 1.0) < 1e-5
+        with pytest.raises(TypeError):
+            result.scores['happy'] = 0.0
+    
+    def test_repeat_calls_hit_cache(self, fake_text_detector):
+        """Test detect_emotion and get_emotion_breakdown share one forward pass"""
+        model = fake_text_detector.classifier.model
+        
+        emotion, confidence = fake_text_detector.detect_emotion("I am so happy")
+        breakdown = fake_text_detector.get_emotion_breakdown("  I am   so happy ")
+        
+        assert model.forward_calls == 1
+        assert breakdown['happy'] == confidence
+        stats = fake_text_detector.cache_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+    
+    def test_cache_is_bounded_and_expires(self):
+        """Test LRU eviction and TTL expiry"""
+        from utils.cache import LRUCache
+        
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+        
+        with patch('utils.cache.time.monotonic', return_value=10 ** 9):
+            assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+
+class TestPredictionStore:
+
+    def test_results_survive_new_process(self, fake_text_detector, tmp_path):
+        """Test a fresh detector reuses predictions persisted by another"""
+        from emotion.text_emotion import TextEmotionDetector
+        from utils.cache import LRUCache
+        
+        path = str(tmp_path / "predictions.db")
+        fake_text_detector.enable_persistent_store(path)
+        first = fake_text_detector.analyze("so happy today")
+        
+        other = TextEmotionDetector()
+        other.classifier = MagicMock(side_effect=AssertionError("model should not run"))
+        other.cache = LRUCache(max_size=16)
+        other.enable_persistent_store(path)
+        
+        second = other.analyze("so happy today")
+        assert second == first
+        assert other.store.stats()['hits'] == 1
+    
+    def test_mapping_change_invalidates_entries(self, fake_text_detector, tmp_path):
+        """Test changing the label mapping hides stored predictions"""
+        path = str(tmp_path / "predictions.db")
+        fake_text_detector.enable_persistent_store(path)
+        fake_text_detector.analyze("so happy today")
+        assert len(fake_text_detector.store) == 1
+        
+        fake_text_detector.emotion_mapping = dict(fake_text_detector.emotion_mapping, joy='excited')
+        store = fake_text_detector.enable_persistent_store(path)
+        assert len(store) == 0
+    
+    def test_backend_switch_misses_store(self, fake_text_detector, tmp_path):
+        """Test predictions stored under one backend are not served after switching"""
+        from utils.cache import LRUCache
+        
+        fake_text_detector.enable_persistent_store(str(tmp_path / "predictions.db"))
+        fake_text_detector.analyze("so happy today")
+        old_fingerprint = fake_text_detector.store.fingerprint
+        
+        fake_text_detector.backend = 'onnx'
+        fake_text_detector.cache = LRUCache(max_size=16)
+        fake_text_detector.analyze("so happy today")
+        
+        assert fake_text_detector.classifier.model.forward_calls == 2
+        assert fake_text_detector.store.fingerprint != old_fingerprint
+        assert fake_text_detector.store.fingerprint == fake_text_detector.model_fingerprint()
+        assert len(fake_text_detector.store) == 1
+    
+    def test_fingerprints_share_a_file(self, tmp_path):
+        """Test caches with different fingerprints keep each other's entries until eviction"""
+        from utils.disk_cache import SQLiteCache
+        
+        path = str(tmp_path / "cache.db")
+        with patch('utils.disk_cache.time.time', side_effect=[float(i) for i in range(1, 20)]):
+            first = SQLiteCache(path, 'test', 'v1', max_entries=3, prune_interval=1)
+            first.set('a', {'value': 1})
+            second = SQLiteCache(path, 'test', 'v2', max_entries=3, prune_interval=1)
+            second.set('a', {'value': 2})
+            
+            assert first.get('a') == {'value': 1}
+            assert second.get('a') == {'value': 2}
+            
+            # The cap covers the namespace; v1 is least recently used once v2 keeps writing
+            second.set_many({'b': {'value': 2}, 'c': {'value': 2}})
+        
+        assert len(first) == 0
+        assert len(second) == 3
+    
+    def test_store_evicts_least_recently_used(self, tmp_path):
+        """Test the size cap drops the oldest entries"""
+        from utils.disk_cache import SQLiteCache
+        
+        store = SQLiteCache(str(tmp_path / "cache.db"), 'test', 'v1', max_entries=3, prune_interval=1)
+        with patch('utils.disk_cache.time.time', side_effect=[float(i) for i in range(1, 10)]):
+            for key in ['a', 'b', 'c', 'd']:
+                store.set(key, {'value': key})
+        
+        assert len(store) == 3
+        assert store.get('a') is None
+        assert store.get('d') == {'value': 'd'}
+
+class TestModelServer:
+
+    def test_client_matches_in_process_model(self, fake_text_detector, tmp_path):
+        """Test predictions served over the socket match local inference"""
+        import socketserver
+        from emotion.model_server import EmotionModelServer, ModelServerClient
+        
+        address = f"unix:{tmp_path / 'model.sock'}"
+        server = EmotionModelServer(address, fake_text_detector, window_ms=1)
+        server.start()
+        try:
+            client = ModelServerClient(address, timeout=5)
+            texts = ["so happy", "sad and crying", ""]
+            
+            assert client.ping()
+            remote = client.predict_raw(texts)
+            local = fake_text_detector._predict_raw(texts)
+            
+            assert [max(r, key=r.get) for r in remote] == [max(r, key=r.get) for r in local]
+            for remote_scores, local_scores in zip(remote, local):
+                for label in local_scores:
+                    assert abs(remote_scores[label] - local_scores[label]) < 1e-6
+            # Server options live on private subclasses, not the stdlib classes
+            assert server.server.daemon_threads
+            assert not socketserver.ThreadingUnixStreamServer.daemon_threads
+        finally:
+            server.shutdown()
+    
+    def test_detector_falls_back_when_server_down(self, fake_text_detector, tmp_path):
+        """Test the detector uses its own model if the server is unreachable"""
+        client = fake_text_detector.use_model_server(f"unix:{tmp_path / 'missing.sock'}", timeout=0.5)
+        
+        emotion, confidence = fake_text_detector.detect_emotion("so happy")
+        
+        assert emotion == 'happy'
+        assert not client.available()
+
+class TestEmotionCascade:
+
+    TRAIN_TEXTS = [
+        "so happy today", "happy and joyful", "what a joyful day", "I am happy",
+        "so sad today", "sad and crying", "crying all night", "I am sad",
+        "so angry today", "angry and furious", "furious with them", "I am angry",
+        "just a normal day", "going to the shop", "the meeting is at noon", "reading a book",
+    ]
+    
+    @pytest.fixture
+    def student(self, fake_text_detector):
+        """First-stage model distilled from the fake transformer"""
+        from emotion.cascade import HashedNgramClassifier
+        from emotion.distill_cascade import score_with_teacher
+        
+        probabilities, labels, _ = score_with_teacher(fake_text_detector, self.TRAIN_TEXTS)
+        student = HashedNgramClassifier(labels, n_features=2 ** 12)
+        return student.fit(self.TRAIN_TEXTS * 5, np.tile(probabilities, (5, 1)), epochs=10)
+    
+    def test_student_agrees_with_teacher(self, student, fake_text_detector):
+        """Test distillation reproduces the teacher's top labels"""
+        from emotion.distill_cascade import evaluate_cascade, score_with_teacher
+        
+        probabilities, _, seconds = score_with_teacher(fake_text_detector, self.TRAIN_TEXTS)
+        report = evaluate_cascade(student, self.TRAIN_TEXTS, probabilities, seconds)
+        
+        assert report['student_only_agreement'] >= 0.9
+        rates = [row['escalation_rate'] for row in report['margins']]
+        assert rates == sorted(rates)
+        assert report['margins'][-1]['agreement_with_teacher'] == 1.0
+    
+    def test_weights_round_trip(self, student, tmp_path):
+        """Test the saved weights reload to identical predictions"""
+        from emotion.cascade import HashedNgramClassifier
+        
+        path = student.save(str(tmp_path / "cascade.npz"))
+        loaded = HashedNgramClassifier.load(path)
+        
+        np.testing.assert_allclose(loaded.predict_proba(self.TRAIN_TEXTS), student.predict_proba(self.TRAIN_TEXTS))
+    
+    def test_confident_inputs_skip_transformer(self, student, fake_text_detector, tmp_path):
+        """Test only low-margin inputs escalate to the full model"""
+        path = student.save(str(tmp_path / "cascade.npz"))
+        cascade = fake_text_detector.enable_cascade(path, margin=0.3)
+        model = fake_text_detector.classifier.model
+        model.forward_calls = 0
+        
+        fake_text_detector.analyze("so happy today")
+        assert model.forward_calls == 0
+        
+        cascade.margin = 1.01
+        fake_text_detector.analyze("so sad today")
+        assert model.forward_calls == 1
+        assert cascade.stats()['escalated'] == 1
+        assert cascade.escalation_rate() == 0.5
+
+class TestKeywordEmotionDetection:
+
+    @pytest.fixture(params=[True, False], ids=['automaton', 'regex'])
+    def detector(self, request):
+        from emotion.keyword_emotion import KeywordEmotionDetector, ahocorasick
+        if request.param and ahocorasick is None:
+            pytest.skip("pyahocorasick not installed")
+        return KeywordEmotionDetector(use_automaton=request.param)
+    
+    def test_matches_whole_words_only(self, detector):
+        """Test keywords do not match inside longer words"""
+        assert detector.detect_emotion("the crusade was madness") == (None, 0.0)
+        assert detector.find_keywords("Sad, mad_ness and MAD!") == {'sad', 'mad'}
+    
+    def test_scores_match_original_formula(self, detector):
+        """Test unweighted scores equal the share of keywords present"""
+        emotion, confidence = detector.detect_emotion("I feel sad and down, so sad")
+        
+        assert emotion == 'sad'
+        assert confidence == pytest.approx(2 / 9 * 0.8)
+    
+    def test_weighted_keywords(self):
+        """Test per-keyword weights are normalized within each emotion"""
+        from emotion.keyword_emotion import KeywordEmotionDetector
+        
+        detector = KeywordEmotionDetector({'calm': {'zen': 3.0, 'calm': 1.0}, 'angry': ['mad']})
+        
+        assert detector.score("zen") == {'calm': 0.75}
+        assert detector.detect_emotion("zen calm and mad") == ('calm', 0.8)
+
+class TestLongTextChunking:
+
+    LONG_TEXT = "a happy day " * 8 + "then sad news and crying " * 16
+    
+    def test_streams_provisional_results(self, fake_text_detector):
+        """Test long texts yield a running aggregate before the final result"""
+        fake_text_detector.chunk_max_tokens = 12
+        fake_text_detector.chunk_stride = 2
+        
+        progress = list(fake_text_detector.iter_analyze_long(self.LONG_TEXT, aggregate='length', batch_size=2))
+        
+        assert len(progress) > 1
+        assert progress[0].result.emotion == 'happy'
+        assert not progress[0].is_final
+        assert progress[-1].is_final
+        assert progress[-1].result.emotion == 'sad'
+        assert progress[-1].chunks_done == progress[-1].chunks_total
+        assert max(shape[1] for shape in fake_text_detector.classifier.model.batch_shapes) <= 12
+    
+    def test_analyze_chunks_only_long_texts(self, fake_text_detector):
+        """Test short texts keep the single-pass path"""
+        fake_text_detector.chunk_max_tokens = 12
+        fake_text_detector.chunk_stride = 2
+        model = fake_text_detector.classifier.model
+        
+        assert fake_text_detector.analyze("so happy").emotion == 'happy'
+        assert model.batch_shapes == [(1, 2)]
+        
+        assert fake_text_detector.analyze(self.LONG_TEXT).emotion == 'sad'
+        assert len(model.batch_shapes) > 2
+    
+    def test_confidence_matches_across_chunking(self, fake_text_detector):
+        """Test one text scores the same confidence whether or not it was chunked"""
+        fake_text_detector.emotion_mapping = dict(fake_text_detector.emotion_mapping, anger='sad')
+        single = fake_text_detector.analyze("happy sad angry")
+        
+        # Non-overlapping 3-token windows each hold one of every word, so each chunk scores like the single text
+        fake_text_detector.chunk_max_tokens = 3
+        fake_text_detector.chunk_stride = 0
+        progress = list(fake_text_detector.iter_analyze_long("happy sad angry " * 4, aggregate='length'))[-1]
+        chunked = progress.result
+        
+        # anger and sadness both map to sad, which outweighs the top raw label (joy)
+        assert single.emotion == chunked.emotion == 'sad'
+        assert single.confidence == pytest.approx(single.scores['sad'])
+        assert chunked.confidence == pytest.approx(single.confidence)
+        assert progress.chunks_total == 4
+    
+    def test_chunks_align_to_words(self, fake_text_detector):
+        """Test windows overlap and never split a word into sub-word pieces"""
+        from emotion.chunking import chunk_spans, token_offsets
+        
+        text = "furiously annoyed yet remarkably composed " * 10
+        spans = chunk_spans(token_offsets(text, fake_text_detector.classifier.tokenizer), max_tokens=7, stride=2)
+        
+        assert spans[0][0] == 0
+        assert spans[-1][1] == len(text.rstrip())
+        for (start, end, n_tokens), (next_start, _, _) in zip(spans, spans[1:]):
+            assert n_tokens <= 7
+            assert next_start < end
+            assert start == 0 or text[start - 1] == ' '
+            assert text[end] == ' '
+    
+    def test_aggregate_methods(self):
+        """Test mean, length-weighted and max aggregation of chunk scores"""
+        from emotion.chunking import aggregate_scores
+        
+        chunks = [{'happy': 0.8, 'sad': 0.2}, {'happy': 0.1, 'sad': 0.9}]
+        
+        assert aggregate_scores(chunks, [1, 3], 'mean') == pytest.approx({'happy': 0.45, 'sad': 0.55})
+        assert aggregate_scores(chunks, [3, 1], 'length') == pytest.approx({'happy': 0.625, 'sad': 0.375})
+        assert aggregate_scores(chunks, [1, 3], 'max') == {'happy': 0.8, 'sad': 0.9}
+        with pytest.raises(ValueError):
+            aggregate_scores(chunks, method='median')
+
+class TestASRBackends:
+
+    @pytest.fixture
+    def audio_detector(self, fake_text_detector):
+        from emotion.audio_emotion import AudioEmotionDetector
+        
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            # The silent test clips would otherwise stop at the voice activity gate
+            detector.vad = None
+            yield detector
+    
+    def test_fake_backend_feeds_text_detector(self, audio_detector):
+        """Test the transcript flows into text emotion detection unchanged"""
+        from emotion.asr import FakeASRBackend
+        
+        backend = audio_detector.set_asr_backend(FakeASRBackend(default="I am so happy"))
+        wav_bytes = audio_detector._numpy_to_wav(np.zeros(16000, dtype=np.int16), 16000)
+        
+        emotion, confidence, text = audio_detector.detect_emotion_from_simple_recorder(wav_bytes)
+        
+        assert (emotion, text) == ('happy', "I am so happy")
+        assert backend.calls == 1
+        stats = audio_detector.asr_stats()
+        assert stats['backend'] == 'fake'
+        assert stats['transcripts'] == 1
+        assert stats['latency_ms']['count'] == 1
+    
+    def test_backend_errors_are_counted(self, audio_detector):
+        """Test a failing backend returns no transcript and records the error"""
+        from emotion.asr import FakeASRBackend
+        
+        backend = FakeASRBackend()
+        backend._transcribe = MagicMock(side_effect=RuntimeError("engine crashed"))
+        audio_detector.set_asr_backend(backend)
+        wav_bytes = audio_detector._numpy_to_wav(np.zeros(16000, dtype=np.int16), 16000)
+        
+        assert audio_detector.detect_emotion_from_simple_recorder(wav_bytes) == (None, 0.0, None)
+        assert backend.stats()['errors'] == 1
+    
+    def test_backend_selection(self):
+        """Test backends are created by name and unknown names are rejected"""
+        from emotion.asr import FakeASRBackend, GoogleASRBackend, create_asr_backend
+        
+        assert isinstance(create_asr_backend('fake'), FakeASRBackend)
+        assert isinstance(create_asr_backend('google'), GoogleASRBackend)
+        with pytest.raises(ValueError):
+            create_asr_backend('vosk')
+        with pytest.raises(ValueError):
+            create_asr_backend('carrier-pigeon')
+
+class TestStreamingAudio:
+
+    RATE = 16000
+    
+    def frames(self, seconds, loud=True):
+        """20 ms frames of int16 noise (loud) or near silence"""
+        rng = np.random.default_rng(0)
+        amplitude = 8000 if loud else 20
+        for _ in range(int(seconds * 50)):
+            yield rng.integers(-amplitude, amplitude, self.RATE // 50).astype(np.int16)
+    
+    @pytest.fixture
+    def audio_detector(self, fake_text_detector):
+        from emotion.audio_emotion import AudioEmotionDetector
+        
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            detector.vad = None
+            detector.set_acoustic_detector(None)
+            detector.transcribe_audio = MagicMock(side_effect=["I am so happy", "now sad and crying, sad"])
+            yield detector
+    
+    @pytest.fixture
+    def calm_acoustic(self):
+        from emotion.text_emotion import EmotionResult
+        
+        acoustic = MagicMock()
+        acoustic.analyze.return_value = EmotionResult('calm', 0.8, {'calm': 0.8, 'sad': 0.2})
+        return acoustic
+    
+    def test_segments_are_analyzed_during_recording(self, audio_detector, fake_text_detector):
+        """Test segments cut at pauses are transcribed before recording stops"""
+        from emotion.streaming_audio import StreamingAudioAnalyzer
+        
+        analyzer = StreamingAudioAnalyzer(audio_detector, fake_text_detector, min_segment_seconds=1,
+                                          max_segment_seconds=3)
+        for frame in list(self.frames(1.5)) + list(self.frames(0.1, loud=False)):
+            analyzer.add_frame(frame, self.RATE)
+        
+        # The first segment was cut at the pause and handed to the worker
+        assert len(analyzer.futures) == 1
+        analyzer.futures[0].result(timeout=5)
+        emotion, _, text = analyzer.provisional()
+        assert (emotion, text) == ('happy', "I am so happy")
+        
+        for frame in self.frames(0.5):
+            analyzer.add_frame(frame, self.RATE)
+        emotion, confidence, text = analyzer.finish()
+        
+        assert text == "I am so happy now sad and crying, sad"
+        assert emotion == 'sad'
+        assert audio_detector.transcribe_audio.call_count == 2
+        first_audio = audio_detector.transcribe_audio.call_args_list[0].args[0]
+        assert len(first_audio) == int(1.5 * self.RATE) + self.RATE // 50
+    
+    def test_long_speech_is_cut_at_max_length(self, audio_detector, fake_text_detector):
+        """Test segments without pauses are cut at the maximum length"""
+        from emotion.streaming_audio import StreamingAudioAnalyzer
+        
+        analyzer = StreamingAudioAnalyzer(audio_detector, fake_text_detector, min_segment_seconds=1,
+                                          max_segment_seconds=2)
+        for frame in self.frames(3):
+            analyzer.add_frame(frame, self.RATE)
+        
+        assert len(analyzer.futures) == 1
+        assert analyzer.finish()[2] == "I am so happy now sad and crying, sad"
+    
+    def test_recording_is_capped_at_max_duration(self, audio_detector, fake_text_detector):
+        """Test audio past max_seconds is dropped instead of queued for ASR"""
+        from emotion.streaming_audio import StreamingAudioAnalyzer
+        
+        audio_detector.transcribe_audio.side_effect = None
+        audio_detector.transcribe_audio.return_value = "I am so happy"
+        analyzer = StreamingAudioAnalyzer(audio_detector, fake_text_detector, min_segment_seconds=1,
+                                          max_segment_seconds=2, max_seconds=4)
+        for frame in self.frames(10):
+            analyzer.add_frame(frame, self.RATE)
+        
+        assert len(analyzer.futures) == 2
+        assert analyzer.finish()[0] == 'happy'
+        assert len(analyzer.futures) == 2
+        assert analyzer.received_samples == 4 * self.RATE
+        assert analyzer.dropped_samples == 6 * self.RATE
+    
+    def test_acoustic_only_mode_skips_transcription(self, audio_detector, fake_text_detector, calm_acoustic):
+        """Test streamed segments follow ACOUSTIC_MODE 'only' like whole clips"""
+        from emotion.streaming_audio import StreamingAudioAnalyzer
+        
+        audio_detector.set_acoustic_detector(calm_acoustic, mode='only')
+        analyzer = StreamingAudioAnalyzer(audio_detector, fake_text_detector, min_segment_seconds=1,
+                                          max_segment_seconds=2)
+        for frame in self.frames(3):
+            analyzer.add_frame(frame, self.RATE)
+        emotion, confidence, text = analyzer.finish()
+        
+        assert (emotion, text) == ('calm', None)
+        assert confidence == pytest.approx(0.8)
+        assert audio_detector.transcribe_audio.call_count == 0
+        assert calm_acoustic.analyze.call_count == 2
+    
+    def test_empty_transcript_falls_back_to_acoustic(self, audio_detector, fake_text_detector, calm_acoustic):
+        """Test a segment without speech recognized is scored by tone of voice"""
+        from emotion.streaming_audio import StreamingAudioAnalyzer
+        
+        audio_detector.set_acoustic_detector(calm_acoustic, mode='fuse')
+        audio_detector.transcribe_audio.side_effect = ["", "I am so happy"]
+        analyzer = StreamingAudioAnalyzer(audio_detector, fake_text_detector, min_segment_seconds=1,
+                                          max_segment_seconds=2)
+        for frame in self.frames(2.5):
+            analyzer.add_frame(frame, self.RATE)
+        analyzer.futures[0].result(timeout=5)
+        assert analyzer.provisional() == ('calm', pytest.approx(0.8), None)
+        
+        for frame in self.frames(1):
+            analyzer.add_frame(frame, self.RATE)
+        emotion, _, text = analyzer.finish()
+        assert text == "I am so happy"
+        assert emotion is not None
+        assert audio_detector.transcribe_audio.call_count == 2
+    
+    def test_frame_to_mono(self):
+        """Test packed stereo and planar float frames become int16 mono"""
+        from emotion.streaming_audio import frame_to_mono
+        
+        packed = MagicMock()
+        packed.to_ndarray.return_value = np.array([[100, 300, -50, -150]], dtype=np.int16)
+        packed.layout.nb_channels = 2
+        packed.format.is_planar = False
+        planar = MagicMock()
+        planar.to_ndarray.return_value = np.array([[0.5, -1.5]], dtype=np.float32)
+        planar.layout.nb_channels = 1
+        planar.format.name = 'fltp'
+        planar.format.is_planar = True
+        
+        np.testing.assert_array_equal(frame_to_mono(packed), np.array([200, -100], dtype=np.int16))
+        np.testing.assert_array_equal(frame_to_mono(planar), np.array([16383, -32767], dtype=np.int16))
+
+class TestAudioRingBuffer:
+
+    def test_wraps_and_counts_dropped_samples(self):
+        """Test the buffer keeps the newest audio and reports what it dropped"""
+        from utils.ring_buffer import AudioRingBuffer
+        
+        buffer = AudioRingBuffer(5)
+        buffer.write(np.array([1, 2, 3], dtype=np.int16))
+        assert len(buffer.views()) == 1
+        assert np.shares_memory(buffer.view(), buffer.data)
+        
+        buffer.write(np.array([4, 5, 6, 7], dtype=np.int16))
+        first, second = buffer.views()
+        assert np.shares_memory(first, buffer.data) and np.shares_memory(second, buffer.data)
+        np.testing.assert_array_equal(buffer.to_array(), [3, 4, 5, 6, 7])
+        assert buffer.dropped_samples == 2
+        
+        buffer.write(np.arange(10, 22, dtype=np.int16))
+        np.testing.assert_array_equal(buffer.view(), [17, 18, 19, 20, 21])
+        assert buffer.dropped_samples == 14
+        
+        buffer.clear()
+        assert len(buffer) == 0 and buffer.dropped_samples == 0
+    
+    def test_recorder_buffers_max_audio_duration(self):
+        """Test WebRTC capture copies frames into a buffer sized from MAX_AUDIO_DURATION"""
+        import av
+        from config import Config
+        from utils.audio_recorder_compat import WebRTCAudioRecorder
+        
+        recorder = WebRTCAudioRecorder(streaming=False, sample_rate=8000)
+        assert recorder.audio_buffer.capacity == Config.MAX_AUDIO_DURATION * 8000
+        recorder.start_recording()
+        
+        frame_samples = np.arange(160, dtype=np.int16).reshape(1, -1)
+        frame = av.AudioFrame.from_ndarray(frame_samples, format='s16', layout='mono')
+        frame.sample_rate = 8000
+        for _ in range(Config.MAX_AUDIO_DURATION * 50 + 10):
+            recorder.audio_frame_callback(frame)
+        
+        assert len(recorder.audio_buffer) == recorder.audio_buffer.capacity
+        assert recorder.audio_buffer.dropped_samples == 10 * 160
+        np.testing.assert_array_equal(recorder.audio_buffer.view()[:160], frame_samples[0])
+
+class TestAudioPreprocessing:
+
+    def tone(self, frequency, sample_rate, seconds=1.0, amplitude=0.25):
+        t = np.arange(int(sample_rate * seconds)) / sample_rate
+        return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    
+    def test_resamples_to_asr_rate_and_normalizes(self):
+        """Test a 48 kHz tone comes out as full-scale 16 kHz int16 at the same pitch"""
+        from emotion.audio_preprocessing import prepare_for_asr
+        
+        samples, rate = prepare_for_asr(self.tone(440, 48000), 48000, target_rate=16000)
+        
+        assert rate == 16000
+        assert samples.dtype == np.int16 and len(samples) == 16000
+        assert np.abs(samples).max() == 32767
+        spectrum = np.abs(np.fft.rfft(samples.astype(np.float64)))
+        assert abs(np.argmax(spectrum) * rate / len(samples) - 440) < 2
+    
+    def test_downmix_silence_and_no_upsampling(self):
+        """Test stereo is averaged, silence stays silent and low rates are not upsampled"""
+        from emotion.audio_preprocessing import prepare_for_asr
+        
+        stereo = np.stack([np.full(800, 1000, dtype=np.int16), np.full(800, 3000, dtype=np.int16)], axis=1)
+        samples, rate = prepare_for_asr(stereo, 8000, target_rate=16000)
+        assert rate == 8000
+        np.testing.assert_array_equal(samples, np.full(800, 32767, dtype=np.int16))
+        
+        silence, _ = prepare_for_asr(np.zeros(4800, dtype=np.float32), 48000)
+        assert not silence.any()
+    
+    def test_peak_allocation_is_bounded(self):
+        """Test preprocessing allocates little more than one float32 copy of the input"""
+        import tracemalloc
+        from emotion.audio_preprocessing import prepare_for_asr
+        
+        stereo = np.stack([self.tone(440, 48000, seconds=5)] * 2, axis=1)
+        mono_float_bytes = stereo.shape[0] * 4
+        
+        tracemalloc.start()
+        prepare_for_asr(stereo, 48000, target_rate=16000)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        assert peak < 1.5 * mono_float_bytes
+
+class TestVoiceActivityDetection:
+
+    RATE = 16000
+    
+    def clip(self, leading=1.0, speech=1.0, trailing=1.0):
+        rng = np.random.default_rng(0)
+        noise = lambda seconds: rng.standard_normal(int(seconds * self.RATE)) * 30
+        t = np.arange(int(speech * self.RATE)) / self.RATE
+        voiced = np.sin(2 * np.pi * 220 * t) * 8000 + noise(speech)
+        return np.concatenate([noise(leading), voiced, noise(trailing)]).astype(np.int16)
+    
+    def test_trims_leading_and_trailing_silence(self):
+        """Test the speech span is found and padded within a frame"""
+        from emotion.vad import VoiceActivityDetector
+        
+        vad = VoiceActivityDetector(padding_ms=100)
+        speech, result = vad.trim(self.clip(leading=2.0, trailing=1.0), self.RATE)
+        
+        assert result.has_speech
+        assert abs(result.start / self.RATE - 1.9) < 0.05
+        assert abs(result.end / self.RATE - 3.1) < 0.05
+        assert result.trimmed_seconds == pytest.approx(4.0 - len(speech) / self.RATE)
+    
+    def test_rejects_silence_and_short_clicks(self):
+        """Test noise-only clips and blips shorter than min_speech_ms are rejected"""
+        from emotion.vad import VoiceActivityDetector
+        
+        vad = VoiceActivityDetector(min_speech_ms=200)
+        
+        assert vad.trim(self.clip(speech=0.0, trailing=2.0), self.RATE)[0] is None
+        speech, result = vad.trim(self.clip(speech=0.1), self.RATE)
+        assert speech is None and result.trimmed_seconds == pytest.approx(2.1)
+    
+    def test_silent_clip_skips_recognizer(self, fake_text_detector):
+        """Test the ASR backend only sees trimmed audio that contains speech"""
+        from emotion.asr import FakeASRBackend
+        from emotion.audio_emotion import AudioEmotionDetector
+        
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            backend = detector.set_asr_backend(FakeASRBackend(default="so happy"))
+            
+            silent = detector._numpy_to_wav(np.zeros(3 * self.RATE, dtype=np.int16), self.RATE)
+            assert detector.detect_emotion_from_simple_recorder(silent) == (None, 0.0, None)
+            assert backend.calls == 0
+            
+            spoken = detector._numpy_to_wav(self.clip(leading=1.5, trailing=1.5), self.RATE)
+            assert detector.detect_emotion_from_simple_recorder(spoken)[0] == 'happy'
+            assert backend.calls == 1
+        
+        stats = detector.vad_stats()
+        assert stats['clips'] == 2 and stats['rejected'] == 1
+        # All of the silent clip plus most of the 3 s of pauses around the speech
+        assert 5.4 < stats['trimmed_seconds'] < 5.8
+
+class TestAcousticEmotion:
+
+    RATE = 16000
+    
+    def voice(self, f0, seconds, amplitude, seed=0):
+        """Harmonic tone with vibrato and a little noise"""
+        rng = np.random.default_rng(seed)
+        t = np.arange(int(seconds * self.RATE)) / self.RATE
+        phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))) / self.RATE
+        signal = np.sin(phase) + 0.5 * np.sin(2 * phase) + 0.25 * np.sin(3 * phase)
+        return (amplitude * signal + rng.standard_normal(len(t)) * 0.005).astype(np.float32)
+    
+    def utterance(self):
+        """Voice between pauses, so the voice activity gate keeps it"""
+        pause = np.zeros(self.RATE // 2, dtype=np.float32)
+        return np.concatenate([pause, self.voice(200, 2.0, 0.5), pause])
+    
+    def test_batched_features_match_single_clips(self):
+        """Test padding clips into one batch does not change their features"""
+        from emotion.acoustic_emotion import FEATURE_NAMES, extract_features
+        
+        clips = [self.voice(120, 1.5, 0.2), self.voice(260, 3.0, 0.5)]
+        batch = extract_features(clips, self.RATE)
+        
+        assert batch.shape == (2, len(FEATURE_NAMES))
+        for row, clip in enumerate(clips):
+            assert np.allclose(batch[row], extract_features([clip], self.RATE)[0], atol=1e-4)
+        
+        pitch = 2 ** batch[:, FEATURE_NAMES.index('pitch_mean')]
+        assert pitch == pytest.approx([120, 260], rel=0.02)
+    
+    def test_int16_and_resampled_input(self):
+        """Test int16 and 48 kHz clips give the same features as 16 kHz float"""
+        from emotion.acoustic_emotion import FEATURE_NAMES, extract_features
+        from emotion.audio_preprocessing import resample
+        
+        clip = self.voice(180, 2.0, 0.4)
+        reference = extract_features([clip], self.RATE)[0]
+        as_int16 = extract_features([(clip * 32768).astype(np.int16)], self.RATE)[0]
+        upsampled = extract_features([resample(clip, self.RATE, 48000)], 48000)[0]
+        
+        assert np.allclose(as_int16, reference, atol=0.05)
+        pitch = FEATURE_NAMES.index('pitch_mean')
+        assert upsampled[pitch] == pytest.approx(reference[pitch], abs=0.02)
+    
+    def test_classifier_learns_and_round_trips(self, tmp_path):
+        """Test the softmax model separates simple prosody and survives save/load"""
+        from emotion.acoustic_emotion import AcousticEmotionClassifier, extract_features
+        
+        clips = [self.voice(250 + 10 * i, 1.0, 0.6, seed=i) for i in range(4)] \
+            + [self.voice(100 + 5 * i, 1.0, 0.05, seed=i) for i in range(4)]
+        targets = ['excited'] * 4 + ['calm'] * 4
+        features = extract_features(clips, self.RATE)
+        
+        classifier = AcousticEmotionClassifier(['calm', 'excited']).fit(features, targets)
+        predicted = [classifier.labels[i] for i in classifier.predict_proba(features).argmax(axis=1)]
+        assert predicted == targets
+        
+        loaded = AcousticEmotionClassifier.load(classifier.save(tmp_path / "acoustic.npz"))
+        assert np.allclose(loaded.predict_proba(features), classifier.predict_proba(features))
+    
+    def test_fuse_results(self):
+        """Test fusion weights both sides and falls back to whichever exists"""
+        from emotion.acoustic_emotion import fuse_results
+        from emotion.text_emotion import EmotionResult
+        
+        text = EmotionResult('happy', 0.6, {'happy': 0.6, 'sad': 0.4})
+        acoustic = EmotionResult('sad', 0.9, {'sad': 0.9, 'calm': 0.1})
+        
+        fused = fuse_results(text, acoustic, text_weight=0.5)
+        assert fused.emotion == 'sad'
+        assert fused.scores['sad'] == pytest.approx(0.65)
+        assert fused.scores['calm'] == pytest.approx(0.05)
+        assert fuse_results(text, None) is text
+        assert fuse_results(None, acoustic) is acoustic
+    
+    @pytest.fixture
+    def audio_detector(self, fake_text_detector):
+        from emotion.acoustic_emotion import AcousticEmotionDetector
+        from emotion.asr import FakeASRBackend
+        from emotion.audio_emotion import AudioEmotionDetector
+        
+        classifier = MagicMock()
+        classifier.predict.return_value = [{'calm': 0.9, 'happy': 0.1}]
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            detector.set_asr_backend(FakeASRBackend(default="so happy"))
+            detector.set_acoustic_detector(AcousticEmotionDetector(classifier))
+            yield detector
+    
+    def test_acoustic_only_skips_transcription(self, audio_detector):
+        """Test 'only' mode answers from tone of voice without calling ASR"""
+        audio_detector.acoustic_mode = 'only'
+        wav_bytes = audio_detector._numpy_to_wav(self.utterance(), self.RATE)
+        
+        assert audio_detector.detect_emotion_from_simple_recorder(wav_bytes) == ('calm', 0.9, None)
+        assert audio_detector.asr.calls == 0
+    
+    def test_acoustic_is_fused_with_transcript(self, audio_detector):
+        """Test 'fuse' mode combines the text emotion with the acoustic scores"""
+        audio = (self.utterance() * 32767).astype(np.int16)
+        
+        emotion, confidence, text = audio_detector.detect_emotion_from_webrtc_audio(audio, self.RATE)
+        
+        assert text == "so happy" and audio_detector.asr.calls == 1
+        # The fake text model is confidently happy; 40% acoustic calm is not enough to flip it
+        assert emotion == 'happy'
+        assert 0.4 < confidence < 1.0
+        assert audio_detector.acoustic.classifier.predict.call_count == 1
+
+class TestAudioDecoding:
+
+    RATE = 22050
+    
+    def stereo(self, seconds):
+        t = np.arange(int(seconds * self.RATE)) / self.RATE
+        left = 0.5 * np.sin(2 * np.pi * 220 * t) * (t % 1 < 0.6)  # pauses keep the VAD honest
+        return np.stack([left, left], axis=1).astype(np.float32)
+    
+    def encode(self, seconds, fmt):
+        import soundfile as sf
+        
+        buffer = io.BytesIO()
+        sf.write(buffer, self.stereo(seconds), self.RATE, format=fmt)
+        buffer.seek(0)
+        return buffer
+    
+    def encode_m4a(self, seconds):
+        import av
+        
+        buffer = io.BytesIO()
+        with av.open(buffer, 'w', format='mp4') as container:
+            stream = container.add_stream('aac', rate=self.RATE)
+            stream.layout = 'stereo'
+            frame = av.AudioFrame.from_ndarray(self.stereo(seconds).T.copy(), format='fltp', layout='stereo')
+            frame.sample_rate = self.RATE
+            for packet in list(stream.encode(frame)) + list(stream.encode(None)):
+                container.mux(packet)
+        buffer.seek(0)
+        return buffer
+    
+    @pytest.mark.parametrize("fmt", ['WAV', 'FLAC', 'OGG', 'MP3'])
+    def test_formats_decode_to_capped_mono(self, fmt):
+        """Test compressed and PCM uploads come back as int16 mono within the cap"""
+        from emotion.audio_decoding import decode_audio
+        
+        samples, sample_rate = decode_audio(self.encode(5, fmt), max_seconds=2)
+        
+        assert sample_rate == self.RATE
+        assert samples.dtype == np.int16 and samples.ndim == 1
+        assert len(samples) == 2 * self.RATE
+        assert 12000 < np.abs(samples).max() < 20000
+    
+    def test_pyav_handles_what_soundfile_cannot(self):
+        """Test m4a/AAC falls back to the PyAV decoder"""
+        from emotion.audio_decoding import decode_audio
+        
+        samples, sample_rate = decode_audio(self.encode_m4a(3), max_seconds=10)
+        
+        assert sample_rate == self.RATE
+        assert abs(len(samples) / sample_rate - 3) < 0.1
+    
+    def test_long_files_are_not_read_whole(self):
+        """Test decoding stops reading once max_seconds of audio is produced"""
+        from emotion.audio_decoding import iter_audio_blocks, BLOCK_FRAMES
+        
+        class CountingReader(io.BytesIO):
+            bytes_read = 0
+            
+            def read(self, size=-1):
+                data = super().read(size)
+                self.bytes_read += len(data)
+                return data
+            
+            def readinto(self, buffer):
+                count = super().readinto(buffer)
+                self.bytes_read += count
+                return count
+        
+        source = CountingReader(self.encode(60, 'WAV').getvalue())
+        blocks = list(iter_audio_blocks(source, max_seconds=2))
+        
+        assert sum(len(block) for block, _ in blocks) == 2 * self.RATE
+        assert all(len(block) <= BLOCK_FRAMES for block, _ in blocks)
+        assert source.bytes_read < len(source.getvalue()) / 10
+    
+    def test_undecodable_upload(self):
+        """Test garbage bytes give (None, None) instead of raising"""
+        from emotion.audio_decoding import decode_audio
+        
+        assert decode_audio(io.BytesIO(b"not audio" * 100)) == (None, None)
+    
+    def test_mp3_upload_reaches_recognizer(self, fake_text_detector):
+        """Test uploaded mp3 files are transcribed instead of failing in sr.AudioFile"""
+        from emotion.asr import FakeASRBackend
+        from emotion.audio_emotion import AudioEmotionDetector
+        
+        upload = self.encode(3, 'MP3')
+        upload.type = 'audio/mpeg'
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            backend = detector.set_asr_backend(FakeASRBackend(default="so happy"))
+            emotion, _, text = detector.detect_emotion_from_audio_file(upload)
+        
+        assert (emotion, text) == ('happy', "so happy")
+        assert backend.calls == 1
+
+class TestNoiseProfile:
+
+    RATE = 16000
+    
+    def noise(self, seconds, level, seed=0):
+        return np.random.default_rng(seed).standard_normal(int(seconds * self.RATE)) * level
+    
+    def speech(self, seconds):
+        """Unbroken voiced audio: no quiet frames for an in-clip noise estimate"""
+        t = np.arange(int(seconds * self.RATE)) / self.RATE
+        return np.sin(2 * np.pi * 200 * t) * 6000
+    
+    def test_ewma_update(self):
+        """Test the first clip sets the floor and later clips move it by alpha"""
+        from emotion.noise_profile import NoiseProfile
+        
+        profile = NoiseProfile(alpha=0.25)
+        assert profile.update(None) is None
+        assert profile.update(-60.0) == -60.0
+        assert profile.update(-40.0) == pytest.approx(-55.0)
+        assert profile.snapshot() == {'floor_db': pytest.approx(-55.0), 'updates': 2}
+    
+    def test_known_floor_keeps_unbroken_speech(self):
+        """Test a session floor lets the VAD accept a clip with no pauses"""
+        from emotion.vad import VoiceActivityDetector
+        
+        vad = VoiceActivityDetector()
+        clip = (self.speech(2.0) + self.noise(2.0, 30)).astype(np.int16)
+        
+        assert not vad.detect(clip, self.RATE).has_speech
+        result = vad.detect(clip, self.RATE, noise_floor_db=-60.0)
+        assert result.has_speech and result.start == 0 and result.end == len(clip)
+    
+    def test_repeat_recordings_start_immediately(self, fake_text_detector):
+        """Test no audio is spent on calibration and later clips use the learned floor"""
+        from emotion.asr import FakeASRBackend
+        from emotion.audio_emotion import AudioEmotionDetector
+        from emotion.noise_profile import NoiseProfile
+        
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            backend = detector.set_asr_backend(FakeASRBackend(default="so happy"))
+            backend._transcribe = MagicMock(return_value="so happy")
+            profile = NoiseProfile()
+            
+            first = np.concatenate([self.noise(1.0, 30), self.speech(1.0) + self.noise(1.0, 30, seed=1)])
+            assert detector.detect_emotion_from_webrtc_audio(first.astype(np.int16), self.RATE, profile)[0] == 'happy'
+            assert profile.floor_db == pytest.approx(-61, abs=2)
+            
+            second = (self.speech(1.0) + self.noise(1.0, 30, seed=2)).astype(np.int16)
+            assert detector.detect_emotion_from_webrtc_audio(second, self.RATE, profile)[0] == 'happy'
+        
+        # The unbroken second clip reaches the recognizer whole, from its first sample
+        audio = backend._transcribe.call_args.args[0]
+        assert len(audio.frame_data) // audio.sample_width == len(second)
+        assert profile.updates == 1
+
+class TestJobManager:
+
+    @pytest.fixture
+    def manager(self):
+        from utils.jobs import JobManager
+        
+        manager = JobManager(max_workers=2, max_pending=3, retain_seconds=60)
+        yield manager
+        manager.executor.shutdown(wait=True, cancel_futures=True)
+    
+    def test_result_and_progress(self, manager):
+        """Test a job reports progress and exposes its result"""
+        from utils.jobs import DONE
+        
+        def work(job, value):
+            job.report(0.5, "Halfway")
+            return value * 2
+        
+        job = manager.submit(work, 21, kind='test')
+        job.future.result(timeout=5)
+        
+        assert job.status == DONE and job.result == 42 and job.progress == 1.0
+        assert job.message == "Halfway"
+        assert manager.stats()['done'] == 1
+    
+    def test_concurrency_and_pending_caps(self, manager):
+        """Test at most max_workers run and submissions beyond max_pending are refused"""
+        import threading
+        from utils.jobs import JobQueueFull
+        
+        release = threading.Event()
+        running, peak, lock = [0], [0], threading.Lock()
+        
+        def work(job):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            release.wait(5)
+            with lock:
+                running[0] -= 1
+        
+        jobs = [manager.submit(work) for _ in range(3)]
+        with pytest.raises(JobQueueFull):
+            manager.submit(work)
+        assert manager.stats()['rejected'] == 1
+        
+        release.set()
+        for job in jobs:
+            job.future.result(timeout=5)
+        assert peak[0] == 2
+        # Finished jobs free their slots
+        manager.submit(work).future.result(timeout=5)
+    
+    def test_cancel_queued_and_running(self, manager):
+        """Test cancelled jobs stop before starting or at their next progress report"""
+        import threading
+        from utils.jobs import CANCELLED, DONE
+        
+        started, release = threading.Event(), threading.Event()
+        
+        def work(job):
+            started.set()
+            release.wait(5)
+            job.report(0.9, "Almost")
+            return "finished"
+        
+        running = manager.submit(work)
+        blocker = manager.submit(lambda job: release.wait(5))
+        queued = manager.submit(lambda job: "never runs")
+        started.wait(5)
+        
+        manager.cancel(queued.id)
+        manager.cancel(running.id)
+        release.set()
+        running.future.result(timeout=5)
+        blocker.future.result(timeout=5)
+        
+        assert queued.status == CANCELLED and queued.result is None
+        assert running.status == CANCELLED and running.result is None
+        assert blocker.status == DONE
+    
+    def test_failed_job(self, manager):
+        """Test exceptions are captured as a failed status"""
+        from utils.jobs import FAILED
+        
+        def work(job):
+            raise RuntimeError("decoder exploded")
+        
+        job = manager.submit(work)
+        job.future.result(timeout=5)
+        assert job.status == FAILED and job.error == "decoder exploded"
+    
+    def test_new_session_submission_cancels_previous(self, manager):
+        """Test a session slot holds one job and resubmitting cancels the old one"""
+        import threading
+        from utils.jobs import CANCELLED, session_job, submit_session_job
+        
+        release = threading.Event()
+        session_state = {}
+        
+        def work(job):
+            release.wait(5)
+            job.report(1.0)
+            return "done"
+        
+        first = submit_session_job(session_state, 'audio', work, manager=manager)
+        second = submit_session_job(session_state, 'audio', work, manager=manager)
+        release.set()
+        first.future.result(timeout=5)
+        second.future.result(timeout=5)
+        
+        assert first.status == CANCELLED and manager.get(first.id) is None
+        assert session_job(session_state, 'audio', manager=manager) is second
+        assert second.result == "done"
+        
+        manager.discard(second.id)
+        assert session_job(session_state, 'audio', manager=manager) is None
+        assert 'audio' not in session_state
+    
+    def test_cancellation_passes_through_audio_detector(self, fake_text_detector):
+        """Test JobCancelled is not swallowed by the detector's error handling"""
+        from emotion.asr import FakeASRBackend
+        from emotion.audio_emotion import AudioEmotionDetector
+        from utils.jobs import Job, JobCancelled
+        
+        job = Job('audio')
+        job.cancel()
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            backend = detector.set_asr_backend(FakeASRBackend(default="so happy"))
+            with pytest.raises(JobCancelled):
+                detector.detect_emotion_from_audio_file(io.BytesIO(b"RIFF"), progress=job.report)
+        assert backend.calls == 0
+
+class TestAudioResultCache:
+
+    RATE = 16000
+    
+    def clip(self, fmt):
+        import soundfile as sf
+        
+        t = np.arange(2 * self.RATE) / self.RATE
+        tone = 16000 * np.sin(2 * np.pi * 220 * t) * (t % 1 < 0.6)
+        buffer = io.BytesIO()
+        # int16 input so lossless containers store identical samples
+        sf.write(buffer, tone.astype(np.int16), self.RATE, format=fmt)
+        buffer.seek(0)
+        return buffer
+    
+    @pytest.fixture
+    def audio_detector(self, fake_text_detector, tmp_path):
+        from emotion.audio_emotion import AudioEmotionDetector
+        from emotion.asr import FakeASRBackend
+        
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+            detector.set_asr_backend(FakeASRBackend(default="I am so happy"))
+            detector.enable_result_cache(str(tmp_path / "audio.db"), max_entries=100)
+            yield detector
+    
+    def test_repeat_upload_skips_decode_and_asr(self, audio_detector):
+        """Test the same file again is answered from its bytes without decoding"""
+        import emotion.audio_emotion as audio_module
+        
+        first = audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        with patch.object(audio_module, 'decode_audio', wraps=audio_module.decode_audio) as decode:
+            second = audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        
+        assert first == second == ('happy', first[1], "I am so happy")
+        assert decode.call_count == 0
+        assert audio_detector.asr.calls == 1
+        assert audio_detector.cache_stats()['hit_rate'] == pytest.approx(1 / 3)
+    
+    def test_same_audio_in_another_container_hits(self, audio_detector):
+        """Test the decoded PCM key matches a FLAC re-encoding of a WAV clip"""
+        audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        result = audio_detector.detect_emotion_from_audio_file(self.clip('FLAC'))
+        
+        assert result[0] == 'happy'
+        assert audio_detector.asr.calls == 1
+        # Both the FLAC bytes and the shared PCM are now cached
+        assert audio_detector.cache_stats()['size'] == 3
+    
+    def test_failures_are_not_cached(self, audio_detector):
+        """Test a clip whose recognition failed is retried next time"""
+        from emotion.asr import FakeASRBackend
+        
+        backend = FakeASRBackend(default="")
+        audio_detector.asr = backend
+        
+        assert audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))[0] is None
+        audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        
+        assert backend.calls == 2
+        assert audio_detector.cache_stats()['size'] == 0
+    
+    def test_backend_swap_invalidates(self, audio_detector):
+        """Test results from a previous ASR backend are not served"""
+        from emotion.asr import FakeASRBackend
+        
+        before = audio_detector.result_fingerprint()
+        audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        backend = FakeASRBackend(default="I am so happy")
+        backend.name = 'other'
+        audio_detector.set_asr_backend(backend)
+        audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        
+        assert audio_detector.result_fingerprint() != before
+        assert backend.calls == 1
+    
+    def test_text_model_swap_misses(self, audio_detector, fake_text_detector):
+        """Test a text backend change after the cache was opened is not served stale results"""
+        before = audio_detector.cache.fingerprint
+        audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        fake_text_detector.backend = 'onnx'
+        audio_detector.detect_emotion_from_audio_file(self.clip('WAV'))
+        
+        assert audio_detector.asr.calls == 2
+        assert audio_detector.cache.fingerprint != before
+        assert audio_detector.cache.fingerprint == audio_detector.result_fingerprint()
+    
+    def test_disabled_by_default(self, fake_text_detector):
+        """Test detectors start without a cache and report empty stats"""
+        from emotion.audio_emotion import AudioEmotionDetector
+        
+        with patch('emotion.audio_emotion.text_emotion_detector', fake_text_detector):
+            detector = AudioEmotionDetector()
+        
+        assert detector.cache is None
+        assert detector.cache_stats() == {}
+
+class TestDatabaseSessions:
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        from database.database import DatabaseManager
+        from database.models import Base, Emotion, create_db_engine
+        
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+        Base.metadata.create_all(bind=engine)
+        manager = DatabaseManager(engine=engine)
+        with manager.session_scope() as session:
+            session.add(Emotion(name='happy', color_code='#FFD700'))
+        yield manager
+        engine.dispose()
+    
+    def test_sqlite_pragmas_and_pool(self, manager):
+        """Test file-backed SQLite connections use WAL, NORMAL sync and mmap"""
+        from config import Config
+        
+        with manager.engine.connect() as connection:
+            pragma = lambda name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            assert pragma('journal_mode') == 'wal'
+            assert pragma('synchronous') == 1  # NORMAL
+            assert pragma('mmap_size') == Config.SQLITE_MMAP_SIZE
+        assert manager.engine.pool.size() == Config.DB_POOL_SIZE
+    
+    def test_objects_outlive_their_session(self, manager):
+        """Test returned rows stay readable and no session is left open"""
+        user = manager.create_user('reader', 'reader@example.com', 'secret')
+        emotion = manager.get_emotion_by_name('happy')
+        
+        assert (user.username, emotion.name) == ('reader', 'happy')
+        assert manager.sessions.registry.has() is False
+    
+    def test_session_scope_rolls_back(self, manager):
+        """Test a failing unit of work leaves nothing behind"""
+        from database.models import User
+        
+        with pytest.raises(RuntimeError):
+            with manager.session_scope() as session:
+                session.add(User(username='ghost', email='ghost@example.com', password_hash='x'))
+                session.flush()
+                raise RuntimeError("abort")
+        
+        assert manager.authenticate_user('ghost', 'x') is None
+    
+    def test_threads_get_their_own_sessions(self, manager):
+        """Test concurrent writers and readers on separate sessions without errors"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        
+        user = manager.create_user('writer', 'writer@example.com', 'secret')
+        emotion = manager.get_emotion_by_name('happy')
+        barrier = threading.Barrier(4)
+        
+        def live_session(_):
+            session = manager.get_session()
+            barrier.wait(timeout=5)
+            manager.close_session()
+            return session
+        
+        def work(index):
+            log = manager.create_emotion_log(user.id, emotion.id, f"entry {index}", 'text', 0.9)
+            history = manager.get_user_emotion_history(user.id)
+            return log is not None and len(history) > 0
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            concurrent_sessions = list(pool.map(live_session, range(4)))
+            results = list(pool.map(work, range(40)))
+        
+        assert len({id(session) for session in concurrent_sessions}) == 4
+        assert all(results)
+        assert len(manager.get_user_emotion_history(user.id)) == 40
+
+class TestMigrations:
+
+    INDEXES = {
+        'ix_emotion_logs_user_detected',
+        'ix_user_song_history_user_played',
+        'ix_user_song_history_user_song_played',
+        'ix_predefined_playlists_emotion_priority',
+    }
+    
+    @pytest.fixture(scope='class')
+    def legacy_db(self, tmp_path_factory):
+        """A pre-migration database (tables, no secondary indexes) with synthetic history"""
+        from benchmarks.bench_database import populate
+        from database.models import Base, Emotion, create_db_engine
+        
+        path = tmp_path_factory.mktemp('migrations') / 'legacy.db'
+        engine = create_db_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            for name in self.INDEXES:
+                connection.exec_driver_sql(f"DROP INDEX {name}")
+            connection.execute(Emotion.__table__.insert(), [
+                {'name': name, 'color_code': '#000000'} for name in ('happy', 'sad', 'calm', 'angry')
+            ])
+        # populate() changes the journal mode, which needs the only open connection
+        engine.dispose()
+        user_ids = populate(str(path), rows=50000, users=500, songs=2000)
+        yield engine, user_ids
+        engine.dispose()
+    
+    def query_plans(self, engine, user_id):
+        """EXPLAIN QUERY PLAN details of the SQL each hot-path DatabaseManager call issues"""
+        from sqlalchemy import event
+        from database.database import DatabaseManager
+        
+        manager = DatabaseManager(engine=engine)
+        statements = []
+        
+        def capture(connection, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+        
+        event.listen(engine, 'before_cursor_execute', capture)
+        calls = {
+            'emotion_history': lambda: manager.get_user_emotion_history(user_id, days=30),
+            'song_history': lambda: manager.get_user_song_history(user_id, limit=50),
+            'song_feedback': lambda: manager.update_song_feedback(user_id, 1, True),
+            'predefined_songs': lambda: manager.get_predefined_songs_for_emotion(1),
+        }
+        plans = {}
+        try:
+            for name, call in calls.items():
+                del statements[:]
+                call()
+                statement, parameters = statements[0]
+                with engine.connect() as connection:
+                    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                    plans[name] = ' | '.join(row[-1] for row in rows)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        return plans
+    
+    def test_migration_indexes_hot_paths(self, legacy_db):
+        """Test the history, feedback and playlist queries switch from scans to the new indexes"""
+        from database.migrations import current_version, migrate, LATEST_VERSION
+        
+        engine, user_ids = legacy_db
+        before = self.query_plans(engine, user_ids[0])
+        assert current_version(engine) == 0
+        assert 'SCAN emotion_logs' in before['emotion_history']
+        assert 'SCAN user_song_history' in before['song_history']
+        
+        assert migrate(engine) == [LATEST_VERSION]
+        after = self.query_plans(engine, user_ids[0])
+        
+        assert current_version(engine) == LATEST_VERSION
+        assert 'USING COVERING INDEX ix_emotion_logs_user_detected' in after['emotion_history']
+        assert 'USING COVERING INDEX ix_user_song_history_user_played' in after['song_history']
+        assert 'ix_user_song_history_user_song_played' in after['song_feedback']
+        assert 'USING COVERING INDEX ix_predefined_playlists_emotion_priority' in after['predefined_songs']
+        for plan in after.values():
+            assert 'SCAN emotion_logs' not in plan and 'SCAN user_song_history' not in plan
+    
+    def test_migrate_is_idempotent(self, tmp_path):
+        """Test fresh databases already have the indexes and migrate only records the version"""
+        from sqlalchemy import inspect
+        from database.migrations import current_version, migrate, LATEST_VERSION
+        from database.models import Base, create_db_engine
+        
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+        Base.metadata.create_all(bind=engine)
+        
+        assert migrate(engine) == [LATEST_VERSION]
+        assert migrate(engine) == []
+        assert current_version(engine) == LATEST_VERSION
+        names = {index['name'] for table in ('emotion_logs', 'user_song_history', 'predefined_playlists')
+                 for index in inspect(engine).get_indexes(table)}
+        assert self.INDEXES <= names
+        engine.dispose()
+
+class TestEmotionCatalog:
+
+    ROWS = [
+        SimpleNamespace(id=1, name='happy', color_code='#FFD700', description="Feeling joyful"),
+        SimpleNamespace(id=2, name='anxious', color_code='#DDA0DD', description="Feeling worried"),
+    ]
+    
+    @pytest.fixture
+    def catalog(self):
+        from emotion.catalog import EmotionCatalog
+        
+        loader = MagicMock(return_value=list(self.ROWS))
+        return EmotionCatalog(loader=loader)
+    
+    def test_lookup_by_name_alias_and_id(self, catalog):
+        """Test case-insensitive names, classifier aliases and ids resolve to one entry"""
+        happy = catalog.get('happy')
+        
+        assert catalog.get(' HAPPY ') is happy
+        assert catalog.get('joy') is happy
+        assert catalog.get('fear').name == 'anxious'
+        assert catalog.get_by_id(1) is happy
+        assert catalog.get('hap') is None and catalog.get(None) is None
+        assert catalog.loader.call_count == 1
+    
+    def test_colors_are_precomputed(self, catalog):
+        """Test complementary colors and gradients come with the entry"""
+        from emotion.emotion_utils import EmotionUtils
+        
+        happy = catalog.get('happy')
+        
+        assert happy.complementary_color == '#0028ff'
+        assert happy.gradient == "linear-gradient(135deg, #FFD700 0%, #0028ff 100%)"
+        assert EmotionUtils.get_complementary_color('#FFD700') == happy.complementary_color
+    
+    def test_entries_are_immutable(self, catalog):
+        """Test shared entries and indexes cannot be modified by callers"""
+        from dataclasses import FrozenInstanceError
+        
+        with pytest.raises(FrozenInstanceError):
+            catalog.get('happy').color_code = '#000000'
+        with pytest.raises(TypeError):
+            catalog.by_name['calm'] = None
+    
+    def test_reload_picks_up_changes(self, catalog):
+        """Test reload swaps in a fresh snapshot from the loader"""
+        catalog.get('happy')
+        catalog.loader.return_value = self.ROWS + [
+            SimpleNamespace(id=3, name='calm', color_code='#98FB98', description=None)
+        ]
+        
+        assert catalog.get('calm') is None
+        assert catalog.reload() is True
+        assert catalog.get('calm').id == 3
+        assert len(catalog) == 3
+    
+    def test_failed_load_is_retried(self, catalog):
+        """Test a database error is not cached as an empty catalog"""
+        catalog.loader.side_effect = [RuntimeError("database is locked"), list(self.ROWS)]
+        
+        assert catalog.get('happy') is None
+        assert catalog.get('happy').id == 1
+    
+    def test_emotion_utils_read_the_catalog(self, catalog):
+        """Test EmotionUtils helpers answer from the catalog without querying"""
+        from emotion.emotion_utils import EmotionUtils
+        from emotion.catalog import DEFAULT_COLOR
+        
+        with patch('emotion.emotion_utils.emotion_catalog', catalog):
+            assert EmotionUtils.get_emotion_color('joy') == '#FFD700'
+            assert EmotionUtils.get_emotion_description('anxious') == "Feeling worried"
+            assert EmotionUtils.get_emotion_gradient('happy') == catalog.get('happy').gradient
+            assert EmotionUtils.get_emotion_color('unknown') == DEFAULT_COLOR
+            assert EmotionUtils.get_emotion_description('unknown') == "Unknown emotion"
+        
+        assert catalog.loader.call_count == 1
+
+class TestEventWriter:
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        from database.database import DatabaseManager
+        from database.models import Base, Emotion, Song, User, create_db_engine
+        
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'events.db'}")
+        Base.metadata.create_all(bind=engine)
+        manager = DatabaseManager(engine=engine)
+        with manager.session_scope() as session:
+            session.add_all([
+                Emotion(id=1, name='happy', color_code='#FFD700'),
+                User(id=1, username='listener', email='listener@example.com', password_hash='x'),
+                Song(id=1, title='Happy', artist='Pharrell Williams')
+            ])
+        yield manager
+        engine.dispose()
+    
+    def count(self, manager, model):
+        with manager.session_scope() as session:
+            return session.query(model).count()
+    
+    def test_events_are_batched_and_drained(self, manager):
+        """Test rows are written in size-bounded batches and close() drains the queue"""
+        from database.event_writer import EventWriter
+        from database.models import EmotionLog, UserSongHistory
+        
+        writer = EventWriter(manager=manager, batch_size=10, flush_ms=1000, enabled=True)
+        for index in range(20):
+            assert writer.enqueue_emotion_log(1, 1, f"entry {index}", 'text', 0.9)
+        for _ in range(5):
+            assert writer.enqueue_song_interaction(1, 1, 1, 'text', 0.9, liked=True)
+        writer.close()
+        
+        assert self.count(manager, EmotionLog) == 20
+        assert self.count(manager, UserSongHistory) == 5
+        stats = writer.stats()
+        assert stats['written'] == 25 and stats['pending'] == 0
+        assert stats['batches'] == 3
+    
+    def test_flush_interval_bounds_latency(self, manager):
+        """Test a partial batch is written once flush_ms has passed"""
+        from database.event_writer import EventWriter
+        from database.models import EmotionLog
+        
+        writer = EventWriter(manager=manager, batch_size=1000, flush_ms=20, enabled=True)
+        start = time.monotonic()
+        for _ in range(3):
+            writer.enqueue_emotion_log(1, 1, "hello", 'text', 0.5)
+        writer.flush()
+        
+        assert time.monotonic() - start < 1.0
+        assert self.count(manager, EmotionLog) == 3
+        assert writer.stats()['batches'] == 1
+        writer.close()
+    
+    def test_full_queue_applies_backpressure(self, manager):
+        """Test callers wait up to enqueue_timeout and then get a refusal"""
+        from database.event_writer import EventWriter
+        
+        writer = EventWriter(manager=manager, max_queue=2, enqueue_timeout=0.05, enabled=True)
+        writer.start = lambda: None  # no worker, so nothing leaves the queue
+        
+        assert writer.enqueue_emotion_log(1, 1, "a", 'text', 0.5)
+        assert writer.enqueue_emotion_log(1, 1, "b", 'text', 0.5)
+        start = time.monotonic()
+        assert writer.enqueue_emotion_log(1, 1, "c", 'text', 0.5) is False
+        
+        assert time.monotonic() - start >= 0.05
+        assert writer.stats()['rejected'] == 1
+    
+    def test_disabled_writer_is_synchronous(self, manager):
+        """Test enabled=False writes before returning and starts no thread"""
+        from database.event_writer import EventWriter
+        from database.models import EmotionLog
+        
+        writer = EventWriter(manager=manager, enabled=False)
+        
+        assert writer.enqueue_emotion_log(1, 1, "now", 'text', 0.5)
+        assert self.count(manager, EmotionLog) == 1
+        assert writer.worker is None
+    
+    def test_failed_batches_are_retried_then_counted(self, manager):
+        """Test a persistently failing batch is retried and reported, not raised"""
+        from database.event_writer import EventWriter
+        
+        writer = EventWriter(manager=manager, enabled=False, retries=2)
+        with patch.object(manager, 'session_scope', side_effect=RuntimeError("database is locked")) as scope:
+            assert writer.enqueue_emotion_log(1, 1, "lost", 'text', 0.5) is False
+        
+        assert scope.call_count == 2
+        assert writer.stats()['failed'] == 1
+    
+    def test_flush_before_delete_leaves_no_rows(self, manager):
+        """Test events still queued when a user clears history are written before the delete"""
+        from database.event_writer import EventWriter
+        from database.models import EmotionLog, User, UserSongHistory
+        
+        writer = EventWriter(manager=manager, batch_size=1000, flush_ms=200, enabled=True)
+        for _ in range(3):
+            writer.enqueue_emotion_log(1, 1, "pending", 'text', 0.5)
+        writer.enqueue_song_interaction(1, 1, 1, 'text', 0.5)
+        
+        writer.flush()
+        assert manager.delete_user_data(1)
+        writer.close()
+        
+        assert self.count(manager, EmotionLog) == 0
+        assert self.count(manager, UserSongHistory) == 0
+        assert self.count(manager, User) == 1
+        assert manager.delete_user_data(1, delete_account=True)
+        assert self.count(manager, User) == 0
+
+class TestSongUpsert:
+
+    def songs(self, count, popularity=50):
+        return [{
+            'title': f"Song {index}",
+            'artist': f"Artist {index}",
+            'spotify_id': f"track{index}",
+            'album': "ignored",
+            'popularity': popularity
+        } for index in range(count)]
+    
+    @pytest.fixture
+    def manager(self, tmp_path):
+        from database.database import DatabaseManager
+        from database.models import Base, create_db_engine
+        
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'songs.db'}")
+        Base.metadata.create_all(bind=engine)
+        yield DatabaseManager(engine=engine)
+        engine.dispose()
+    
+    def test_page_is_upserted_in_one_statement(self, manager):
+        """Test a result page becomes one INSERT ... ON CONFLICT and an id map"""
+        from sqlalchemy import event
+        
+        statements = []
+        event.listen(manager.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        
+        ids = manager.upsert_songs(self.songs(10))
+        
+        inserts = [statement for statement in statements if statement.startswith('INSERT')]
+        assert len(inserts) == 1 and 'ON CONFLICT (spotify_id) DO UPDATE' in inserts[0]
+        assert sorted(ids) == sorted(f"track{index}" for index in range(10))
+        assert len(set(ids.values())) == 10
+    
+    def test_repeat_search_updates_in_place(self, manager):
+        """Test songs keep their ids and pick up refreshed metadata"""
+        from database.models import Song
+        
+        first = manager.upsert_songs(self.songs(5))
+        second = manager.upsert_songs(self.songs(8, popularity=90) + self.songs(1, popularity=90))
+        
+        assert all(second[spotify_id] == song_id for spotify_id, song_id in first.items())
+        with manager.session_scope() as session:
+            assert session.query(Song).count() == 8
+            assert {song.popularity for song in session.query(Song)} == {90}
+    
+    def test_songs_without_spotify_id_are_skipped(self, manager):
+        """Test rows the conflict target cannot identify are not inserted"""
+        assert manager.upsert_songs([{'title': "Local", 'artist': "Me"}]) == {}
+        assert manager.upsert_songs([]) == {}
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -8,6 +8,7 @@ from PIL import Image
 import requests
 import logging
 import time
+from emotion.catalog import emotion_catalog
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -199,14 +200,25 @@ def render_input_section():
                 try:
                     # Try ML emotion detection first
                     try:
-                        from emotion.text_emotion import ml_text_emotion_detector
+                        from emotion.text_emotion import text_emotion_detector
                         with st.spinner("🤖 AI is analyzing your emotions..."):
-                            emotion, confidence = ml_text_emotion_detector.detect_emotion(text_input)
+                            # Long entries are scored passage by passage; show the running answer
+                            provisional = st.empty()
+                            for progress in text_emotion_detector.iter_analyze_long(text_input):
+                                result = progress.result
+                                if not progress.is_final and result.emotion:
+                                    provisional.info(
+                                        f"⏳ So far: **{result.emotion}** "
+                                        f"({progress.chunks_done}/{progress.chunks_total} passages read)"
+                                    )
+                            provisional.empty()
                         
+                        emotion, confidence = result.emotion, result.confidence
                         if emotion:
                             emotion_data = {
                                 'emotion': emotion,
                                 'confidence': confidence,
+                                'scores': dict(result.scores),
                                 'input_type': 'ml_text',
                                 'input_text': text_input
                             }
@@ -227,66 +239,95 @@ def render_input_section():
         <div style="background: #f8f9fa; border-radius: 10px; padding: 1.5rem; 
                     margin: 1rem 0; border: 2px dashed #dee2e6; text-align: center;">
             <h4>📁 Upload Audio File</h4>
-            <p>Upload an audio file (wav, mp3, m4a) to analyze emotion</p>
+            <p>Upload an audio file (wav, mp3, m4a, flac, ogg) to analyze emotion</p>
         </div>
         """, unsafe_allow_html=True)
         
         uploaded_file = st.file_uploader(
             "Choose an audio file",
-            type=['wav', 'mp3', 'm4a', 'flac'],
+            type=['wav', 'mp3', 'm4a', 'flac', 'ogg', 'webm'],
             help="Upload audio file (max 10MB)",
             key="audio_file_uploader"
         )
         
         if uploaded_file and st.button("🎯 Analyze Audio File", type="primary", key="analyze_audio_btn"):
-            with st.spinner("🎙️ Processing audio..."):
-                try:
-                    from emotion.audio_emotion import ml_audio_emotion_detector
-                    emotion, confidence, text = ml_audio_emotion_detector.detect_emotion_from_audio_file(uploaded_file)
-                    
-                    if emotion:
-                        emotion_data = {
-                            'emotion': emotion,
-                            'confidence': confidence,
-                            'input_type': 'ml_audio',
-                            'input_text': text
-                        }
-                        st.success(f"✨ Detected emotion: **{emotion}** (confidence: {confidence:.1%})")
-                        if text:
-                            st.info(f"📝 Transcribed: '{text}'")
-                    else:
-                        st.error("Could not detect emotion from audio file")
-                        
-                except Exception as e:
-                    logger.warning(f"ML audio detection failed: {e}")
-                    st.error("Could not process audio file. Please ensure it's a valid audio format.")
+            # Analysis runs on the shared job pool; a new submission cancels the previous one
+            from utils.jobs import JobQueueFull, submit_session_job
+            try:
+                submit_session_job(st.session_state, AUDIO_JOB_KEY, _analyze_audio_file_job, uploaded_file, kind='audio')
+            except JobQueueFull:
+                st.warning("⏳ The server is busy analyzing other recordings. Please try again in a moment.")
+        
+        emotion_data = render_audio_job_status()
     
     return emotion_data
 
+AUDIO_JOB_KEY = "audio_analysis_job"
+
+def _analyze_audio_file_job(job, uploaded_file):
+    """Background job body: decode, transcribe and score an uploaded file"""
+    from emotion.audio_emotion import audio_emotion_detector
+    
+    uploaded_file.seek(0)
+    return audio_emotion_detector.detect_emotion_from_audio_file(uploaded_file, progress=job.report)
+
+def render_audio_job_status():
+    """Show the session's audio analysis job; returns emotion data once it completes
+    
+    While the job runs the script sleeps briefly and reruns, so the result
+    survives unrelated clicks and the script thread is never blocked on ASR.
+    """
+    from config import Config
+    from utils.jobs import DONE, CANCELLED, job_manager, session_job
+    
+    job = session_job(st.session_state, AUDIO_JOB_KEY)
+    if job is None:
+        return None
+    
+    if not job.is_finished:
+        st.progress(job.progress, text=f"🎙️ {job.message}...")
+        if st.button("✖️ Cancel", key="cancel_audio_job"):
+            job_manager.cancel(job.id)
+            job_manager.discard(job.id)
+            st.session_state.pop(AUDIO_JOB_KEY, None)
+            st.info("Audio analysis cancelled")
+            return None
+        time.sleep(Config.JOB_POLL_INTERVAL)
+        st.rerun()
+    
+    # The result is shown once, like a synchronous analysis would be
+    st.session_state.pop(AUDIO_JOB_KEY, None)
+    job_manager.discard(job.id)
+    
+    if job.status == CANCELLED:
+        return None
+    if job.status != DONE:
+        logger.warning(f"ML audio detection failed: {job.error}")
+        st.error("Could not process audio file. Please ensure it's a valid audio format.")
+        return None
+    
+    emotion, confidence, text = job.result
+    if not emotion:
+        st.error("Could not detect emotion from audio file")
+        return None
+    
+    st.success(f"✨ Detected emotion: **{emotion}** (confidence: {confidence:.1%})")
+    if text:
+        st.info(f"📝 Transcribed: '{text}'")
+    return {
+        'emotion': emotion,
+        'confidence': confidence,
+        'input_type': 'ml_audio',
+        'input_text': text
+    }
+
 def simple_emotion_detection(text):
     """Simple fallback emotion detection"""
-    emotion_keywords = {
-        'happy': ['happy', 'joy', 'excited', 'great', 'wonderful', 'amazing', 'good', 'fantastic', 'awesome', 'love'],
-        'sad': ['sad', 'down', 'depressed', 'unhappy', 'blue', 'melancholy', 'disappointed', 'hurt', 'crying'],
-        'angry': ['angry', 'mad', 'furious', 'irritated', 'annoyed', 'rage', 'hate', 'frustrated', 'pissed'],
-        'excited': ['excited', 'thrilled', 'pumped', 'energized', 'enthusiastic', 'eager', 'stoked'],
-        'calm': ['calm', 'peaceful', 'relaxed', 'serene', 'tranquil', 'zen', 'composed', 'chill'],
-        'anxious': ['anxious', 'nervous', 'worried', 'stressed', 'tense', 'afraid', 'scared', 'panicked'],
-        'romantic': ['love', 'romantic', 'affection', 'adore', 'crush', 'heart', 'passion', 'loving'],
-        'confident': ['confident', 'sure', 'certain', 'strong', 'proud', 'bold', 'empowered', 'determined']
-    }
-    
-    text_lower = text.lower()
-    scores = {}
+    from emotion.keyword_emotion import keyword_emotion_detector
     
-    for emotion, keywords in emotion_keywords.items():
-        score = sum(1 for keyword in keywords if keyword in text_lower)
-        if score > 0:
-            scores[emotion] = score / len(keywords)
+    best_emotion, confidence = keyword_emotion_detector.detect_emotion(text)
     
-    if scores:
-        best_emotion = max(scores, key=scores.get)
-        confidence = min(scores[best_emotion] * 0.8, 0.9)
+    if best_emotion:
         st.info("💡 Using keyword-based detection")
         return {
             'emotion': best_emotion,
@@ -452,20 +493,9 @@ def map_confidence_to_intensity(confidence):
 
 def get_emotion_color(emotion_name):
     """Get color code for emotion"""
-    emotion_colors = {
-        'happy': '#FFD700',
-        'sad': '#4169E1',
-        'angry': '#FF4500',
-        'excited': '#FF69B4',
-        'calm': '#98FB98',
-        'anxious': '#DDA0DD',
-        'romantic': '#FF1493',
-        'energetic': '#FF8C00',
-        'melancholic': '#708090',
-        'confident': '#DC143C',
-        'neutral': '#808080'
-    }
-    return emotion_colors.get(emotion_name.lower(), '#667eea')
+    if emotion_name.lower() == 'neutral':
+        return '#808080'
+    return emotion_catalog.color(emotion_name, '#667eea')
 
 def format_duration(duration_ms):
     """Format duration from milliseconds to mm:ss"""
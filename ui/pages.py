@@ -103,13 +103,15 @@ def render_home_page():
         if current_user:
             try:
                 from database.database import db_manager
+                from database.event_writer import event_writer
+                from emotion.catalog import emotion_catalog
                 
-                # Get emotion object from database
-                emotion_obj = db_manager.get_emotion_by_name(emotion)
+                # Get emotion from the in-memory catalog
+                emotion_obj = emotion_catalog.get(emotion)
                 
                 if emotion_obj:
-                    # Create emotion log entry
-                    emotion_log = db_manager.create_emotion_log(
+                    # Queue the emotion log entry; it is written in the background
+                    emotion_log = event_writer.enqueue_emotion_log(
                         user_id=current_user.id,
                         emotion_id=emotion_obj.id,
                         input_text=emotion_data.get('input_text', ''),
@@ -123,7 +125,7 @@ def render_home_page():
                         logger.warning(f"⚠️ Failed to log emotion to database")
                 else:
                     logger.warning(f"⚠️ Emotion '{emotion}' not found in database")
-                    
+            
             except Exception as e:
                 logger.error(f"❌ Error logging emotion: {e}")
                 st.warning("Emotion detected but not saved to history")
@@ -151,6 +153,23 @@ def render_home_page():
             if songs:
                 st.success(f"Found {len(songs)} songs for your {emotion} mood!")
                 
+                # Persist the whole result page once per search, not once per click
+                song_ids = {}
+                if current_user:
+                    from database.database import db_manager
+                    
+                    search_key = tuple(song.get('spotify_id') for song in songs)
+                    if st.session_state.get('song_ids_search') == search_key:
+                        song_ids = st.session_state.song_ids
+                    else:
+                        song_ids = db_manager.upsert_songs(songs)
+                        st.session_state.song_ids = song_ids
+                        # Only a complete upsert is reused; a failed or partial one is retried next render
+                        if all(spotify_id in song_ids for spotify_id in search_key if spotify_id):
+                            st.session_state.song_ids_search = search_key
+                        else:
+                            st.session_state.song_ids_search = None
+                
                 for index, song in enumerate(songs):
                     # Create container for each song
                     with st.container():
@@ -179,23 +198,13 @@ def render_home_page():
                                     # Log song interaction
                                     if current_user and emotion_obj:
                                         try:
-                                            # Add song to database
-                                            db_song = db_manager.add_or_get_song(
-                                                title=song['title'],
-                                                artist=song['artist'],
-                                                spotify_id=song.get('spotify_id'),
-                                                preview_url=song.get('preview_url'),
-                                                external_url=song.get('external_url'),
-                                                album_image=song.get('album_image'),
-                                                duration_ms=song.get('duration_ms'),
-                                                popularity=song.get('popularity')
-                                            )
+                                            song_id = song_ids.get(song.get('spotify_id'))
                                             
-                                            if db_song:
+                                            if song_id:
                                                 # Log the interaction
-                                                db_manager.log_song_interaction(
+                                                event_writer.enqueue_song_interaction(
                                                     user_id=current_user.id,
-                                                    song_id=db_song.id,
+                                                    song_id=song_id,
                                                     emotion_id=emotion_obj.id,
                                                     input_type=emotion_data.get('input_type', 'text'),
                                                     confidence_score=confidence,
@@ -213,21 +222,12 @@ def render_home_page():
                                     # Log song interaction as disliked
                                     if current_user and emotion_obj:
                                         try:
-                                            db_song = db_manager.add_or_get_song(
-                                                title=song['title'],
-                                                artist=song['artist'],
-                                                spotify_id=song.get('spotify_id'),
-                                                preview_url=song.get('preview_url'),
-                                                external_url=song.get('external_url'),
-                                                album_image=song.get('album_image'),
-                                                duration_ms=song.get('duration_ms'),
-                                                popularity=song.get('popularity')
-                                            )
+                                            song_id = song_ids.get(song.get('spotify_id'))
                                             
-                                            if db_song:
-                                                db_manager.log_song_interaction(
+                                            if song_id:
+                                                event_writer.enqueue_song_interaction(
                                                     user_id=current_user.id,
-                                                    song_id=db_song.id,
+                                                    song_id=song_id,
                                                     emotion_id=emotion_obj.id,
                                                     input_type=emotion_data.get('input_type', 'text'),
                                                     confidence_score=confidence,
@@ -251,7 +251,7 @@ def render_home_page():
                         st.markdown("---")
             else:
                 st.info("No songs found. Try a different emotion!")
-                
+        
         except Exception as e:
             logger.error(f"Error loading songs: {e}")
             st.error("Could not load songs. Please try again.")
@@ -384,7 +384,7 @@ def render_profile_page():
                 st.markdown("---")
         else:
             st.info("🎵 No songs played yet! Detect your emotion and play some music.")
-        
+    
     except Exception as e:
         logger.error(f"Error loading profile data: {e}")
         st.error(f"Error loading profile data: {str(e)}")
@@ -456,7 +456,7 @@ def render_playlists_page():
     #             <p>Songs that match your {emotion} mood</p>
     #         </div>
     #         """, unsafe_allow_html=True)
-            
+    
     #         # Get sample songs for this emotion
     #         songs = get_sample_songs_for_emotion(emotion)
     st.markdown("""
@@ -679,17 +679,12 @@ def render_settings_page():
                 if st.session_state.get('confirm_clear', False):
                     try:
                         from database.database import db_manager
-                        from database.models import EmotionLog, UserSongHistory, get_db_session
+                        from database.event_writer import event_writer
                         
-                        session = get_db_session()
-                        session.query(EmotionLog).filter(
-                            EmotionLog.user_id == current_user.id
-                        ).delete()
-                        session.query(UserSongHistory).filter(
-                            UserSongHistory.user_id == current_user.id
-                        ).delete()
-                        session.commit()
-                        session.close()
+                        # Write queued events first so none land after the delete
+                        event_writer.flush()
+                        if not db_manager.delete_user_data(current_user.id):
+                            raise RuntimeError("history could not be deleted")
                         
                         st.success("History cleared!")
                         st.session_state.confirm_clear = False
@@ -713,26 +708,12 @@ def render_settings_page():
                     if st.button("⚠️ Confirm Deletion", type="secondary", key="confirm_delete_btn"):
                         try:
                             from database.database import db_manager
-                            from database.models import User, EmotionLog, UserSongHistory, get_db_session
-                            
-                            session = get_db_session()
-                            
-                            # Delete related records first
-                            session.query(EmotionLog).filter(
-                                EmotionLog.user_id == current_user.id
-                            ).delete()
-                            
-                            session.query(UserSongHistory).filter(
-                                UserSongHistory.user_id == current_user.id
-                            ).delete()
-                            
-                            # Delete user
-                            session.query(User).filter(
-                                User.id == current_user.id
-                            ).delete()
+                            from database.event_writer import event_writer
                             
-                            session.commit()
-                            session.close()
+                            # Write queued events first so none land after the delete
+                            event_writer.flush()
+                            if not db_manager.delete_user_data(current_user.id, delete_account=True):
+                                raise RuntimeError("account could not be deleted")
                             
                             # Logout user
                             auth_manager.logout()
@@ -8,6 +8,7 @@ import streamlit as st
 import logging
 from enum import Enum
 from typing import Optional, Tuple, Any
+from emotion.streaming_audio import frame_to_mono
 
 logger = logging.getLogger(__name__)
 
@@ -160,6 +161,11 @@ class AudioRecorderManager:
                         return recorder.stop_and_analyze()
             
             # Status
+            if recorder.is_recording:
+                emotion, confidence, text = recorder.provisional_result()
+                if text:
+                    st.info(f"📝 Heard so far: '{text}'" + (f" — sounds **{emotion}**" if emotion else ""))
+            
             if webrtc_ctx.state.playing:
                 st.info("🟢 Microphone active - Ready to record")
             else:
@@ -177,6 +183,7 @@ class AudioRecorderManager:
         try:
             from st_audiorec import st_audiorec
             from emotion.audio_emotion import audio_emotion_detector
+            from emotion.noise_profile import session_noise_profile
             
             st.info("🎤 Click the microphone button to start/stop recording")
             
@@ -191,7 +198,9 @@ class AudioRecorderManager:
                 # Analyze button
                 if st.button("🎯 Analyze Emotion", key=f"{key}_analyze"):
                     with st.spinner("Analyzing emotion..."):
-                        emotion, confidence, text = audio_emotion_detector.detect_emotion_from_simple_recorder(wav_audio_data)
+                        emotion, confidence, text = audio_emotion_detector.detect_emotion_from_simple_recorder(
+                            wav_audio_data, session_noise_profile(f"{key}_audiorec")
+                        )
                         
                         if emotion:
                             st.success(f"Detected emotion: **{emotion}** (confidence: {confidence:.1%})")
@@ -321,41 +330,86 @@ class AudioRecorderManager:
         """
 
 class WebRTCAudioRecorder:
-    """WebRTC-specific audio recorder implementation"""
+    """WebRTC-specific audio recorder implementation
     
-    def __init__(self):
-        from collections import deque
+    In streaming mode each few seconds of speech is transcribed and scored
+    on a worker while recording continues, so stopping only waits for the
+    last segment.
+    """
+    
+    def __init__(self, streaming=None, sample_rate=48000):
         import threading
+        from config import Config
+        from emotion.noise_profile import NoiseProfile
+        from utils.ring_buffer import AudioRingBuffer
         
-        self.audio_frames = deque(maxlen=1000)
+        # Holds MAX_AUDIO_DURATION seconds; longer recordings keep the latest audio
+        self.audio_buffer = AudioRingBuffer.for_duration(Config.MAX_AUDIO_DURATION, sample_rate)
+        self.sample_rate = sample_rate
+        self.streaming = Config.AUDIO_STREAMING_ENABLED if streaming is None else streaming
+        self.analyzer = None
         self.is_recording = False
         self.lock = threading.Lock()
+        # Lives as long as the recorder in session state, so repeat recordings reuse it
+        self.noise_profile = NoiseProfile()
     
     def audio_frame_callback(self, frame):
-        import av
-        import numpy as np
-        
         with self.lock:
             if self.is_recording:
-                audio_array = frame.to_ndarray()
-                self.audio_frames.append(audio_array)
+                samples = frame_to_mono(frame)
+                if self.analyzer is not None:
+                    self.analyzer.add_frame(samples, frame.sample_rate)
+                else:
+                    if frame.sample_rate != self.sample_rate:
+                        self._resize_buffer(frame.sample_rate)
+                    self.audio_buffer.write(samples)
         return frame
     
+    def _resize_buffer(self, sample_rate):
+        """Reallocate for a stream whose rate differs from the one preallocated for"""
+        from config import Config
+        from utils.ring_buffer import AudioRingBuffer
+        
+        self.sample_rate = sample_rate
+        self.audio_buffer = AudioRingBuffer.for_duration(Config.MAX_AUDIO_DURATION, sample_rate)
+    
     def start_recording(self):
         with self.lock:
             self.is_recording = True
-            self.audio_frames.clear()
+            self.audio_buffer.clear()
+            self.analyzer = None
+            if self.streaming:
+                from emotion.streaming_audio import StreamingAudioAnalyzer
+                self.analyzer = StreamingAudioAnalyzer(noise_profile=self.noise_profile)
+    
+    def provisional_result(self):
+        """(emotion, confidence, transcript) from segments finished so far"""
+        with self.lock:
+            analyzer = self.analyzer
+        if analyzer is None:
+            return None, 0.0, None
+        return analyzer.provisional()
     
     def stop_and_analyze(self):
+        audio_data = None
         with self.lock:
             self.is_recording = False
-            if self.audio_frames:
-                import numpy as np
-                from emotion.audio_emotion import audio_emotion_detector
-                
-                audio_data = np.concatenate(list(self.audio_frames), axis=0)
-                return audio_emotion_detector.detect_emotion_from_webrtc_audio(audio_data)
+            analyzer, self.analyzer = self.analyzer, None
+            if analyzer is None and len(self.audio_buffer):
+                if self.audio_buffer.dropped_samples:
+                    logger.warning(f"Recording exceeded the buffer; dropped the first "
+                                   f"{self.audio_buffer.dropped_samples / self.sample_rate:.1f}s")
+                # A copy only if the buffer wrapped; otherwise a view, stable now that capture has stopped
+                audio_data = self.audio_buffer.view()
         
+        # Earlier segments were analyzed during recording; wait for the last one
+        if analyzer is not None:
+            return analyzer.finish()
+        if audio_data is not None:
+            from emotion.audio_emotion import audio_emotion_detector
+            return audio_emotion_detector.detect_emotion_from_webrtc_audio(
+                audio_data, self.sample_rate, self.noise_profile
+            )
         return None, 0.0, None
 
 # Global instance
\ No newline at end of file
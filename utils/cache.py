@@ -0,0 +1,70 @@
+"""
+In-memory caching primitives
+Thread-safe LRU cache with per-entry time-to-live and hit/miss counters
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import Counter
+
+
+class LRUCache:
+    """Bounded LRU cache whose entries expire after ``ttl`` seconds"""
+    
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = Counter('hits', 'misses', 'evictions', 'expirations')
+    
+    def get(self, key, default=None):
+        """Return the cached value, refreshing its recency"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters.inc('misses')
+                return default
+            
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                self.counters.inc('expirations')
+                self.counters.inc('misses')
+                return default
+            
+            self.entries.move_to_end(key)
+            self.counters.inc('hits')
+            return value
+    
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counters.inc('evictions')
+    
+    def clear(self):
+        """Drop every entry"""
+        with self.lock:
+            self.entries.clear()
+    
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+    
+    def stats(self):
+        """Export size and hit/miss counters"""
+        stats = self.counters.snapshot()
+        lookups = stats['hits'] + stats['misses']
+        stats['size'] = len(self)
+        stats['max_size'] = self.max_size
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
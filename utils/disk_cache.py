@@ -0,0 +1,210 @@
+"""
+SQLite-backed persistent cache
+Safe to share between processes; entries are scoped by namespace and fingerprint
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache:
+    """Key/value store on a shared SQLite file with LRU and age eviction
+    
+    Every entry is stored under (namespace, fingerprint, key) and only read
+    back under the fingerprint that wrote it, so changing the producer
+    invalidates its entries. Processes with different fingerprints can share
+    one file: max_entries and max_age apply to the whole namespace, and
+    entries nobody reads any more age out through LRU eviction.
+    """
+    
+    # Avoid rewriting accessed_at on every read of a hot entry
+    ACCESS_RESOLUTION = 60  # seconds
+    
+    def __init__(self, path, namespace, fingerprint, max_entries=100000, max_age=None,
+                 prune_interval=100):
+        self.path = path
+        self.namespace = namespace
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.writes_since_prune = 0
+        self.counters = Counter('hits', 'misses', 'writes', 'evictions')
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._initialize()
+    
+    def _connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            self.local.connection = connection
+        return connection
+    
+    def _initialize(self):
+        connection = self._connect()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, fingerprint, key)
+            ) WITHOUT ROWID
+        """)
+        # Eviction orders the whole namespace, whatever fingerprint wrote the entry
+        connection.execute("DROP INDEX IF EXISTS ix_cache_entries_accessed")
+        connection.execute("""
+            CREATE INDEX IF NOT EXISTS ix_cache_entries_namespace_accessed
+            ON cache_entries (namespace, accessed_at)
+        """)
+        self.prune()
+    
+    def get(self, key):
+        """Return the stored value for key, or None"""
+        return self.get_many([key]).get(key)
+    
+    def get_many(self, keys):
+        """Return a dict of the stored values for whichever keys are present"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        
+        connection = self._connect()
+        now = time.time()
+        found = {}
+        
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, value, created_at FROM cache_entries "
+                f"WHERE namespace = ? AND fingerprint = ? AND key IN ({placeholders})",
+                (self.namespace, self.fingerprint, *chunk)
+            ).fetchall()
+            
+            for key, value, created_at in rows:
+                if self.max_age and created_at < now - self.max_age:
+                    continue
+                found[key] = json.loads(value)
+            
+            fresh = [key for key in chunk if key in found]
+            if fresh:
+                connection.execute(
+                    f"UPDATE cache_entries SET accessed_at = ? "
+                    f"WHERE namespace = ? AND fingerprint = ? AND accessed_at < ? "
+                    f"AND key IN ({','.join('?' * len(fresh))})",
+                    (now, self.namespace, self.fingerprint, now - self.ACCESS_RESOLUTION, *fresh)
+                )
+        
+        self.counters.inc('hits', len(found))
+        self.counters.inc('misses', len(keys) - len(found))
+        return found
+    
+    def set(self, key, value):
+        """Store a JSON-serializable value"""
+        self.set_many({key: value})
+    
+    def set_many(self, items):
+        """Store several JSON-serializable values in one transaction"""
+        if not items:
+            return
+        
+        now = time.time()
+        rows = [
+            (self.namespace, self.fingerprint, key, json.dumps(value), now, now)
+            for key, value in items.items()
+        ]
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(namespace, fingerprint, key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        
+        self.counters.inc('writes', len(rows))
+        with self.lock:
+            self.writes_since_prune += len(rows)
+            should_prune = self.writes_since_prune >= self.prune_interval
+            if should_prune:
+                self.writes_since_prune = 0
+        if should_prune:
+            self.prune()
+    
+    def prune(self):
+        """Drop expired entries and the least recently used ones above the cap
+        
+        Both apply to every fingerprint in the namespace, so entries of a
+        configuration that is no longer running are the first to go.
+        """
+        connection = self._connect()
+        removed = 0
+        
+        if self.max_age:
+            removed += connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?",
+                (self.namespace, time.time() - self.max_age)
+            ).rowcount
+        
+        count = connection.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()[0]
+        
+        if count > self.max_entries:
+            removed += connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND (fingerprint, key) IN ("
+                "SELECT fingerprint, key FROM cache_entries WHERE namespace = ? "
+                "ORDER BY accessed_at LIMIT ?)",
+                (self.namespace, self.namespace, count - self.max_entries)
+            ).rowcount
+        
+        if removed:
+            self.counters.inc('evictions', removed)
+        return removed
+    
+    def clear(self):
+        """Remove every entry in this namespace"""
+        self._connect().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+    
+    def __len__(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ? AND fingerprint = ?",
+            (self.namespace, self.fingerprint)
+        ).fetchone()[0]
+    
+    def stats(self):
+        """Export hit/miss counters and current size"""
+        stats = self.counters.snapshot()
+        lookups = stats['hits'] + stats['misses']
+        stats['size'] = len(self)
+        stats['max_entries'] = self.max_entries
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,203 @@
+"""
+Background jobs for slow analysis work
+Jobs run on one process-wide bounded thread pool, so the number of
+concurrent ASR calls is capped no matter how many sessions submit work.
+Submissions beyond the pending limit are refused instead of queueing
+without bound. Sessions keep only a job id and poll it between reruns.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job by Job.report once it has been cancelled
+    
+    A BaseException, like asyncio.CancelledError, so the broad
+    ``except Exception`` handlers in the analysis code do not swallow it.
+    """
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already queued or running"""
+
+
+class Job:
+    """State of one submitted job, shared between the worker and the polling session"""
+    
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self.cancel_event = threading.Event()
+    
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATES
+    
+    def report(self, progress, message=None):
+        """Called by the job to publish progress; raises JobCancelled after cancel()"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.progress = max(0.0, min(1.0, float(progress)))
+        if message:
+            self.message = message
+    
+    def cancel(self):
+        """Stop a queued job immediately, or a running one at its next report()"""
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+    
+    def _finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        if status == DONE:
+            self.progress = 1.0
+    
+    def snapshot(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+        }
+
+
+class JobManager:
+    """Bounded pool running Jobs; at most max_workers run and max_pending wait or run"""
+    
+    def __init__(self, max_workers=None, max_pending=None, retain_seconds=None):
+        self.max_workers = max_workers or Config.JOB_WORKERS
+        self.max_pending = max_pending or Config.JOB_MAX_PENDING
+        self.retain_seconds = retain_seconds if retain_seconds is not None else Config.JOB_RETAIN_SECONDS
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.counters = Counter('submitted', 'rejected', 'done', 'failed', 'cancelled')
+    
+    def submit(self, function, *args, kind='job', **kwargs):
+        """Run function(job, *args, **kwargs) in the background and return the Job
+        
+        Raises JobQueueFull when max_pending jobs are already in flight.
+        """
+        if not self.slots.acquire(blocking=False):
+            self.counters.inc('rejected')
+            raise JobQueueFull(f"{self.max_pending} jobs already pending")
+        
+        job = Job(kind)
+        with self.lock:
+            self._prune()
+            self.jobs[job.id] = job
+        self.counters.inc('submitted')
+        
+        job.future = self.executor.submit(self._run, job, function, args, kwargs)
+        job.future.add_done_callback(lambda future: self._release(job))
+        return job
+    
+    def _run(self, job, function, args, kwargs):
+        if job.cancel_event.is_set():
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        job.message = "Running"
+        try:
+            job._finish(DONE, result=function(job, *args, **kwargs))
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} failed: {e}")
+            job._finish(FAILED, error=str(e))
+    
+    def _release(self, job):
+        if not job.is_finished:
+            # Cancelled before it started: the worker never ran it
+            job._finish(CANCELLED)
+        self.counters.inc(job.status)
+        self.slots.release()
+    
+    def _prune(self):
+        """Forget finished jobs nobody polled for retain_seconds; the caller holds the lock"""
+        cutoff = time.time() - self.retain_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished is not None and job.finished < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+    
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+    
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and not job.is_finished:
+            job.cancel()
+        return job
+    
+    def discard(self, job_id):
+        """Drop a job once its result has been consumed"""
+        with self.lock:
+            self.jobs.pop(job_id, None)
+    
+    def stats(self):
+        with self.lock:
+            states = [job.status for job in self.jobs.values()]
+        stats = self.counters.snapshot()
+        stats.update({state: states.count(state) for state in (QUEUED, RUNNING)})
+        stats['max_workers'] = self.max_workers
+        stats['max_pending'] = self.max_pending
+        return stats
+
+
+def submit_session_job(session_state, key, function, *args, manager=None, **kwargs):
+    """Submit a job for one session slot, cancelling the job that slot held before"""
+    manager = manager or job_manager
+    previous = session_state.get(key)
+    if previous:
+        manager.cancel(previous)
+        manager.discard(previous)
+    job = manager.submit(function, *args, **kwargs)
+    session_state[key] = job.id
+    return job
+
+
+def session_job(session_state, key, manager=None):
+    """The Job a session slot refers to, or None when there is none or it expired"""
+    job_id = session_state.get(key)
+    if not job_id:
+        return None
+    job = (manager or job_manager).get(job_id)
+    if job is None:
+        session_state.pop(key, None)
+    return job
+
+# Global instance
+job_manager = JobManager()
@@ -0,0 +1,71 @@
+"""
+Lightweight in-process metrics
+Histograms and counters that can be exported as plain dicts
+"""
+
+import bisect
+import threading
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+    
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def observe(self, value):
+        """Record a single observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+    
+    def reset(self):
+        """Clear all observations"""
+        with self.lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.total = 0.0
+    
+    def snapshot(self):
+        """Export bucket counts keyed by their upper bound"""
+        with self.lock:
+            labels = [f"<={bound:g}" for bound in self.buckets] + ["+inf"]
+            return {
+                'buckets': dict(zip(labels, self.counts)),
+                'count': self.count,
+                'sum': self.total,
+                'mean': self.total / self.count if self.count else 0.0
+            }
+
+
+class Counter:
+    """Thread-safe monotonically increasing counters keyed by name"""
+    
+    def __init__(self, *names):
+        self.lock = threading.Lock()
+        self.values = {name: 0 for name in names}
+    
+    def inc(self, name, amount=1):
+        """Increment a named counter"""
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + amount
+    
+    def get(self, name):
+        """Current value of a named counter"""
+        with self.lock:
+            return self.values.get(name, 0)
+    
+    def reset(self):
+        """Zero every counter"""
+        with self.lock:
+            for name in self.values:
+                self.values[name] = 0
+    
+    def snapshot(self):
+        """Export all counters"""
+        with self.lock:
+            return dict(self.values)
@@ -0,0 +1,92 @@
+"""
+Fixed-capacity audio ring buffer
+Samples are copied into one preallocated array, so capture costs no
+allocation per frame. Readers get zero-copy views of the buffered audio.
+"""
+
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Preallocated circular buffer of mono samples keeping the most recent audio
+    
+    When more than ``capacity`` samples are written the oldest are
+    overwritten and counted in ``dropped_samples``.
+    """
+    
+    def __init__(self, capacity, dtype=np.int16):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.data = np.zeros(self.capacity, dtype=dtype)
+        self.lock = threading.Lock()
+        self.start = 0
+        self.size = 0
+        self.dropped_samples = 0
+    
+    @classmethod
+    def for_duration(cls, seconds, sample_rate, dtype=np.int16):
+        """Buffer holding ``seconds`` of audio at ``sample_rate``"""
+        return cls(int(np.ceil(seconds * sample_rate)), dtype=dtype)
+    
+    def __len__(self):
+        return self.size
+    
+    def write(self, samples):
+        """Copy samples in, overwriting the oldest audio once full"""
+        samples = np.asarray(samples)
+        if samples.ndim != 1:
+            samples = samples.reshape(-1)
+        count = samples.shape[0]
+        if count == 0:
+            return
+        
+        with self.lock:
+            # Only the newest capacity samples can survive this write
+            if count > self.capacity:
+                self.dropped_samples += count - self.capacity
+                samples = samples[-self.capacity:]
+                count = self.capacity
+            
+            overflow = self.size + count - self.capacity
+            if overflow > 0:
+                self.dropped_samples += overflow
+                self.start = (self.start + overflow) % self.capacity
+                self.size -= overflow
+            
+            end = (self.start + self.size) % self.capacity
+            first = min(count, self.capacity - end)
+            self.data[end:end + first] = samples[:first]
+            if first < count:
+                self.data[:count - first] = samples[first:]
+            self.size += count
+    
+    def views(self):
+        """Buffered audio, oldest first, as one or two zero-copy array views
+        
+        Views alias the buffer and are only stable until the next write.
+        """
+        with self.lock:
+            end = self.start + self.size
+            if end <= self.capacity:
+                return (self.data[self.start:end],)
+            return self.data[self.start:], self.data[:end - self.capacity]
+    
+    def view(self):
+        """Buffered audio as one array: a view when contiguous, otherwise a single copy"""
+        parts = self.views()
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+    
+    def to_array(self):
+        """Independent copy of the buffered audio, safe to hand to another thread"""
+        parts = self.views()
+        return parts[0].copy() if len(parts) == 1 else np.concatenate(parts)
+    
+    def clear(self):
+        """Forget buffered audio and reset the dropped-sample count"""
+        with self.lock:
+            self.start = 0
+            self.size = 0
+            self.dropped_samples = 0